@@ -1,7 +1,7 @@
 # sonora.py
 # Переработанная версия Sonora Music Player
 # Основные улучшения:
-# - Автосохранение состояния (tracks, current_track, favorites, volume, shuffle) в ~/.sonora_state.json
+# - Автосохранение состояния (tracks, current_track, favorites, volume, shuffle) в ~/.sonora_library.db (SQLite)
 # - Фоновый сканер (QThread) для поиска аудиофайлов (mp3, m4a, flac, wav) без блокировки UI
 # - Сохранение состояния при изменениях: переключение трека, добавление/удаление, редактирование, изменение избранного/громкости
 # - Улучшения интерфейса / небольшие правки UX
@@ -11,41 +11,136 @@
 import sys
 import os
 import glob
+import fnmatch
 import json
 import time
+_MODULE_STARTED = time.perf_counter()  # начало импорта модуля, для --profile-startup
 import random
+import math
+import heapq
+import hashlib
+import mmap
+import threading
+import re
+import bisect
+import unicodedata
+import sqlite3
+import shutil
+import subprocess
 from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
-import pygame
+pygame = None  # импортируется в load_audio() после первого кадра: вместе с numpy это самая дорогая часть запуска
+np = None      # numpy — необязательная зависимость обработки звука, см. load_numpy()
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
     QHBoxLayout, QPushButton, QLabel, QFileDialog,
-    QFrame, QScrollArea, QListWidget, QSlider,
+    QFrame, QScrollArea, QListView, QSlider,
     QMenu, QAction, QDialog, QLineEdit, QMessageBox,
-    QGraphicsDropShadowEffect, QGridLayout, QStackedWidget, QListWidgetItem,
-    QSpacerItem, QSizePolicy, QProgressBar, QStatusBar
+    QGraphicsDropShadowEffect, QGridLayout, QStackedWidget, QStyledItemDelegate,
+    QSpacerItem, QSizePolicy, QProgressBar, QStatusBar, QStyle, QShortcut, QComboBox,
+    QCheckBox
+)
+from PyQt5.QtCore import (
+    Qt, QTimer, QUrl, QBuffer, QIODevice, QRect, QSize, QRectF, QEvent, QPoint, QThread, pyqtSignal,
+    QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, QFileSystemWatcher
+)
+from PyQt5.QtGui import (
+    QPixmap, QFont, QIcon, QColor, QPainter, QBrush, QPainterPath, QCursor, QFontMetrics,
+    QImage, QImageReader, QKeySequence
 )
-from PyQt5.QtCore import Qt, QTimer, QUrl, QBuffer, QIODevice, QRect, QSize, QRectF, QEvent, QPoint, QThread, pyqtSignal
-from PyQt5.QtGui import QPixmap, QFont, QIcon, QColor, QPainter, QBrush, QPainterPath, QCursor
 
-from mutagen.id3 import ID3, TIT2, TPE1, TALB, TDRC, APIC
-from mutagen import File
 from io import BytesIO
-from collections import defaultdict
-import base64
-import send2trash
+from collections import OrderedDict, deque
+# mutagen, send2trash и base64 импортируются там, где нужны: на запуске они не используются
 
 # ------------------------------------------------------------------
 # Константы и настройки
 # ------------------------------------------------------------------
-STATE_FILE = os.path.join(os.path.expanduser("~"), ".sonora_state.json")
+STATE_FILE = os.path.join(os.path.expanduser("~"), ".sonora_state.json")  # старый формат, переносится в LIBRARY_DB
+METADATA_FILE = os.path.join(os.path.expanduser("~"), ".sonora_metadata.json")  # старый формат, переносится в LIBRARY_DB
+COVERS_DIR = os.path.join(os.path.expanduser("~"), ".sonora_covers")
+THUMBS_DIR = os.path.join(os.path.expanduser("~"), ".sonora_thumbs")
+SCAN_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".sonora_scan_cache.json")
+LIBRARY_DB = os.path.join(os.path.expanduser("~"), ".sonora_library.db")  # треки, избранное, теги, настройки
+THUMBNAIL_MEMORY_ITEMS = 512  # сколько уменьшенных обложек держать в памяти (все размеры вместе)
+COVER_LOADER_THREADS = 2      # потоки фоновой загрузки обложек
+SEARCH_DEBOUNCE_MS = 150      # пауза после последнего нажатия перед запуском поиска
+SEARCH_RESULT_LIMIT = 1000    # сколько лучших результатов отдаёт поиск
+SEARCH_SHORT_PREFIX = 2       # слово запроса такой длины и короче — «короткий префикс»
+SEARCH_SHORT_PREFIX_POSTINGS = 4000  # короткий префикс, задающий кандидатов, разворачивается в самые короткие слова, пока треков не наберётся столько
+SEARCH_TARGET_MS = 5.0        # цель по задержке запроса на 100 тыс. треков (--bench-search)
+HOME_PAGE_SIZE = 20           # карточек на «страницу» раздела главной
+HOME_COLUMNS = 5
+SEARCH_BUILD_CHUNK = 2000     # треков на шаг фоновой сборки поискового индекса при запуске
+VIEW_CACHE_SIZE = 8           # сколько страниц альбомов/исполнителей держать живыми (LRU)
+NAV_HISTORY_SIZE = 50         # глубина истории «Назад/Вперёд»
+TAG_FIELDS = {"TIT2": "title", "TALB": "album", "TDRC": "year"}  # ID3-кадр -> поле кэша
+METADATA_VERSION = 2            # 2: теги M4A/FLAC читаются родным форматом, а не только ID3
+METADATA_WORKERS = max(2, os.cpu_count() or 2)  # размер пула извлечения тегов
+METADATA_USE_PROCESSES = False  # True — пул процессов вместо потоков (обходит GIL, дороже старт)
+METADATA_BATCH_SIZE = 200       # сколько записей отдавать в UI за раз
+METADATA_BATCH_INTERVAL = 0.25  # секунды — отдать неполную пачку, если она копится дольше
+SWEEP_BATCH_SIZE = 500          # сколько путей проверять между отчётами фоновой проверки файлов
+WATCH_LIBRARY = True            # следить за корнями сканирования и обновлять библиотеку на лету
+WATCH_DEBOUNCE_MS = 1000        # события копятся столько, потом изменённые каталоги разбираются одной пачкой
+WATCH_MAX_DIRS = 4096           # каталогов под inotify (QFileSystemWatcher); остальные опрашиваются
+WATCH_POLL_INTERVAL_MS = 5000   # период опроса каталогов без inotify
+WATCH_POLL_BATCH = 200          # сколько каталогов проверять за один тик опроса (ограничивает стоимость)
+WATCH_SETTLE_SECONDS = 2.0      # файл моложе этого ещё копируется — разбираем его позже
+FINGERPRINT_VERSION = 1         # поднять при смене алгоритма отпечатка — отпечатки посчитаются заново
+FINGERPRINT_SAMPLE_BYTES = 1 << 20  # хэшируются начало, середина и конец звуковых данных по столько байт
+FINGERPRINT_CHUNK = 1 << 16     # кусок mmap, передаваемый в хэш за раз
+FINGERPRINT_BATCH_SIZE = 200    # сколько отпечатков отдавать в UI за раз
+DUPLICATE_DURATION_TOLERANCE = 2.0  # секунды: одна запись в разных форматах, если теги совпадают
+LOSSLESS_EXTS = (".flac", ".wav")   # из группы дубликатов показывается прежде всего такой файл
 DEFAULT_SCAN_PATHS = [
     os.path.join(os.path.expanduser("~"), "Music"),
     os.path.join(os.path.expanduser("~"), "Downloads"),
 ]
+DEEP_SCAN_PATHS = [os.path.expanduser("~")]  # «Глубокий скан»: вся домашняя папка (в пределах ограничений ниже)
 AUDIO_EXTS = (".mp3", ".m4a", ".flac", ".wav")
-AUTOSAVE_DEBOUNCE = 0.5  # секунды
+SCAN_MAX_DEPTH = 12             # уровней вложенности от корня при обычном скане
+SCAN_MAX_DEPTH_DEEP = 24        # то же для глубокого скана
+SCAN_EXCLUDE = [                # каталоги, куда сканер не заходит: шаблон имени или (с "/") полного пути
+    "node_modules", ".git", ".hg", ".svn", "__pycache__", ".cache", ".venv", "venv", "site-packages",
+    ".Trash*", "$RECYCLE.BIN", "System Volume Information",
+    "steamapps", "SteamLibrary", ".steam", "*/.local/share/Steam",
+]
+SCAN_FOLLOW_SYMLINKS = True     # заходить в каталоги-ссылки (петли отсекаются по устройству и inode)
+SCAN_FS_DIR_LIMIT = 50000       # не больше стольких каталогов с одной файловой системы за скан
+SCAN_CACHE_VERSION = 2          # поднять, если кэш сканирования надо собрать заново (смена правил обхода)
+SCAN_STATS_INTERVAL = 0.5       # секунды между отчётами сканера о скорости и оставшемся времени
+SCAN_BATCH_SIZE = 500           # найденные файлы отдаются в UI пачками по столько, не одним списком в конце
+STARTUP_PROFILE_FILE = os.path.join(os.path.expanduser("~"), ".sonora_startup_profile.txt")
+STARTUP_BUDGET_MS = 1000  # целевое время до первого кадра для --profile-startup
+AUDIO_BACKEND = "pygame"      # "pygame" — pygame.mixer.music, "stream" — ffmpeg + кольцевой буфер PCM
+FFMPEG_BIN = "ffmpeg"         # декодер для потокового бэкенда (ищется в PATH)
+STREAM_CHUNK_FRAMES = 4096    # кадров PCM в одном блоке, отдаваемом каналу (~93 мс при 44.1 кГц)
+STREAM_BUFFER_SECONDS = 2.0   # сколько декодированного звука держать впереди (ограничивает память)
+CROSSFADE_SECONDS = 0.0       # длительность кроссфейда между треками (0 — без него); нужен потоковый бэкенд
+NORMALIZE_LOUDNESS = True     # выравнивать громкость по ReplayGain из тегов или по результатам анализа
+REPLAYGAIN_PREAMP_DB = 0.0    # добавка к усилению ReplayGain
+LOUDNESS_TARGET_DB = -18.0    # к какой интегральной громкости приводить треки без тегов (как ReplayGain 2.0)
+ANALYSIS_VERSION = 2          # поднять при смене алгоритма анализа — треки проанализируются заново
+ANALYSIS_WORKERS = 1          # потоки фонового анализа (каждый держит один ffmpeg с пониженным приоритетом)
+ANALYSIS_SAMPLE_RATE = 22050  # частота, на которой декодируется трек для анализа
+ANALYSIS_HOP = 441            # кадров на шаг огибающей (20 мс при ANALYSIS_SAMPLE_RATE)
+BPM_MIN_CONFIDENCE = 0.2      # доля автокорреляции на периоде доли, ниже которой темп не определяется
+BPM_SUBDIVISION_RATIO = 0.7   # пик на 1/2 (1/3) найденного периода не ниже этой доли — значит, доля короче
+ANALYSIS_NICE = 10            # приоритет ffmpeg анализа (nice), чтобы не мешать воспроизведению
+MIX_SIZE = 30                 # треков в миксе «Похожий темп»
+TRACK_SORTS = [               # сортировки страницы «Все треки»: ключ, подпись
+    ("library", "Порядок библиотеки"),
+    ("title", "Название"),
+    ("duration", "Длительность"),
+    ("loudness", "Громкость"),
+    ("bpm", "Темп (BPM)"),
+]
+QUEUE_AHEAD_DELAY_MS = 1000  # через сколько после начала трека из очереди готовить следующий
+AUTOSAVE_DEBOUNCE = 0.5  # секунды тишины после последнего изменения до записи
+AUTOSAVE_MAX_DELAY = 5.0  # при непрерывных изменениях (перетаскивание громкости) писать не реже
 
 # QSS (темная тема в стиле Spotify)
 SPOTIFY_QSS = """
@@ -62,65 +157,2094 @@ SPOTIFY_QSS = """
     QSlider::groove:horizontal { height: 6px; background: #2c2c2c; border-radius: 3px; }
     QSlider::sub-page:horizontal { background: #1DB954; border-radius: 3px; }
     QSlider::handle:horizontal { background: #fff; width: 12px; margin: -4px 0; border-radius: 6px; }
-    QListWidget { background-color: transparent; border: none; color: #d0d0d0; }
-    QListWidget::item { padding: 10px; }
-    QListWidget::item:hover { background-color: #222; }
-    QListWidget::item:selected { background-color: #1F1F1F; color: #1DB954; }
+    QListView { background-color: transparent; border: none; color: #d0d0d0; }
     QLabel#logo_label { font-size: 22px; font-weight: bold; color: #fff; }
     QLabel#card_title { font-weight: bold; color: #fff; }
     #card_frame { background-color: #121212; border-radius: 8px; padding: 6px; }
     QLineEdit { background-color: #1a1a1a; border: 1px solid #2a2a2a; color: #fff; padding: 6px; border-radius: 4px; }
 """
 
+# ------------------------------------------------------------------
+# Хранилище библиотеки (SQLite)
+# ------------------------------------------------------------------
+class LibraryStore:
+    """Библиотека на диске: SQLite в режиме WAL вместо одного большого JSON.
+
+    Изменения копятся построчно (добавить/убрать трек, избранное, запись тегов, настройка)
+    и пишутся одной транзакцией в commit(), поэтому сохранение стоит O(изменений),
+    а не O(библиотеки). Повторные изменения одной строки до commit схлопываются.
+    Сама запись идёт в отдельном потоке-писателе: GUI только отдаёт ему снимок изменений.
+    """
+    SCHEMA_VERSION = 2                    # 2: таблица scan_stats
+
+    def __init__(self, path=LIBRARY_DB):
+        self.path = path
+        self.conn = None
+        self.schema_version = 0
+        self._writer = ThreadPoolExecutor(max_workers=1)  # один поток — записи идут строго по порядку
+        self._last_write = None
+        self._tracks = {}     # путь -> True (добавить) / False (убрать)
+        self._favorites = {}  # путь -> True / False
+        self._metadata = {}   # путь -> запись или None (удалить)
+        self._settings = {}   # ключ -> значение (JSON)
+        self._renames = []    # (старый путь, новый) — применяются первыми, по порядку
+        self._scan_stats = [] # статистика завершённых сканов (dict), см. add_scan_stats
+
+    def open(self, read_only=False):
+        """read_only — только чтение (--scan-stats): база не создаётся, схема и старые JSON не трогаются."""
+        try:
+            if read_only:
+                if not os.path.exists(self.path):
+                    return
+                uri = "file:" + os.path.abspath(self.path).replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+                self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+                self.schema_version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+                return
+            # соединение читается при запуске из GUI, дальше им пользуется только поток-писатель
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.schema_version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if self.schema_version < self.SCHEMA_VERSION:
+                self._create_schema()
+                self.migrate_json(STATE_FILE, METADATA_FILE)
+                self.schema_version = self.SCHEMA_VERSION
+        except Exception as e:
+            print("Ошибка при открытии базы библиотеки:", e)
+            self.conn = None
+
+    def migration_pending(self, state_file=STATE_FILE, metadata_file=METADATA_FILE):
+        """Открытой только для чтения базе ещё предстоит обновление схемы или перенос старых JSON."""
+        if self.schema_version >= self.SCHEMA_VERSION:
+            return False
+        return self.schema_version > 0 or os.path.exists(state_file) or os.path.exists(metadata_file)
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tracks (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL);
+                CREATE TABLE IF NOT EXISTS favorites (path TEXT PRIMARY KEY);
+                CREATE TABLE IF NOT EXISTS metadata (path TEXT PRIMARY KEY, record TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS scan_stats (id INTEGER PRIMARY KEY, started REAL, kind TEXT, stats TEXT NOT NULL);
+            """)
+            self.conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+
+    def migrate_json(self, state_file, metadata_file):
+        """Однократный перенос старых ~/.sonora_state.json и ~/.sonora_metadata.json.
+
+        После переноса файлы переименовываются в *.migrated, чтобы не импортировать их снова.
+        """
+        try:
+            if os.path.exists(state_file):
+                with open(state_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.add_tracks(data.get("tracks", []))
+                for path in data.get("favorites", []):
+                    self.set_favorite(path, True)
+                for key in ("current_path", "is_shuffled", "volume"):
+                    if key in data:
+                        self.set_setting(key, data[key])
+            if os.path.exists(metadata_file):
+                with open(metadata_file, "r", encoding="utf-8") as f:
+                    for path, record in json.load(f).items():
+                        self.put_metadata(path, record)
+            self.commit(wait=True)
+            for old in (state_file, metadata_file):
+                if os.path.exists(old):
+                    os.replace(old, old + ".migrated")
+        except Exception as e:
+            print("Ошибка при переносе состояния из JSON:", e)
+
+    # ---------- чтение (только при запуске) ----------
+    def load(self):
+        """Возвращает (треки по порядку добавления, избранное, настройки)."""
+        if self.conn is None:
+            return [], set(), {}
+        tracks = [row[0] for row in self.conn.execute("SELECT path FROM tracks ORDER BY id")]
+        favorites = {row[0] for row in self.conn.execute("SELECT path FROM favorites")}
+        settings = {}
+        for key, value in self.conn.execute("SELECT key, value FROM settings"):
+            try:
+                settings[key] = json.loads(value)
+            except ValueError:
+                pass
+        return tracks, favorites, settings
+
+    def load_metadata(self):
+        if self.conn is None:
+            return {}
+        records = {}
+        for path, record in self.conn.execute("SELECT path, record FROM metadata"):
+            try:
+                records[path] = json.loads(record)
+            except ValueError:
+                pass
+        return records
+
+    def load_scan_stats(self, limit=50):
+        """Последние сканы, от новых к старым: список dict (см. MusicPlayer._finish_scan_stats)."""
+        if self.conn is None:
+            return []
+        stats = []
+        try:
+            rows = self.conn.execute("SELECT stats FROM scan_stats ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        except sqlite3.Error:
+            return []  # база старой схемы, открытая только для чтения
+        for (row,) in rows:
+            try:
+                stats.append(json.loads(row))
+            except ValueError:
+                pass
+        return stats
+
+    # ---------- построчные изменения ----------
+    def add_tracks(self, paths):
+        for path in paths:
+            self._tracks[path] = True
+
+    def remove_tracks(self, paths):
+        for path in paths:
+            self._tracks[path] = False
+            self._favorites[path] = False
+
+    def set_favorite(self, path, on):
+        self._favorites[path] = bool(on)
+
+    def rename_track(self, old, new):
+        """Файл переименован: строка трека и избранного сохраняют место (id), меняется только путь.
+
+        Трек, который был по новому пути (файл переехал поверх него), заменяется.
+        """
+        # ещё не записанные изменения нового пути относились к заменённому треку,
+        # а старого — переезжают на новый
+        self._tracks.pop(new, None)
+        self._favorites.pop(new, None)
+        if old in self._tracks:
+            # на том же месте: порядок ещё не записанных строк станет порядком их id
+            self._tracks = {(new if p == old else p): on for p, on in self._tracks.items()}
+        if old in self._favorites:
+            self._favorites[new] = self._favorites.pop(old)
+        self._renames.append((old, new))
+
+    def put_metadata(self, path, record):
+        self._metadata[path] = record
+
+    def set_setting(self, key, value):
+        self._settings[key] = value
+
+    def add_scan_stats(self, stats):
+        self._scan_stats.append(stats)
+
+    def has_changes(self):
+        return bool(self._tracks or self._favorites or self._metadata or self._settings or self._renames
+                    or self._scan_stats)
+
+    def commit(self, wait=False):
+        """Отдаёт накопленные изменения потоку-писателю; wait=True — дождаться записи."""
+        if self.conn is not None and self.has_changes():
+            changes = (self._renames, self._tracks, self._favorites, self._metadata, self._settings, self._scan_stats)
+            self._renames, self._tracks, self._favorites, self._metadata, self._settings = [], {}, {}, {}, {}
+            self._scan_stats = []
+            self._last_write = self._writer.submit(self._write, changes)
+        if wait:
+            self.flush()
+
+    def flush(self):
+        """Ждёт, пока все отданные изменения лягут на диск."""
+        if self._last_write is not None:
+            self._last_write.result()
+            self._last_write = None
+
+    def _write(self, changes):
+        # выполняется в потоке-писателе; транзакция SQLite атомарна — либо всё, либо ничего
+        renames, tracks, favorites, metadata, settings, scan_stats = changes
+        try:
+            with self.conn:
+                for old, new in renames:
+                    self.conn.execute("DELETE FROM tracks WHERE path = ?", (new,))
+                    self.conn.execute("DELETE FROM favorites WHERE path = ?", (new,))
+                    self.conn.execute("UPDATE OR IGNORE tracks SET path = ? WHERE path = ?", (new, old))
+                    self.conn.execute("UPDATE OR IGNORE favorites SET path = ? WHERE path = ?", (new, old))
+                self.conn.executemany("DELETE FROM tracks WHERE path = ?", [(p,) for p, on in tracks.items() if not on])
+                self.conn.executemany("INSERT OR IGNORE INTO tracks (path) VALUES (?)", [(p,) for p, on in tracks.items() if on])
+                self.conn.executemany("DELETE FROM favorites WHERE path = ?", [(p,) for p, on in favorites.items() if not on])
+                self.conn.executemany("INSERT OR IGNORE INTO favorites (path) VALUES (?)", [(p,) for p, on in favorites.items() if on])
+                self.conn.executemany("DELETE FROM metadata WHERE path = ?", [(p,) for p, r in metadata.items() if r is None])
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO metadata (path, record) VALUES (?, ?)",
+                    [(p, json.dumps(r, ensure_ascii=False)) for p, r in metadata.items() if r is not None],
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                    [(k, json.dumps(v, ensure_ascii=False)) for k, v in settings.items()],
+                )
+                self.conn.executemany(
+                    "INSERT INTO scan_stats (started, kind, stats) VALUES (?, ?, ?)",
+                    [(st.get("started"), st.get("kind"), json.dumps(st, ensure_ascii=False)) for st in scan_stats],
+                )
+        except Exception as e:
+            print("Ошибка при записи в базу библиотеки:", e)
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+# ------------------------------------------------------------------
+# Кэш метаданных треков
+# ------------------------------------------------------------------
+def split_artists(raw):
+    """Разбивает строку исполнителей по ';' и ','."""
+    return [a.strip() for a in str(raw).replace(';', ',').split(',') if a.strip()]
+
+
+class _CountingFile:
+    """Обёртка файла, считающая прочитанные байты (сколько mutagen читает ради тегов)."""
+
+    def __init__(self, f):
+        self._f = f
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def _open_tagged(f, ext):
+    """mutagen-объект формата по расширению: один разбор вместо перебора всех форматов, как в File().
+
+    Читаются только заголовки и область тегов, звуковые данные (mdat, кадры FLAC, чанк data) пропускаются.
+    Если расширение не соответствует содержимому, формат определяет File().
+    """
+    from mutagen import File
+    from mutagen.mp3 import MP3
+    from mutagen.mp4 import MP4
+    from mutagen.flac import FLAC
+    from mutagen.wave import WAVE
+    cls = {".mp3": MP3, ".m4a": MP4, ".mp4": MP4, ".flac": FLAC, ".wav": WAVE}.get(ext)
+    if cls is not None:
+        try:
+            return cls(f)
+        except Exception:
+            f.seek(0)
+    try:
+        return File(f)
+    except Exception:
+        return None
+
+
+def _read_id3_tags(tags, record):
+    from mutagen.id3 import APIC
+    if "TIT2" in tags: record["title"] = str(tags["TIT2"])
+    if "TPE1" in tags: record["artists"] = split_artists(tags["TPE1"])
+    if "TALB" in tags: record["album"] = str(tags["TALB"])
+    if "TDRC" in tags: record["year"] = str(tags["TDRC"])
+    return _front_picture([tag for tag in tags.values() if isinstance(tag, APIC)])
+
+
+MP4_FIELDS = {"title": "\xa9nam", "artists": "\xa9ART", "album": "\xa9alb", "year": "\xa9day"}  # атомы iTunes
+VORBIS_FIELDS = {"title": "title", "artists": "artist", "album": "album", "year": "date"}
+
+
+def _read_text_tags(tags, fields, record):
+    # теги вида «ключ -> список значений» (атомы MP4, комментарии Vorbis); у исполнителя значений может быть несколько
+    for field, key in fields.items():
+        values = [str(v) for v in (tags[key] if key in tags else [])]
+        if field == "artists":
+            record["artists"] = [a for v in values for a in split_artists(v)]
+        elif values:
+            record[field] = values[0]
+
+
+def _front_picture(pictures):
+    # передняя обложка (тип 3), иначе первая попавшаяся
+    front = [p for p in pictures if p.type == 3]
+    return (front or pictures)[0].data if pictures else None
+
+
+def read_track_metadata(filepath, stats=None):
+    """Читает теги, длительность и обложку файла за один проход.
+
+    Формат выбирается по расширению (_open_tagged): ID3 у MP3 и WAV, атомы MP4 у M4A,
+    комментарии Vorbis и блоки PICTURE у FLAC — всё сводится к одной записи кэша.
+    Возвращает (record, cover_data). Не трогает GUI, поэтому может вызываться из любых потоков.
+    В stats (если передан) кладётся "bytes" — сколько байт файла прочитано.
+    """
+    st = os.stat(filepath)
+    record = {
+        "version": METADATA_VERSION,
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+        "title": None,
+        "artists": [],
+        "album": None,
+        "year": "",
+        "duration": 0,
+        "cover": None,
+        "replaygain": None,
+        "replaygain_peak": None,
+    }
+    from mutagen.id3 import ID3
+    from mutagen.mp4 import MP4Tags
+    from mutagen.flac import FLAC
+    from mutagen._vorbis import VComment
+    cover_data = None
+    id3 = None
+    with open(filepath, "rb") as raw:
+        f = _CountingFile(raw)
+        audio = _open_tagged(f, os.path.splitext(filepath)[1].lower())
+        tags = getattr(audio, "tags", None)
+        if not isinstance(tags, ID3):
+            # ID3 в начале файла другого формата (так его пишут некоторые программы)
+            f.seek(0)
+            if f.read(3) == b"ID3":
+                try:
+                    f.seek(0)
+                    id3 = ID3(f)
+                except Exception:
+                    id3 = None
+    if stats is not None:
+        stats["bytes"] = f.bytes_read
+    if audio is not None and audio.info is not None:
+        record["duration"] = getattr(audio.info, "length", 0) or 0
+    if isinstance(tags, ID3):
+        cover_data = _read_id3_tags(tags, record)
+    elif isinstance(tags, MP4Tags):
+        _read_text_tags(tags, MP4_FIELDS, record)
+        covers = tags.get("covr")
+        cover_data = bytes(covers[0]) if covers else None
+    elif isinstance(tags, VComment):
+        _read_text_tags(tags, VORBIS_FIELDS, record)
+    if isinstance(audio, FLAC):
+        cover_data = _front_picture(audio.pictures)
+    if id3 is not None:
+        # поля, которых нет в родных тегах формата
+        fallback = dict(record, title=None, artists=[], album=None, year="")
+        id3_cover = _read_id3_tags(id3, fallback)
+        for key in ("title", "artists", "album", "year"):
+            if not record[key] and fallback[key]:
+                record[key] = fallback[key]
+        cover_data = cover_data or id3_cover
+    if cover_data:
+        record["cover"] = hashlib.sha1(cover_data).hexdigest()
+    record["replaygain"], record["replaygain_peak"] = read_replaygain(tags, id3)
+    return record, cover_data
+
+
+_NUMBER_RE = re.compile(r"[-+]?\d+(?:[.,]\d+)?")
+
+
+def read_replaygain(*tag_sets):
+    """(усиление трека в дБ, пик) из тегов ReplayGain или (None, None).
+
+    Ключи ищутся по хвосту имени, поэтому одинаково читаются ID3 TXXX:replaygain_*,
+    Vorbis-комментарии FLAC и MP4 ----:com.apple.iTunes:replaygain_*.
+    """
+    values = {}
+    for tags in tag_sets:
+        if tags is None:
+            continue
+        try:
+            keys = list(tags.keys())
+        except Exception:
+            continue
+        for key in keys:
+            name = str(key).lower().rsplit(":", 1)[-1]
+            if name not in ("replaygain_track_gain", "replaygain_track_peak") or name in values:
+                continue
+            value = tags[key]
+            if isinstance(value, list):
+                value = value[0] if value else ""
+            if isinstance(value, bytes):
+                value = value.decode("utf-8", "replace")
+            match = _NUMBER_RE.search(str(value))
+            if match:
+                values[name] = float(match.group().replace(",", "."))
+    return values.get("replaygain_track_gain"), values.get("replaygain_track_peak")
+
+
+def store_cover_file(covers_dir, cover_hash, data):
+    """Атомарно сохраняет обложку в covers_dir, если такой ещё нет."""
+    path = os.path.join(covers_dir, cover_hash)
+    if os.path.exists(path):
+        return
+    try:
+        os.makedirs(covers_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{id(data)}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print("Ошибка при сохранении обложки:", e)
+
+
+def extract_track_metadata(filepath, known_stat, covers_dir):
+    """Задача пула извлечения: (path, record, прочитано байт); record — None, если кэш ещё актуален.
+
+    known_stat — (mtime, size) из кэша или None. Обложка сразу пишется в covers_dir,
+    чтобы в GUI-поток уходили только небольшие записи. Для исчезнувших файлов — None.
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    if known_stat is not None and tuple(known_stat) == (st.st_mtime, st.st_size):
+        return filepath, None, 0
+    stats = {}
+    try:
+        record, cover_data = read_track_metadata(filepath, stats)
+    except OSError:
+        return None
+    if cover_data:
+        store_cover_file(covers_dir, record["cover"], cover_data)
+    return filepath, record, stats.get("bytes", 0)
+
+
+def _skip_id3v2(data, pos):
+    # ID3v2 в начале файла (их может быть несколько подряд); размер — syncsafe-число
+    while len(data) >= pos + 10 and data[pos:pos + 3] == b"ID3":
+        size = ((data[pos + 6] & 0x7f) << 21) | ((data[pos + 7] & 0x7f) << 14) \
+            | ((data[pos + 8] & 0x7f) << 7) | (data[pos + 9] & 0x7f)
+        pos += 10 + size + (10 if data[pos + 5] & 0x10 else 0)
+    return pos
+
+
+def _strip_trailing_tags(data, start, end):
+    # ID3v1, APEv2 и Lyrics3v2 в конце файла, в любом порядке
+    while end > start:
+        if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+            end -= 128
+        elif end - start >= 32 and data[end - 32:end - 24] == b"APETAGEX":
+            tag_size = int.from_bytes(data[end - 20:end - 16], "little")
+            flags = int.from_bytes(data[end - 12:end - 8], "little")
+            end -= tag_size + (32 if flags & 0x80000000 else 0)
+        elif end - start >= 15 and data[end - 9:end] == b"LYRICS200":
+            try:
+                end -= int(data[end - 15:end - 9]) + 15
+            except ValueError:
+                break
+        else:
+            break
+    return max(start, end)
+
+
+def audio_payload_range(data):
+    """(начало, конец) звуковых данных файла без тегов и служебных блоков.
+
+    data — bytes или mmap. Формат определяется по сигнатуре: FLAC — кадры после блоков
+    метаданных, WAV — чанк data, MP4 — атом mdat, остальное (MPEG) — файл без тегов по краям.
+    """
+    size = len(data)
+    start = _skip_id3v2(data, 0)
+    if data[start:start + 4] == b"fLaC":
+        pos = start + 4
+        while pos + 4 <= size:
+            header = data[pos]
+            pos += 4 + int.from_bytes(data[pos + 1:pos + 4], "big")
+            if header & 0x80:  # последний блок метаданных
+                break
+        pos = min(pos, size)
+        return pos, _strip_trailing_tags(data, pos, size)
+    if data[start:start + 4] == b"RIFF" and data[start + 8:start + 12] == b"WAVE":
+        pos = start + 12
+        while pos + 8 <= size:
+            chunk_size = int.from_bytes(data[pos + 4:pos + 8], "little")
+            if data[pos:pos + 4] == b"data":
+                return pos + 8, min(size, pos + 8 + chunk_size)
+            pos += 8 + chunk_size + (chunk_size & 1)
+        return start, size
+    if data[start + 4:start + 8] == b"ftyp":
+        pos = start
+        while pos + 8 <= size:
+            atom_size, header = int.from_bytes(data[pos:pos + 4], "big"), 8
+            if atom_size == 1:
+                atom_size, header = int.from_bytes(data[pos + 8:pos + 16], "big"), 16
+            elif atom_size == 0:
+                atom_size = size - pos
+            if atom_size < header:
+                break
+            if data[pos + 4:pos + 8] == b"mdat":
+                return pos + header, min(size, pos + atom_size)
+            pos += atom_size
+        return start, size
+    return start, _strip_trailing_tags(data, start, size)
+
+
+def fingerprint_file(path, full=False):
+    """Отпечаток звуковых данных файла: "версия:длина:blake2b" или None для пустого файла.
+
+    Теги в отпечаток не входят — копия с другими тегами (или после их правки) совпадает
+    с оригиналом. Без full файл не читается целиком: хэшируются начало, середина и конец
+    звуковых данных по FINGERPRINT_SAMPLE_BYTES (короткие — полностью). Такой отпечаток
+    только отбирает кандидатов: совпавшие подтверждаются хэшем всех данных (full=True).
+    """
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None  # пустой файл
+        with data:
+            start, end = audio_payload_range(data)
+            length = end - start
+            if length <= 0:
+                return None
+            sample = FINGERPRINT_SAMPLE_BYTES
+            if full or length <= 3 * sample:
+                spans = [(start, end)]
+            else:
+                middle = start + (length - sample) // 2
+                spans = [(start, start + sample), (middle, middle + sample), (end - sample, end)]
+            digest = hashlib.blake2b(digest_size=16)
+            for span_start, span_end in spans:
+                for pos in range(span_start, span_end, FINGERPRINT_CHUNK):
+                    digest.update(data[pos:min(span_end, pos + FINGERPRINT_CHUNK)])
+    return f"{FINGERPRINT_VERSION}:{length}:{digest.hexdigest()}"
+
+
+def fingerprint_is_full(fingerprint):
+    """Отпечаток покрывает все звуковые данные (файл короче трёх выборок) — подтверждать нечего."""
+    return int(fingerprint.split(":")[1]) <= 3 * FINGERPRINT_SAMPLE_BYTES
+
+
+class MetadataCache:
+    """Постоянный кэш метаданных треков.
+
+    Ключ — путь к файлу, запись считается актуальной, пока совпадают mtime и size.
+    Записи живут в таблице metadata LibraryStore; save() отдаёт туда только изменённые.
+    Обложки хранятся отдельно в COVERS_DIR по sha1 содержимого, поэтому одинаковые
+    обложки альбома лежат на диске один раз.
+    """
+
+    AUDIO_KEYS = ("analysis", "fingerprint", "payload_hash")  # посчитаны по звуку, а не по тегам
+
+    def __init__(self, store=None, covers_dir=COVERS_DIR):
+        self.store = store
+        self.covers_dir = covers_dir
+        self.records = {}
+        self._dirty = set()           # пути, чьи записи изменились с последнего save
+
+    def load(self):
+        try:
+            self.records = self.store.load_metadata() if self.store is not None else {}
+        except Exception as e:
+            print("Ошибка при загрузке кэша метаданных:", e)
+            self.records = {}
+        self._dirty.clear()
+
+    def save(self):
+        if not self._dirty or self.store is None:
+            return
+        for path in self._dirty:
+            self.store.put_metadata(path, self.records.get(path))
+        self._dirty.clear()
+
+    def get(self, filepath):
+        """Запись из кэша; файл разбирается только если его ещё нет в кэше."""
+        record = self.records.get(filepath)
+        if record is None:
+            record = self._parse(filepath)
+        return record
+
+    @staticmethod
+    def is_outdated(filepath, record):
+        """Запись прочитана прежней версией разбора и для этого формата неполна.
+
+        MP3 и раньше читались целиком (ID3), их записи не перечитываются.
+        """
+        return (record.get("version", 1) < METADATA_VERSION
+                and not filepath.lower().endswith(".mp3"))
+
+    def outdated(self, paths):
+        return [p for p in paths if p in self.records and self.is_outdated(p, self.records[p])]
+
+    def is_fresh(self, filepath, st=None):
+        record = self.records.get(filepath)
+        if record is None or self.is_outdated(filepath, record):
+            return False
+        try:
+            if st is None:
+                st = os.stat(filepath)
+        except OSError:
+            return False
+        return record.get("mtime") == st.st_mtime and record.get("size") == st.st_size
+
+    def refresh(self, filepath):
+        """Проверяет mtime/size и перечитывает файл, только если он изменился."""
+        if not self.is_fresh(filepath):
+            self._parse(filepath)
+        return self.records.get(filepath)
+
+    def invalidate(self, filepath):
+        if self.records.pop(filepath, None) is not None:
+            self._dirty.add(filepath)
+
+    def reread(self, filepath):
+        """Перечитывает теги после их правки; анализ и отпечаток остаются — звук не менялся."""
+        old = self.records.get(filepath)
+        record = self._parse(filepath)
+        if old is not None and filepath in self.records:
+            for key in self.AUDIO_KEYS:
+                if key in old:
+                    record.setdefault(key, old[key])
+        return record
+
+    def rename(self, old, new):
+        """Запись (теги, анализ) переезжает вместе с файлом: mtime и size при переименовании не меняются."""
+        record = self.records.pop(old, None)
+        if record is not None:
+            self.records[new] = record
+            self._dirty.update((old, new))
+
+    def update(self, filepath, record, cover_data=None):
+        if cover_data:
+            self.store_cover(record["cover"], cover_data)
+        self.records[filepath] = record
+        self._dirty.add(filepath)
+
+    def _parse(self, filepath):
+        try:
+            record, cover_data = read_track_metadata(filepath)
+        except OSError:
+            # файла нет — отдаём пустую запись, но не кэшируем её
+            return {"title": None, "artists": [], "album": None, "year": "", "duration": 0, "cover": None,
+                    "replaygain": None, "replaygain_peak": None}
+        self.update(filepath, record, cover_data)
+        return record
+
+    # ---------- обложки ----------
+    def store_cover(self, cover_hash, data):
+        store_cover_file(self.covers_dir, cover_hash, data)
+
+    def known_stat(self, filepath):
+        record = self.records.get(filepath)
+        if record is None or self.is_outdated(filepath, record):
+            return None
+        return record.get("mtime"), record.get("size")
+
+# ------------------------------------------------------------------
+# Кэш уменьшенных обложек
+# ------------------------------------------------------------------
+def read_scaled_image(path, size, rounded=False):
+    """Декодирует картинку сразу в нужный размер (JPEG масштабируется ещё при декодировании).
+
+    rounded=True — центральный квадрат, обрезанный по кругу (как аватар исполнителя).
+    Работает только с QImage, поэтому безопасна для фоновых потоков.
+    """
+    reader = QImageReader(path)
+    source = reader.size()
+    if source.isValid() and source.width() > 0 and source.height() > 0:
+        if rounded:
+            scale = size / min(source.width(), source.height())
+        else:
+            scale = min(size / source.width(), size / source.height())
+        if scale < 1.0:
+            reader.setScaledSize(QSize(max(1, round(source.width() * scale)), max(1, round(source.height() * scale))))
+    image = reader.read()
+    if image.isNull():
+        return image
+    if rounded:
+        return round_image(image, size)
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image
+
+
+def round_image(image, size):
+    """Круглая версия картинки size x size (центральный квадрат исходника)."""
+    side = min(image.width(), image.height())
+    if side == 0:
+        return QImage()
+    square = image.copy((image.width() - side) // 2, (image.height() - side) // 2, side, side)
+    if side != size:
+        square = square.scaled(size, size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    result = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    result.fill(Qt.transparent)
+    painter = QPainter(result)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
+    clip = QPainterPath()
+    clip.addEllipse(0, 0, size, size)
+    painter.setClipPath(clip)
+    painter.drawImage(0, 0, square)
+    painter.end()
+    return result
+
+
+class CoverCache:
+    """Уменьшенные обложки: ограниченный LRU в памяти + каталог миниатюр на диске.
+
+    Ключ — (хэш обложки, размер, круглая ли). Оригинал из COVERS_DIR декодируется один раз
+    на каждый размер, дальше миниатюра читается с диска (маленький файл) или из памяти.
+    """
+
+    def __init__(self, covers_dir=COVERS_DIR, thumbs_dir=THUMBS_DIR, max_items=THUMBNAIL_MEMORY_ITEMS):
+        self.covers_dir = covers_dir
+        self.thumbs_dir = thumbs_dir
+        self.max_items = max_items
+        self._pixmaps = OrderedDict()   # key -> QPixmap, только GUI-поток
+        self._disk_lock = threading.Lock()
+
+    def thumb_path(self, cover_hash, size, rounded=False):
+        suffix = "r.png" if rounded else ".jpg"
+        return os.path.join(self.thumbs_dir, f"{cover_hash}_{size}{suffix}")
+
+    def load_image(self, cover_hash, size, rounded=False):
+        """QImage миниатюры: с диска или из оригинала (с сохранением на диск). Потокобезопасно."""
+        path = self.thumb_path(cover_hash, size, rounded)
+        if os.path.exists(path):
+            image = QImage(path)
+            if not image.isNull():
+                return image
+        image = read_scaled_image(os.path.join(self.covers_dir, cover_hash), size, rounded)
+        if not image.isNull():
+            self._save_thumb(path, image)
+        return image
+
+    def _save_thumb(self, path, image):
+        try:
+            with self._disk_lock:
+                os.makedirs(self.thumbs_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            if image.save(tmp_path, "PNG" if path.endswith(".png") else "JPG", 90):
+                os.replace(tmp_path, path)
+        except Exception as e:
+            print("Ошибка при сохранении миниатюры:", e)
+
+    def cached_pixmap(self, cover_hash, size, rounded=False):
+        key = (cover_hash, size, rounded)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def put_image(self, cover_hash, size, rounded, image):
+        pixmap = QPixmap.fromImage(image)
+        self._pixmaps[(cover_hash, size, rounded)] = pixmap
+        if len(self._pixmaps) > self.max_items:
+            self._pixmaps.popitem(last=False)
+        return pixmap
+
+    def pixmap(self, cover_hash, size, rounded=False):
+        """QPixmap миниатюры (GUI-поток); None, если обложку не удалось прочитать."""
+        pixmap = self.cached_pixmap(cover_hash, size, rounded)
+        if pixmap is not None:
+            return pixmap
+        image = self.load_image(cover_hash, size, rounded)
+        if image.isNull():
+            return None
+        return self.put_image(cover_hash, size, rounded, image)
+
+class CoverLoaderSignals(QObject):
+    ready = pyqtSignal(object, object)    # key, QImage
+
+
+class CoverTask(QRunnable):
+    """Фоновая загрузка одной миниатюры (только QImage — он потокобезопасен)."""
+
+    def __init__(self, cache, key, signals):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.cache = cache
+        self.key = key
+        self.signals = signals
+        self.cancelled = False
+
+    def run(self):
+        if self.cancelled:
+            return
+        image = self.cache.load_image(*self.key)
+        if not self.cancelled:
+            self.signals.ready.emit(self.key, image)
+
+
+class CoverLoader(QObject):
+    """Асинхронная выдача миниатюр из CoverCache.
+
+    request() сразу возвращает готовый pixmap из памяти, иначе ставит задачу в QThreadPool и
+    позже вызывает callback в GUI-потоке. Запросы привязываются к владельцу (обычно layout
+    страницы); cancel(owner) снимает их, когда страница пересоздаётся.
+    """
+    loaded = pyqtSignal(object)           # key — для моделей списков
+
+    def __init__(self, cache, threads=COVER_LOADER_THREADS, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(threads)
+        self.signals = CoverLoaderSignals()
+        self.signals.ready.connect(self._on_ready)
+        self._tasks = {}                  # key -> CoverTask
+        self._waiters = {}                # key -> [(owner, callback)]
+
+    def request(self, cover_hash, size, rounded=False, owner=None, callback=None):
+        pixmap = self.cache.cached_pixmap(cover_hash, size, rounded)
+        if pixmap is not None:
+            return pixmap
+        key = (cover_hash, size, rounded)
+        self._waiters.setdefault(key, []).append((owner, callback))
+        if key not in self._tasks:
+            task = CoverTask(self.cache, key, self.signals)
+            self._tasks[key] = task
+            self.pool.start(task)
+        return None
+
+    def cancel(self, owner):
+        for key in list(self._waiters):
+            waiters = [w for w in self._waiters[key] if w[0] is not owner]
+            if waiters:
+                self._waiters[key] = waiters
+                continue
+            del self._waiters[key]
+            task = self._tasks.pop(key, None)
+            if task is not None:
+                task.cancelled = True
+                self.pool.tryTake(task)
+
+    def _on_ready(self, key, image):
+        task = self._tasks.pop(key, None)
+        waiters = self._waiters.pop(key, [])
+        if task is None or task.cancelled or image.isNull():
+            return
+        pixmap = self.cache.put_image(*key, image)
+        for owner, callback in waiters:
+            if callback is None:
+                continue
+            try:
+                callback(pixmap)
+            except RuntimeError:
+                # виджет уже удалён Qt
+                pass
+        self.loaded.emit(key)
+
+# ------------------------------------------------------------------
+# Модель библиотеки
+# ------------------------------------------------------------------
+class LibraryModel:
+    """Треки библиотеки и индексы альбомов/исполнителей.
+
+    Каждый путь получает постоянный id. Альбомы и исполнители хранят id треков в
+    упорядоченных словарях (postings), а обратный индекс id -> (альбом, исполнители)
+    позволяет убрать трек из всех корзин без перебора. paths — порядок воспроизведения.
+    """
+    CUT_LIMIT = 32       # до стольких удаляемых треков paths правится по позициям, а не пересобирается
+    STALE_LOOKUPS = 16   # столько index_of после удаления ищут позицию в списке, дальше позиции пересчитываются
+
+    def __init__(self):
+        self.paths = []
+        self._ids = {}             # path -> id
+        self._by_id = {}           # id -> path
+        self._positions = {}       # id -> позиция в paths; верна только для позиций < _valid_upto
+        self._valid_upto = 0
+        self._stale_lookups = 0
+        self._next_id = 0
+        self.albums = {}           # альбом -> {id: None}
+        self.artists = {}          # исполнитель -> {id: None}
+        self.album_names = []      # непустые имена альбомов по алфавиту (для главной)
+        self.artist_names = []     # то же для исполнителей
+        self._keys = {}            # id -> (альбом, [исполнители])
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, path):
+        return path in self._ids
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def id_of(self, path):
+        return self._ids.get(path)
+
+    def path_of(self, track_id):
+        return self._by_id.get(track_id)
+
+    def add(self, path):
+        """Добавляет путь в конец; возвращает id или None, если трек уже есть."""
+        if path in self._ids:
+            return None
+        track_id = self._next_id
+        self._next_id += 1
+        self._ids[path] = track_id
+        self._by_id[track_id] = path
+        if self._valid_upto == len(self.paths):
+            self._positions[track_id] = len(self.paths)
+            self._valid_upto += 1
+        self.paths.append(path)
+        return track_id
+
+    def reset(self, paths):
+        self.__init__()
+        for p in paths:
+            self.add(p)
+
+    def remove_many(self, paths):
+        """Удаляет пути из библиотеки и индексов; возвращает множество реально удалённых.
+
+        Несколько треков вырезаются из paths по позициям, большая пачка — одним проходом
+        с первой удалённой позиции. Позиции после неё пересчитываются лениво, в index_of.
+        """
+        gone = {}
+        for p in paths:
+            track_id = self._ids.get(p)
+            if track_id is None or p in gone:
+                continue
+            gone[p] = self._position(p, track_id)
+            self.unindex(p, track_id)
+            del self._ids[p]
+            del self._by_id[track_id]
+            self._positions.pop(track_id, None)
+        if not gone:
+            return set()
+        self._stale_lookups = 0
+        first = min(gone.values())
+        if len(gone) <= self.CUT_LIMIT:
+            for position in sorted(gone.values(), reverse=True):
+                del self.paths[position]
+        else:
+            self.paths[first:] = [p for p in self.paths[first:] if p not in gone]
+        self._valid_upto = min(self._valid_upto, first)
+        return set(gone)
+
+    def rename(self, old, new):
+        """Переименованный файл: трек сохраняет id, место в paths и записи в индексах.
+
+        Если new уже в библиотеке (файл перемещён поверх другого трека), прежний трек new удаляется.
+        """
+        if new in self._ids and new != old:
+            self.remove_many([new])
+        position = self.index_of(old)
+        track_id = self._ids.pop(old)
+        self._ids[new] = track_id
+        self._by_id[track_id] = new
+        self.paths[position] = new
+
+    def index_of(self, path):
+        track_id = self._ids.get(path)
+        if track_id is None:
+            raise ValueError(path)
+        position = self._positions.get(track_id)
+        if position is not None and position < self._valid_upto:
+            return position
+        if self._stale_lookups < self.STALE_LOOKUPS:
+            # после удаления обычно нужна одна-две позиции (текущий трек): поиск по списку дешевле пересчёта
+            self._stale_lookups += 1
+            return self.paths.index(path, self._valid_upto)
+        start = self._valid_upto
+        self._positions.update(zip(map(self._ids.__getitem__, self.paths[start:]), range(start, len(self.paths))))
+        self._valid_upto = len(self.paths)
+        self._stale_lookups = 0
+        return self._positions[track_id]
+
+    def _position(self, path, track_id):
+        position = self._positions.get(track_id)
+        if position is not None and position < self._valid_upto:
+            return position
+        return self.paths.index(path, self._valid_upto)
+
+    # ---------- индексы ----------
+    def index(self, path, album, artists):
+        track_id = self._ids.get(path)
+        if track_id is None:
+            return
+        self.unindex(path, track_id)
+        self._keys[track_id] = (album, artists)
+        for postings, names, name in [(self.albums, self.album_names, album)] + \
+                [(self.artists, self.artist_names, a) for a in artists]:
+            bucket = postings.get(name)
+            if bucket is None:
+                bucket = postings[name] = {}
+                if name:
+                    bisect.insort(names, name)
+            bucket[track_id] = None
+
+    def unindex(self, path, track_id=None):
+        if track_id is None:
+            track_id = self._ids.get(path)
+        keys = self._keys.pop(track_id, None)
+        if keys is None:
+            return
+        album, artists = keys
+        for postings, names, name in [(self.albums, self.album_names, album)] + \
+                [(self.artists, self.artist_names, a) for a in artists]:
+            bucket = postings.get(name)
+            if bucket is None:
+                continue
+            bucket.pop(track_id, None)
+            if not bucket:
+                del postings[name]
+                if name:
+                    del names[bisect.bisect_left(names, name)]
+
+    def keys_of(self, path):
+        return self._keys.get(self._ids.get(path))
+
+    def album_tracks(self, album):
+        return [self._by_id[i] for i in self.albums.get(album, ())]
+
+    def artist_tracks(self, artist):
+        return [self._by_id[i] for i in self.artists.get(artist, ())]
+
+    def first_album_track(self, album):
+        bucket = self.albums.get(album)
+        return self._by_id[next(iter(bucket))] if bucket else None
+
+    def first_artist_track(self, artist):
+        bucket = self.artists.get(artist)
+        return self._by_id[next(iter(bucket))] if bucket else None
+
+# ------------------------------------------------------------------
+# Поисковый индекс
+# ------------------------------------------------------------------
+_WORD_RE = re.compile(r"\w+")
+
+
+def fold_text(text):
+    """Нижний регистр без диакритики: 'Café' -> 'cafe', 'Ёлка' -> 'елка' (й сохраняется)."""
+    text = str(text).casefold().replace("ё", "е")
+    if text.isascii():
+        return text
+    folded = []
+    for ch in text:
+        if ch == "й" or ch.isascii():
+            folded.append(ch)
+            continue
+        folded.append("".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c)))
+    return "".join(folded)
+
+
+def tokenize(text):
+    return _WORD_RE.findall(fold_text(text))
+
+
+class SearchIndex:
+    """Инвертированный индекс по названию/исполнителю/альбому.
+
+    Токен -> {id трека: вес поля}. Префиксы ищутся двоичным поиском по отсортированному
+    словарю, подстроки внутри слов — через триграммы словаря. Индекс обновляется по одному
+    треку (add/remove), полной пересборки не требуется.
+    """
+    FIELD_WEIGHTS = {"title": 3.0, "artist": 2.0, "album": 1.0}
+    PROBE_COST = 1   # во сколько токенов развёртки слова обходится проверка одного трека по его токенам
+
+    def __init__(self):
+        self._postings = {}      # токен -> {id: вес}
+        self._docs = {}          # id -> {токен: вес}
+        self._vocabulary = []    # отсортированные токены
+        self._trigrams = {}      # триграмма -> {токен}
+        # запросы выполняются в фоне, изменения — в GUI-потоке
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, track_id, title, artists, album):
+        with self.lock:
+            self._add(track_id, title, artists, album)
+
+    def add_many(self, items):
+        """Пакетное добавление (track_id, title, artists, album): словарь сортируется один раз на пачку."""
+        with self.lock:
+            new_tokens = []
+            for item in items:
+                self._add(*item, new_tokens=new_tokens)
+            # токен мог опустеть внутри той же пачки (повторный id) — такой в словарь не нужен
+            new_tokens = [t for t in new_tokens if t in self._postings]
+            if new_tokens:
+                self._vocabulary.extend(new_tokens)
+                self._vocabulary.sort()
+
+    def _add(self, track_id, title, artists, album, new_tokens=None):
+        self._remove(track_id)
+        tokens = {}
+        for field, text in (("title", title), ("artist", " ".join(artists)), ("album", album or "")):
+            weight = self.FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                if tokens.get(token, 0) < weight:
+                    tokens[token] = weight
+        self._docs[track_id] = tokens
+        for token, weight in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if new_tokens is None:
+                    bisect.insort(self._vocabulary, token)
+                else:
+                    new_tokens.append(token)
+                for gram in self._grams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+            postings[track_id] = weight
+
+    def remove(self, track_id):
+        with self.lock:
+            self._remove(track_id)
+
+    def _remove(self, track_id):
+        tokens = self._docs.pop(track_id, None)
+        if not tokens:
+            return
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(track_id, None)
+            if not postings:
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocabulary, token)
+                if i < len(self._vocabulary) and self._vocabulary[i] == token:
+                    del self._vocabulary[i]
+                for gram in self._grams(token):
+                    bucket = self._trigrams.get(gram)
+                    if bucket is not None:
+                        bucket.discard(token)
+                        if not bucket:
+                            del self._trigrams[gram]
+
+    def clear(self):
+        with self.lock:
+            self._postings = {}
+            self._docs = {}
+            self._vocabulary = []
+            self._trigrams = {}
+
+    @staticmethod
+    def _grams(token):
+        return {token[i:i + 3] for i in range(len(token) - 2)}
+
+    def _expand(self, term, capped=True):
+        """Токены словаря для слова запроса: {токен: множитель релевантности}.
+
+        Короткий префикс (1–2 буквы) при capped разворачивается только в самые короткие слова,
+        пока у них не наберётся SEARCH_SHORT_PREFIX_POSTINGS треков: иначе «к» тянет за собой
+        десятки тысяч треков, а лучшие совпадения всё равно среди коротких слов.
+        """
+        matches = {}
+        lo = bisect.bisect_left(self._vocabulary, term)
+        hi = bisect.bisect_left(self._vocabulary, term + "\uffff", lo)
+        tokens = self._vocabulary[lo:hi]
+        if capped and len(term) <= SEARCH_SHORT_PREFIX:
+            tokens.sort(key=len)
+            total = 0
+            for token in tokens:
+                matches[token] = 2.0 if token == term else 1.5
+                total += len(self._postings[token])
+                if total >= SEARCH_SHORT_PREFIX_POSTINGS:
+                    break
+            return matches
+        for token in tokens:
+            matches[token] = 2.0 if token == term else 1.5
+        if len(term) >= 3:
+            candidates = None
+            for gram in self._grams(term):
+                bucket = self._trigrams.get(gram)
+                if not bucket:
+                    return matches
+                candidates = set(bucket) if candidates is None else candidates & bucket
+            for token in candidates or ():
+                if token not in matches and term in token:
+                    matches[token] = 1.0
+        return matches
+
+    def search(self, query, should_stop=None, limit=SEARCH_RESULT_LIMIT):
+        """До limit id треков, подходящих под все слова запроса, по убыванию релевантности.
+
+        None — пустой запрос (подходит всё). should_stop() позволяет прервать устаревший запрос.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return None
+        with self.lock:
+            return self._search(terms, should_stop, limit)
+
+    @staticmethod
+    def _term_score(matches, tokens):
+        """Оценка слова запроса по токенам одного трека; matches — его развёртка из _expand."""
+        if matches.keys().isdisjoint(tokens):
+            return 0
+        return max(tokens[token] * matches[token] for token in matches.keys() & tokens.keys())
+
+    def _search(self, terms, should_stop, limit):
+        # набор кандидатов задаёт самое редкое слово запроса (короткий префикс — только если
+        # длинных слов нет, и только он урезается по SEARCH_SHORT_PREFIX_POSTINGS); остальные
+        # слова разворачиваются полностью и оцениваются только на подошедших треках
+        # (пересечение до оценки): по их токенам, если кандидатов мало, иначе по записям индекса
+        terms = list(dict.fromkeys(terms))
+        drivers = [term for term in terms if len(term) > SEARCH_SHORT_PREFIX] or terms
+        expanded = []
+        for term in drivers:
+            matches = self._expand(term)
+            if not matches:
+                return []
+            expanded.append((self._postings_size(matches), term, matches))
+        expanded.sort(key=lambda item: item[0])
+        driver = expanded[0][1]
+        scores = {}
+        for token, boost in expanded[0][2].items():
+            for track_id, weight in self._postings[token].items():
+                score = weight * boost
+                if scores.get(track_id, 0) < score:
+                    scores[track_id] = score
+        rest = [item for item in expanded[1:] if len(item[1]) > SEARCH_SHORT_PREFIX]
+        for term in terms:
+            if term != driver and len(term) <= SEARCH_SHORT_PREFIX:
+                matches = self._expand(term, capped=False)
+                rest.append((self._postings_size(matches), term, matches))
+        rest.sort(key=lambda item: item[0])
+        for size, term, matches in rest:
+            if should_stop is not None and should_stop():
+                return []
+            narrowed = {}
+            if len(scores) <= len(matches) * self.PROBE_COST:
+                for track_id, score in scores.items():
+                    extra = self._term_score(matches, self._docs[track_id])
+                    if extra:
+                        narrowed[track_id] = score + extra
+            else:
+                term_scores = {}
+                candidates = scores.keys()
+                for token, boost in matches.items():
+                    track_postings = self._postings[token]
+                    for track_id in candidates & track_postings.keys():
+                        score = track_postings[track_id] * boost
+                        if term_scores.get(track_id, 0) < score:
+                            term_scores[track_id] = score
+                for track_id, extra in term_scores.items():
+                    narrowed[track_id] = scores[track_id] + extra
+            scores = narrowed
+            if not scores:
+                return []
+        return self._top(scores, limit)
+
+    def _postings_size(self, matches):
+        return sum(len(self._postings[token]) for token in matches)
+
+    @staticmethod
+    def _top(scores, limit):
+        """limit лучших id: по убыванию оценки, при равенстве — по id.
+
+        Разных оценок немного (вес поля × множитель), поэтому сначала ищется порог,
+        на котором набирается limit треков, и сортируются только треки не ниже него.
+        """
+        if len(scores) > limit:
+            counts = {}
+            for score in scores.values():
+                counts[score] = counts.get(score, 0) + 1
+            total = 0
+            for cut in sorted(counts, reverse=True):
+                total += counts[cut]
+                if total >= limit:
+                    break
+            top = sorted(t for t, score in scores.items() if score >= cut)
+        else:
+            top = sorted(scores)
+        top.sort(key=scores.__getitem__, reverse=True)  # сортировка устойчива: при равной оценке id по возрастанию
+        return top[:limit]
+
+class DuplicateIndex:
+    """Корзины дубликатов: отпечаток -> пути и (название, исполнители) -> пути.
+
+    Дубликаты — одинаковые звуковые данные (отпечаток, подтверждённый хэшем всех данных
+    confirm) или, для одной записи в разных форматах, одинаковые название и исполнители
+    при длительности в пределах tolerance. Как и SearchIndex, обновляется по одному треку;
+    groups() обходит только корзины, где больше одного трека.
+    """
+
+    def __init__(self, tolerance=DUPLICATE_DURATION_TOLERANCE):
+        self.tolerance = tolerance
+        self._entries = {}          # path -> (fingerprint, title_key, duration, confirm)
+        self._prints = {}           # fingerprint -> {path}
+        self._titles = {}           # title_key -> {path}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, path, fingerprint, title_key, duration, confirm=None):
+        self.remove(path)
+        self._entries[path] = (fingerprint, title_key, duration, confirm)
+        if fingerprint:
+            self._prints.setdefault(fingerprint, set()).add(path)
+        if title_key and duration:
+            self._titles.setdefault(title_key, set()).add(path)
+
+    def remove(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return
+        fingerprint, title_key, _, _ = entry
+        for buckets, key in ((self._prints, fingerprint), (self._titles, title_key)):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(path)
+                if not bucket:
+                    del buckets[key]
+
+    def rename(self, old, new):
+        entry = self._entries.get(old)
+        if entry is not None:
+            self.remove(old)
+            self.update(new, *entry)
+
+    def groups(self, key=None):
+        """Группы дубликатов (от двух путей), пути в каждой упорядочены по key."""
+        parent = {}
+
+        def find(path):
+            root = path
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while path != root:
+                parent[path], path = root, parent[path]
+            return root
+
+        def union(a, b):
+            a, b = find(a), find(b)
+            if a != b:
+                parent[b] = a
+
+        for bucket in self._prints.values():
+            if len(bucket) > 1:
+                # совпадение выборок — ещё не дубликат: объединяются только треки с одинаковым хэшем всех данных
+                first = {}
+                for path in bucket:
+                    confirm = self._entries[path][3]
+                    if confirm:
+                        union(first.setdefault(confirm, path), path)
+        for bucket in self._titles.values():
+            if len(bucket) > 1:
+                items = sorted((self._entries[p][2], p) for p in bucket)
+                for (d1, p1), (d2, p2) in zip(items, items[1:]):
+                    if d2 - d1 <= self.tolerance:
+                        union(p1, p2)
+        groups = {}
+        for path in list(parent):   # в parent только не-корни, корень добавляется отдельно
+            groups.setdefault(find(path), []).append(path)
+        for root, group in groups.items():
+            group.append(root)
+        return [sorted(group, key=key) for group in groups.values()]
+
+    def unconfirmed(self):
+        """Треки с совпавшим отпечатком, которым ещё нужен хэш всех данных."""
+        return [path for bucket in self._prints.values() if len(bucket) > 1
+                for path in bucket if not self._entries[path][3]]
+
+
+class SearchSignals(QObject):
+    done = pyqtSignal(int, str, object, float)   # generation, query, ids | None, время запроса (мс)
+
+
+class SearchTask(QRunnable):
+    """Выполняет запрос к SearchIndex в фоне; устаревшие запросы прерываются по поколению."""
+
+    def __init__(self, index, query, generation, current_generation, signals):
+        super().__init__()
+        self.index = index
+        self.query = query
+        self.generation = generation
+        self.current_generation = current_generation   # callable -> номер актуального запроса
+        self.signals = signals
+
+    def is_stale(self):
+        return self.generation != self.current_generation()
+
+    def run(self):
+        if self.is_stale():
+            return
+        started = time.perf_counter()
+        ids = self.index.search(self.query, should_stop=self.is_stale)
+        if self.is_stale():
+            return
+        self.signals.done.emit(self.generation, self.query, ids, (time.perf_counter() - started) * 1000.0)
+
 # ------------------------------------------------------------------
 # Вспомогательные классы: фоновые потоки
 # ------------------------------------------------------------------
+def filesystem_type(path):
+    """Тип файловой системы пути (ext4, btrfs, nfs, fuseblk...) по /proc/self/mounts; None, где так не узнать."""
+    real = os.path.realpath(path)
+    best_mount, best_type = "", None
+    try:
+        with open("/proc/self/mounts", "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount = parts[1].replace("\\040", " ")
+                if (real == mount or real.startswith(mount.rstrip("/") + "/")) and len(mount) >= len(best_mount):
+                    best_mount, best_type = mount, parts[2]
+    except OSError:
+        return None
+    return best_type
+
+
+def scan_excluded(path, name):
+    """Каталог попадает под SCAN_EXCLUDE: шаблоны с "/" сверяются с полным путём, остальные — с именем."""
+    for pattern in SCAN_EXCLUDE:
+        if "/" in pattern:
+            if fnmatch.fnmatch(path.replace(os.sep, "/"), pattern):
+                return True
+        elif fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+
 class ScannerThread(QThread):
-    """Фоновый сканер файлов. Возвращает найденные пути и прогресс."""
+    """Фоновый сканер файлов на os.scandir. Отдаёт найденные пути пачками и прогресс.
+
+    Обход ограничен: глубина max_depth от корня, каталоги из SCAN_EXCLUDE пропускаются,
+    каталог-ссылка на уже пройденный каталог (то же устройство и inode) не проходится
+    повторно, с одной файловой системы берётся не больше SCAN_FS_DIR_LIMIT каталогов.
+
+    Запоминает mtime каталогов и (size, mtime) файлов в SCAN_CACHE_FILE. В инкрементальном
+    режиме каталог с неизменившимся mtime не перечитывается (его список файлов и подкаталогов
+    берётся из кэша), но файлы из этого списка всё равно проверяются stat: правка файла на месте
+    (теги, перекодирование) mtime каталога не меняет. Наружу отдаются только
+    добавленные/удалённые/изменённые файлы.
+
+    Раз в SCAN_STATS_INTERVAL отдаёт stats: пройдено каталогов и файлов, скорость, доля и
+    оставшееся время. Долю даёт expected_dirs (число каталогов прошлого такого же скана),
+    а без него — сколько подкаталогов первого уровня корня уже пройдено. Итог скана —
+    в result_stats (пусто, если скан остановлен).
+    """
     progress = pyqtSignal(int)            # percent
-    result = pyqtSignal(list)             # list of file paths
+    stats = pyqtSignal(dict)              # промежуточная статистика, см. _report
+    found = pyqtSignal(list)              # пачка найденных путей (полный скан)
+    changes = pyqtSignal(list, list, list)  # added, removed, modified
     message = pyqtSignal(str)
 
-    def __init__(self, paths, deep=False):
+    def __init__(self, paths, deep=False, incremental=False, known=None, cache_file=SCAN_CACHE_FILE,
+                 max_depth=None, expected_dirs=None):
         super().__init__()
         self.paths = paths
         self.stop_requested = False
         self.deep = deep
+        self.incremental = incremental
+        self.known = known if known is not None else set()   # пути, уже лежащие в библиотеке
+        self.cache_file = cache_file
+        self.max_depth = max_depth if max_depth is not None else (SCAN_MAX_DEPTH_DEEP if deep else SCAN_MAX_DEPTH)
+        self.expected_dirs = expected_dirs
+        self.result_stats = {}
 
     def run(self):
-        found = []
-        total_paths = len(self.paths)
-        processed = 0
-        for base in self.paths:
+        old_dirs = self._load_cache()
+        new_dirs = {}
+        added = {}
+        removed = []
+        modified = []
+        self._visited = set()             # (st_dev, st_ino) пройденных каталогов
+        self._per_device = {}             # st_dev -> сколько каталогов пройдено
+        self._truncated = []              # каталоги, не пройденные из-за лимита (их файлы не считаем удалёнными)
+        self._pending = []
+        self._emitted = 0
+        started_at = time.time()
+        self._started = self._last_report = time.perf_counter()
+        self._dirs = self._dirs_read = self._files = 0
+        self._root_index = 0
+        self._top_total = self._top_started = 0   # подкаталоги первого уровня текущего корня
+        per_root = {}
+        scanned_roots = []
+        for self._root_index, base in enumerate(self.paths):
             if self.stop_requested:
                 break
             self.message.emit(f"Сканирование: {base}")
-            # Если deep - рекурсивно по всему диску (опасно долго). По умолчанию ищем в common папках.
+            # Недоступный корень (отключённый диск, NAS) пропускаем, не считая его файлы удалёнными
             if os.path.exists(base):
-                for root, dirs, files in os.walk(base):
+                scanned_roots.append(os.path.join(base, ""))
+                root_started, dirs, files = time.perf_counter(), self._dirs, self._files
+                self._top_total = self._top_started = 0
+                self._walk(base, old_dirs, new_dirs, added, removed, modified)
+                per_root[base] = {"fs": filesystem_type(base), "dirs": self._dirs - dirs, "files": self._files - files,
+                                  "seconds": round(time.perf_counter() - root_started, 3)}
+            if self.stop_requested:
+                break
+        if not self.stop_requested:
+            # каталоги, исчезнувшие с прошлого скана (или теперь исключённые), — все их файлы удалены
+            truncated = tuple(os.path.join(d, "") for d in self._truncated)
+            for d, entry in old_dirs.items():
+                if d in new_dirs:
+                    continue
+                inside = os.path.join(d, "")
+                if any(inside.startswith(r) for r in scanned_roots) and not inside.startswith(truncated):
+                    removed.extend(os.path.join(d, name) for name in entry["files"])
+                else:
+                    # каталоги вне просканированных корней (или за лимитом) оставляем в кэше как есть
+                    new_dirs[d] = entry
+            self._save_cache(new_dirs)
+            self._flush_found()
+            self._report(force=True, fraction=1.0)
+            seconds = time.perf_counter() - self._started
+            self.result_stats = {
+                "started": started_at, "roots": list(self.paths), "deep": self.deep, "incremental": self.incremental,
+                "seconds": round(seconds, 3), "dirs": self._dirs, "dirs_read": self._dirs_read, "files": self._files,
+                "dirs_per_sec": round(self._dirs / max(seconds, 1e-6), 1),
+                "files_per_sec": round(self._files / max(seconds, 1e-6), 1),
+                "truncated": len(self._truncated), "per_root": per_root,
+            }
+            self.changes.emit(sorted(added), sorted(removed), sorted(modified))
+        if self._truncated:
+            self.message.emit(f"Сканирование завершено (лимит каталогов на диск, не пройдено: {len(self._truncated)}).")
+        else:
+            self.message.emit("Сканирование завершено.")
+
+    def _fraction(self):
+        if self.expected_dirs:
+            return min(0.99, self._dirs / self.expected_dirs)
+        # без прошлой статистики: корни поровну, внутри корня — по начатым подкаталогам первого уровня
+        inside = (self._top_started - 1) / self._top_total if self._top_total and self._top_started else 0.0
+        return min(0.99, (self._root_index + inside) / max(1, len(self.paths)))
+
+    def _report(self, force=False, fraction=None):
+        now = time.perf_counter()
+        if not force and now - self._last_report < SCAN_STATS_INTERVAL:
+            return
+        self._last_report = now
+        elapsed = now - self._started
+        if fraction is None:
+            fraction = self._fraction()
+        eta = elapsed * (1.0 - fraction) / fraction if fraction >= 0.01 else None
+        self.progress.emit(int(fraction * 100))
+        self.stats.emit({
+            "elapsed": elapsed, "dirs": self._dirs, "files": self._files,
+            "dirs_per_sec": self._dirs / max(elapsed, 1e-6), "files_per_sec": self._files / max(elapsed, 1e-6),
+            "percent": int(fraction * 100), "eta": eta,
+        })
+
+    def _emit_found(self, path):
+        if self.incremental:
+            return
+        self._pending.append(path)
+        if len(self._pending) >= SCAN_BATCH_SIZE:
+            self._flush_found()
+
+    def _flush_found(self):
+        if self._pending:
+            self.found.emit(self._pending)
+            self._emitted += len(self._pending)
+            self._pending = []
+
+    def _enter(self, path):
+        """Можно ли войти в каталог: не пройден ли он уже (петля ссылок) и не исчерпан ли лимит его диска."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (st.st_dev, st.st_ino)
+        if key in self._visited:
+            return None
+        count = self._per_device.get(st.st_dev, 0)
+        if count >= SCAN_FS_DIR_LIMIT:
+            self._truncated.append(path)
+            return None
+        self._visited.add(key)
+        self._per_device[st.st_dev] = count + 1
+        return st
+
+    def _walk(self, base, old_dirs, new_dirs, added, removed, modified):
+        stack = [(base, 0)]
+        links = []                        # каталоги-ссылки проходятся после настоящих: файл получает свой настоящий путь
+        while stack or links:
+            if self.stop_requested:
+                return
+            if not stack:
+                stack, links = links[::-1], []
+            path, depth = stack.pop()
+            if depth == 1:
+                self._top_started += 1
+            st = self._enter(path)
+            if st is None:
+                continue
+            self._dirs += 1
+            cached = old_dirs.get(path)
+            if self.incremental and cached is not None and cached["mtime"] == st.st_mtime:
+                # состав каталога не менялся — не читаем его заново, только сверяем (size, mtime) файлов
+                entry = {"mtime": st.st_mtime, "files": {}, "dirs": cached["dirs"], "links": cached.get("links", [])}
+                for name in cached["files"]:
+                    try:
+                        fst = os.stat(os.path.join(path, name))
+                    except OSError:
+                        continue  # исчез — попадёт в removed ниже
+                    entry["files"][name] = [fst.st_size, fst.st_mtime]
+            else:
+                self._dirs_read += 1
+                entry = {"mtime": st.st_mtime, "files": {}, "dirs": [], "links": []}
+                try:
+                    with os.scandir(path) as it:
+                        for e in it:
+                            try:
+                                if e.is_dir(follow_symlinks=False):
+                                    entry["dirs"].append(e.name)
+                                elif SCAN_FOLLOW_SYMLINKS and e.is_symlink() and e.is_dir():
+                                    entry["links"].append(e.name)
+                                elif e.name.lower().endswith(AUDIO_EXTS) and e.is_file():
+                                    fst = e.stat()
+                                    entry["files"][e.name] = [fst.st_size, fst.st_mtime]
+                            except OSError:
+                                continue
+                except OSError:
+                    continue
+            old_files = cached["files"] if cached is not None else {}
+            for name, sig in entry["files"].items():
+                old_sig = old_files.get(name)
+                if old_sig is None:
+                    added[os.path.join(path, name)] = None
+                elif list(old_sig) != sig:
+                    modified.append(os.path.join(path, name))
+            for name in old_files:
+                if name not in entry["files"]:
+                    removed.append(os.path.join(path, name))
+            new_dirs[path] = entry
+            self._files += len(entry["files"])
+            for name in entry["files"]:
+                full = os.path.join(path, name)
+                self._emit_found(full)
+                if full not in self.known:
+                    added[full] = None
+            pushed = len(stack) + len(links)
+            if depth < self.max_depth:
+                for d in reversed(entry["dirs"]):
+                    child = os.path.join(path, d)
+                    if not scan_excluded(child, d):
+                        stack.append((child, depth + 1))
+                for d in entry.get("links", ()):
+                    child = os.path.join(path, d)
+                    if not scan_excluded(child, d):
+                        links.append((child, depth + 1))
+            if depth == 0:
+                self._top_total += len(stack) + len(links) - pushed
+            self._report()
+
+    def _load_cache(self):
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == SCAN_CACHE_VERSION:
+                    return data.get("dirs", {})
+        except Exception as e:
+            print("Ошибка при загрузке кэша сканирования:", e)
+        return {}
+
+    def _save_cache(self, dirs):
+        try:
+            tmp_path = self.cache_file + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": SCAN_CACHE_VERSION, "dirs": dirs, "timestamp": time.time()}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            print("Ошибка при сохранении кэша сканирования:", e)
+
+    def stop(self):
+        self.stop_requested = True
+
+
+def print_scan_stats(limit=20):
+    """--scan-stats: таблица последних сканов — сравнить скорость на разных библиотеках и дисках."""
+    store = LibraryStore()
+    store.open(read_only=True)   # только смотрим: перенос старых данных — дело плеера при запуске
+    history = store.load_scan_stats(limit)
+    pending = store.migration_pending()
+    store.close()
+    if pending:
+        print("База библиотеки ещё не обновлена (или старые JSON не перенесены) — это сделает следующий запуск плеера.")
+    if not history:
+        print("Статистики сканов ещё нет.")
+        return
+    print(f"{'дата':<17}{'вид':<7}{'ФС':<10}{'библ.':>8}{'папок':>8}{'файлов':>8}{'с':>8}"
+          f"{'папок/с':>9}{'файлов/с':>10}{'тегов':>8}{'МБ':>8}{'МБ/с':>7}")
+    for st in history:
+        fs = ",".join(sorted({r["fs"] or "?" for r in st.get("per_root", {}).values()})) or "?"
+        print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(st.get('started', 0))):<17}{st.get('kind', '?'):<7}"
+              f"{fs[:9]:<10}{st.get('library_size', 0):>8}{st.get('dirs', 0):>8}{st.get('files', 0):>8}"
+              f"{st.get('seconds', 0):>8.1f}{st.get('dirs_per_sec', 0):>9.0f}{st.get('files_per_sec', 0):>10.0f}"
+              f"{st.get('tag_files', 0):>8}{st.get('tag_bytes', 0) / 1048576:>8.1f}{st.get('tag_mb_per_sec', 0):>7.1f}")
+
+
+class MetadataExtractorThread(QThread):
+    """Параллельно разбирает теги найденных файлов и отдаёт результаты пачками.
+
+    После завершения в files_read / bytes_read / elapsed — сколько файлов реально
+    разобрано (не из кэша), сколько байт прочитано ради тегов и за сколько секунд.
+    """
+    batch = pyqtSignal(list)              # list of (path, record | None)
+    progress = pyqtSignal(int)            # percent
+    message = pyqtSignal(str)
+
+    def __init__(self, paths, known, covers_dir, workers=METADATA_WORKERS, use_processes=METADATA_USE_PROCESSES):
+        super().__init__()
+        self.paths = paths
+        self.known = known                # path -> (mtime, size) из кэша
+        self.covers_dir = covers_dir
+        self.workers = workers
+        self.use_processes = use_processes
+        self.stop_requested = False
+        self.files_read = 0
+        self.bytes_read = 0
+        self.elapsed = 0.0
+
+    def run(self):
+        total = len(self.paths)
+        if not total:
+            return
+        started = time.perf_counter()
+        self.message.emit(f"Чтение тегов: {total} файлов ({self.workers} потоков)")
+        executor_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        pending = []
+        last_emit = time.monotonic()
+        last_percent = -1
+        with executor_cls(max_workers=self.workers) as pool:
+            results = pool.map(
+                extract_track_metadata,
+                self.paths,
+                [self.known.get(p) for p in self.paths],
+                [self.covers_dir] * total,
+                chunksize=32 if self.use_processes else 1,
+            )
+            try:
+                for done, result in enumerate(results, 1):
                     if self.stop_requested:
                         break
-                    for f in files:
-                        if f.lower().endswith(AUDIO_EXTS):
-                            found.append(os.path.join(root, f))
-                    # если не deep — не спускаемся в глубину (только текущая папка и вложенные уровни до рекурсии)
-                    if not self.deep:
-                        # не продолжать спуск в поддиректории глубже 5 уровней от base
-                        # (оценка: лимит вложенности)
-                        pass
-            processed += 1
-            percent = int(processed / max(1, total_paths) * 100)
-            self.progress.emit(percent)
+                    if result is not None:
+                        path, record, read_bytes = result
+                        pending.append((path, record))
+                        if record is not None:
+                            self.files_read += 1
+                            self.bytes_read += read_bytes
+                    now = time.monotonic()
+                    if len(pending) >= METADATA_BATCH_SIZE or (pending and now - last_emit >= METADATA_BATCH_INTERVAL):
+                        self.batch.emit(pending)
+                        pending = []
+                        last_emit = now
+                    percent = int(done / total * 100)
+                    if percent != last_percent:
+                        self.progress.emit(percent)
+                        last_percent = percent
+            finally:
+                if self.stop_requested:
+                    pool.shutdown(wait=False, cancel_futures=True)
+        if pending:
+            self.batch.emit(pending)
+        self.elapsed = time.perf_counter() - started
+
+    def stop(self):
+        self.stop_requested = True
+
+
+class ExistenceSweeperThread(QThread):
+    """Фоновая проверка, что файлы библиотеки ещё на месте.
+
+    Пути группируются по каталогам: один listdir на каталог вместо stat на каждый файл,
+    недоступный каталог (отключённый диск) сразу даёт все его треки.
+    """
+    missing = pyqtSignal(list)            # пачка пропавших путей
+    progress = pyqtSignal(int)            # percent
+
+    def __init__(self, paths, batch_size=SWEEP_BATCH_SIZE):
+        super().__init__()
+        self.paths = paths
+        self.batch_size = batch_size
+        self.stop_requested = False
+
+    def run(self):
+        total = len(self.paths)
+        if not total:
+            return
+        by_dir = {}
+        for path in self.paths:
+            by_dir.setdefault(os.path.dirname(path), []).append(path)
+        pending = []
+        checked = 0
+        reported = 0
+        for folder, paths in by_dir.items():
             if self.stop_requested:
-                break
-        # Удаляем дубликаты и сортируем
-        unique = sorted(list(dict.fromkeys(found)))
-        self.result.emit(unique)
-        self.message.emit("Сканирование завершено.")
+                return
+            try:
+                present = set(os.listdir(folder))
+            except OSError:
+                present = set()
+            pending.extend(p for p in paths if os.path.basename(p) not in present)
+            checked += len(paths)
+            if checked - reported >= self.batch_size:
+                if pending:
+                    self.missing.emit(pending)
+                    pending = []
+                self.progress.emit(int(checked / total * 100))
+                reported = checked
+        if pending:
+            self.missing.emit(pending)
+        self.progress.emit(100)
+
+    def stop(self):
+        self.stop_requested = True
+
+
+class FingerprintThread(QThread):
+    """Фоновый подсчёт отпечатков звуковых данных для поиска дубликатов.
+
+    Результаты уходят пачками (path, fingerprint); для нечитаемого файла fingerprint — None.
+    С full=True считается хэш всех звуковых данных — для подтверждения совпавших отпечатков.
+    """
+    batch = pyqtSignal(bool, list)        # full, [(path, fingerprint)]
+
+    def __init__(self, paths, full=False, batch_size=FINGERPRINT_BATCH_SIZE):
+        super().__init__()
+        self.paths = paths
+        self.full = full
+        self.batch_size = batch_size
+        self.stop_requested = False
+
+    def run(self):
+        pending = []
+        for path in self.paths:
+            if self.stop_requested:
+                return
+            try:
+                fingerprint = fingerprint_file(path, full=self.full)
+            except OSError:
+                fingerprint = None
+            pending.append((path, fingerprint))
+            if len(pending) >= self.batch_size:
+                self.batch.emit(self.full, pending)
+                pending = []
+        if pending:
+            self.batch.emit(self.full, pending)
 
     def stop(self):
         self.stop_requested = True
 
+
+def read_dir_entry(path):
+    """Состав каталога для LibraryWatcher или None, если каталога нет.
+
+    Аудиофайлы хранятся с (size, mtime, st_dev, st_ino): по устройству и inode
+    переименование отличается от удаления с добавлением.
+    """
+    try:
+        st = os.stat(path)
+        files = {}
+        dirs = []
+        with os.scandir(path) as it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        if not scan_excluded(e.path, e.name):
+                            dirs.append(e.name)
+                    elif e.name.lower().endswith(AUDIO_EXTS) and e.is_file():
+                        fst = e.stat()
+                        files[e.name] = (fst.st_size, fst.st_mtime, fst.st_dev, fst.st_ino)
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    return {"mtime": st.st_mtime, "key": (st.st_dev, st.st_ino), "files": files, "dirs": dirs}
+
+
+class LibraryWatcher(QObject):
+    """Живое обновление библиотеки по изменениям в корнях сканирования.
+
+    Снимок каталогов строится в фоновом потоке. Дальше каталоги помечаются изменёнными
+    событиями QFileSystemWatcher (inotify) или опросом mtime — для каталогов сверх
+    WATCH_MAX_DIRS и для самих корней (подключение/отключение диска). Изменённые каталоги
+    перечитываются одной пачкой через WATCH_DEBOUNCE_MS и сравниваются со снимком;
+    пара «удалён + добавлен» с тем же inode — это переименование или перенос.
+    """
+    changes = pyqtSignal(list, list, list, list)  # added, removed, modified, moved [(старый, новый)]
+    unavailable = pyqtSignal(list)                 # файлы под пропавшим корнем — диск отключён, не удалён
+    _snapshot_ready = pyqtSignal(object)
+
+    def __init__(self, roots, known=(), parent=None):
+        super().__init__(parent)
+        self.roots = [os.path.normpath(r) for r in roots]
+        self.known = set(known)           # пути из библиотеки на момент запуска
+        self.snapshot = {}                # каталог -> read_dir_entry
+        self.watcher = None               # QFileSystemWatcher, появляется вместе со снимком
+        self._watched = set()
+        self._polled = []                 # каталоги без inotify и корни, опрашиваются по кругу
+        self._poll_pos = 0
+        self._dirty = set()
+        self._running = False
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(WATCH_DEBOUNCE_MS)
+        self.flush_timer.timeout.connect(self._flush)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(WATCH_POLL_INTERVAL_MS)
+        self.poll_timer.timeout.connect(self._poll)
+        self._snapshot_ready.connect(self._on_snapshot)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            threading.Thread(target=self._build_snapshot, daemon=True).start()
+
+    def stop(self):
+        self._running = False
+        self.flush_timer.stop()
+        self.poll_timer.stop()
+        if self.watcher is not None and self._watched:
+            self.watcher.removePaths(list(self._watched))
+        self._watched.clear()
+
+    def _build_snapshot(self):
+        snapshot = {}
+        found = {}
+        for root in self.roots:
+            self._walk_into(root, snapshot, found)
+        self._snapshot_ready.emit((snapshot, found))
+
+    def _walk_into(self, base, snapshot, found):
+        """Снимок поддерева base по правилам сканера: не глубже SCAN_MAX_DEPTH от корня,
+        каталог с уже пройденными устройством и inode (петля через bind mount) не проходится повторно."""
+        visited = set()
+        stack = [(base, self._depth(base))]
+        while stack:
+            path, depth = stack.pop()
+            if depth > SCAN_MAX_DEPTH:
+                continue
+            entry = read_dir_entry(path)
+            if entry is None or entry["key"] in visited:
+                continue
+            visited.add(entry["key"])
+            snapshot[path] = entry
+            for name, sig in entry["files"].items():
+                found[os.path.join(path, name)] = sig
+            stack.extend((os.path.join(path, d), depth + 1) for d in entry["dirs"])
+
+    def _depth(self, path):
+        for root in self.roots:
+            if path == root:
+                return 0
+            if path.startswith(os.path.join(root, "")):
+                return os.path.relpath(path, root).count(os.sep) + 1
+        return 0
+
+    def _on_snapshot(self, result):
+        if not self._running:
+            return
+        self.snapshot, found = result
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._mark_dirty)
+        self._watch(sorted(self.snapshot))
+        self._polled.extend(r for r in self.roots if r not in self._polled)
+        self.poll_timer.start()
+        # файлы, появившиеся, пока плеер был закрыт
+        added = sorted(p for p in found if p not in self.known)
+        self.known = set()
+        if added:
+            self.changes.emit(added, [], [], [])
+
+    def _watch(self, dirs):
+        room = max(0, WATCH_MAX_DIRS - len(self._watched))
+        watched, rest = dirs[:room], dirs[room:]
+        failed = set(self.watcher.addPaths(watched)) if watched else set()
+        self._watched.update(d for d in watched if d not in failed)
+        self._polled.extend(d for d in watched if d in failed)
+        self._polled.extend(rest)
+
+    def _unwatch(self, dirs):
+        dirs = set(dirs)
+        watched = [d for d in dirs if d in self._watched]
+        if watched:
+            self.watcher.removePaths(watched)
+            self._watched.difference_update(watched)
+        self._polled = [d for d in self._polled if d not in dirs or d in self.roots]
+
+    def _mark_dirty(self, path):
+        self._dirty.add(path)
+        # окно фиксированное: серия событий (копирование альбома) разбирается одной пачкой
+        if self._running and not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def _poll(self):
+        """Проверяет mtime не больше WATCH_POLL_BATCH каталогов за тик."""
+        for _ in range(min(WATCH_POLL_BATCH, len(self._polled))):
+            self._poll_pos %= len(self._polled)
+            path = self._polled[self._poll_pos]
+            self._poll_pos += 1
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                mtime = None
+            entry = self.snapshot.get(path)
+            if (entry["mtime"] if entry is not None else None) != mtime:
+                self._mark_dirty(path)
+
+    def _forget_tree(self, base, removed):
+        prefix = os.path.join(base, "")
+        gone = [d for d in self.snapshot if d == base or d.startswith(prefix)]
+        for d in gone:
+            for name, sig in self.snapshot.pop(d)["files"].items():
+                removed[os.path.join(d, name)] = sig
+        self._unwatch(gone)
+
+    def _flush(self):
+        if not self._running:
+            return
+        dirty, self._dirty = self._dirty, set()
+        added, removed, modified, unavailable = {}, {}, {}, {}
+        new_dirs = {}
+        for path in sorted(dirty, key=len):  # родители раньше детей
+            old = self.snapshot.get(path)
+            if old is None and path not in self.roots:
+                continue  # каталог уже разобран вместе с родителем или забыт
+            entry = read_dir_entry(path)
+            if entry is None:
+                # пропал корень целиком — скорее отключён диск, чем удалена музыка
+                self._forget_tree(path, unavailable if path in self.roots else removed)
+                continue
+            if old is None:
+                # корень снова доступен
+                self._walk_into(path, new_dirs, added)
+                continue
+            for name, sig in entry["files"].items():
+                old_sig = old["files"].get(name)
+                if old_sig is None:
+                    added[os.path.join(path, name)] = sig
+                elif tuple(old_sig) != tuple(sig):
+                    modified[os.path.join(path, name)] = tuple(old_sig)
+            for name, sig in old["files"].items():
+                if name not in entry["files"]:
+                    removed[os.path.join(path, name)] = sig
+            for d in entry["dirs"]:
+                if d not in old["dirs"]:
+                    self._walk_into(os.path.join(path, d), new_dirs, added)
+            for d in old["dirs"]:
+                if d not in entry["dirs"]:
+                    self._forget_tree(os.path.join(path, d), removed)
+            self.snapshot[path] = entry
+        self.snapshot.update(new_dirs)
+        self._watch(sorted(new_dirs))
+        # файлы, которые ещё пишутся, откладываем: снимок остаётся прежним, каталог разберём снова
+        now = time.time()
+        for full, sig in list(added.items()):
+            if now - sig[1] < WATCH_SETTLE_SECONDS:
+                folder, name = os.path.split(full)
+                del added[full]
+                self.snapshot[folder]["files"].pop(name, None)
+                self._mark_dirty(folder)
+        for full, old_sig in list(modified.items()):
+            folder, name = os.path.split(full)
+            if now - self.snapshot[folder]["files"][name][1] < WATCH_SETTLE_SECONDS:
+                del modified[full]
+                self.snapshot[folder]["files"][name] = old_sig
+                self._mark_dirty(folder)
+        # переименования и переносы: тот же файл (устройство + inode) исчез в одном месте и появился в другом
+        by_inode = {(sig[2], sig[3]): path for path, sig in removed.items()}
+        moved = []
+        for path, sig in sorted(added.items()):
+            old_path = by_inode.pop((sig[2], sig[3]), None)
+            if old_path is not None:
+                del removed[old_path]
+                del added[path]
+                moved.append((old_path, path))
+        if unavailable:
+            self.unavailable.emit(sorted(unavailable))
+        if added or removed or modified or moved:
+            self.changes.emit(sorted(added), sorted(removed), sorted(modified), moved)
+
 # ------------------------------------------------------------------
 # Диалог редактирования тэгов (как в оригинале, но чуть более стабильный)
 # ------------------------------------------------------------------
@@ -169,6 +2293,7 @@ class EditTrackDialog(QDialog):
         self.setLayout(layout)
 
     def get_id3_tags(self):
+        from mutagen.id3 import ID3
         tags = {}
         try:
             audio = ID3(self.filepath)
@@ -189,6 +2314,7 @@ class EditTrackDialog(QDialog):
             self.cover_btn.setText(f"🖼️ {os.path.basename(path)}")
 
     def save(self):
+        from mutagen.id3 import ID3, TIT2, TPE1, TALB, TDRC, APIC
         try:
             tags = ID3(self.filepath)
             tags.delall("TIT2")
@@ -219,7 +2345,7 @@ class EditTrackDialog(QDialog):
 # Виджеты карточек и элементов списка (переиспользуемые)
 # ------------------------------------------------------------------
 class CardWidget(QFrame):
-    def __init__(self, title, subtitle, cover_data=None, is_artist=False, parent=None):
+    def __init__(self, title, subtitle, pixmap=None, is_artist=False, parent=None):
         super().__init__(parent)
         self.setObjectName("card_frame")
         self.setCursor(Qt.PointingHandCursor)
@@ -234,13 +2360,10 @@ class CardWidget(QFrame):
         self.cover_label.setAlignment(Qt.AlignCenter)
         self.cover_label.setObjectName("cover_label")
 
-        if cover_data:
-            pixmap = QPixmap()
-            pixmap.loadFromData(cover_data)
-            if is_artist:
-                self.cover_label.setPixmap(self.create_round_pixmap(pixmap))
-            else:
-                self.cover_label.setPixmap(pixmap.scaled(150, 150, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        # обложка приходит уже уменьшенной (и круглой для исполнителя) из CoverCache;
+        # если её ещё нет — заглушка, которую заменит set_cover после фоновой загрузки
+        if pixmap is not None:
+            self.set_cover(pixmap)
         else:
             self.cover_label.setText("🎵")
             self.cover_label.setStyleSheet("background-color: #262626; border-radius: 8px;")
@@ -261,80 +2384,279 @@ class CardWidget(QFrame):
 
         self.setLayout(self.layout)
 
-    def create_round_pixmap(self, pixmap):
-        size = min(pixmap.width(), pixmap.height())
-        if size == 0:
-            return QPixmap()
-        mask = QPixmap(size, size)
-        mask.fill(Qt.transparent)
-        painter = QPainter(mask)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setBrush(QBrush(Qt.black))
-        painter.drawEllipse(0, 0, size, size)
-        painter.end()
-
-        result = QPixmap(size, size)
-        result.fill(Qt.transparent)
-        painter = QPainter(result)
-        painter.setRenderHint(QPainter.Antialiasing)
-        x_offset = (pixmap.width() - size) // 2
-        y_offset = (pixmap.height() - size) // 2
-        painter.drawPixmap(-x_offset, -y_offset, pixmap)
-        painter.setCompositionMode(QPainter.CompositionMode_DestinationIn)
-        painter.drawPixmap(0, 0, mask)
-        painter.end()
-        return result.scaled(150, 150, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-
-class TrackListItem(QWidget):
-    def __init__(self, title, artist, cover_data, track_path, parent):
-        super().__init__(parent)
-        self.parent = parent
-        self.track_path = track_path
-        self.setObjectName("track_list_item_widget")
-        self.layout = QHBoxLayout(self)
-        self.layout.setContentsMargins(8, 5, 8, 5)
-        self.layout.setSpacing(10)
+    def set_cover(self, pixmap):
+        self.cover_label.setStyleSheet("")
+        self.cover_label.setPixmap(pixmap)
 
-        self.cover_label = QLabel()
-        self.cover_label.setFixedSize(44, 44)
-        self.cover_label.setScaledContents(True)
-        if cover_data:
-            pixmap = QPixmap()
-            pixmap.loadFromData(cover_data)
-            self.cover_label.setPixmap(pixmap.scaled(44, 44, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        else:
-            self.cover_label.setText("🎵")
-            self.cover_label.setStyleSheet("background-color: #262626;")
+class HomeSection(QWidget):
+    """Раздел главной (альбомы или исполнители) с постраничным созданием карточек.
 
-        self.layout.addWidget(self.cover_label)
-
-        info_layout = QVBoxLayout()
-        info_layout.setSpacing(1)
+    Создаются только карточки первых limit имён; set_names() переиспользует уже созданные,
+    поэтому изменение библиотеки стоит O(показанных карточек), а не O(всех альбомов).
+    """
 
+    def __init__(self, title, make_card, drop_card, page_size=None, columns=HOME_COLUMNS, parent=None):
+        super().__init__(parent)
+        self.make_card = make_card        # name -> CardWidget
+        self.drop_card = drop_card        # card -> None (отмена загрузки обложки)
+        self.page_size = page_size or HOME_PAGE_SIZE
+        self.columns = columns
+        self.limit = self.page_size
+        self.names = []
+        self.cards = {}
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
         self.title_label = QLabel(title)
-        self.title_label.setStyleSheet("font-weight: bold; color: #fff;")
-        self.artist_label = QLabel(artist)
-        self.artist_label.setStyleSheet("font-size: 12px; color: #bfbfbf;")
+        self.title_label.setStyleSheet("font-size: 18px; font-weight: bold; color: #fff; margin-top: 10px;")
+        layout.addWidget(self.title_label)
+        self.grid = QGridLayout()
+        self.grid.setSpacing(10)
+        self.grid.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        layout.addLayout(self.grid)
+        self.more_btn = QPushButton()
+        self.more_btn.setFixedHeight(32)
+        self.more_btn.clicked.connect(self.show_more)
+        layout.addWidget(self.more_btn, alignment=Qt.AlignLeft)
+
+    def has_more(self):
+        return len(self.names) > self.limit
+
+    def set_names(self, names):
+        self.names = names
+        self._render()
+
+    def show_more(self):
+        if self.has_more():
+            self.limit += self.page_size
+            self._render()
+
+    def invalidate(self, names):
+        """Пересоздать карточки (например, сменилась обложка) при следующей отрисовке."""
+        for name in names:
+            card = self.cards.pop(name, None)
+            if card is not None:
+                self._remove(card)
+
+    def _remove(self, card):
+        self.grid.removeWidget(card)
+        self.drop_card(card)
+        card.deleteLater()
+
+    def _render(self):
+        visible = self.names[:self.limit]
+        visible_set = set(visible)
+        for name in list(self.cards):
+            if name not in visible_set:
+                self._remove(self.cards.pop(name))
+        for i, name in enumerate(visible):
+            card = self.cards.get(name)
+            if card is None:
+                card = self.cards[name] = self.make_card(name)
+            else:
+                self.grid.removeWidget(card)
+            self.grid.addWidget(card, i // self.columns, i % self.columns)
+        rest = len(self.names) - len(visible)
+        self.more_btn.setVisible(rest > 0)
+        self.more_btn.setText(f"Показать ещё ({rest})")
+
+class TrackListModel(QAbstractListModel):
+    """Список треков для QListView: хранит только пути, данные берёт из кэша по запросу."""
+    PathRole = Qt.UserRole + 1
+    ArtistRole = Qt.UserRole + 2
+    MissingRole = Qt.UserRole + 3         # файл не найден фоновой проверкой
+
+    def __init__(self, player, paths=None, parent=None):
+        super().__init__(parent)
+        self.player = player
+        self._paths = list(paths or [])
+        self._requested = set()           # ключи обложек, которые ждёт эта модель
+        player.cover_loader.loaded.connect(self._on_cover_loaded)
+        player.availability_changed.connect(self._on_availability_changed)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not (0 <= index.row() < len(self._paths)):
+            return None
+        path = self._paths[index.row()]
+        if role == self.PathRole:
+            return path
+        if role == Qt.DisplayRole:
+            return self.player.get_track_info_from_file(path)[0]
+        if role == self.ArtistRole:
+            return self.player.get_track_info_from_file(path)[1]
+        if role == self.MissingRole:
+            return path in self.player.missing
+        if role == Qt.DecorationRole:
+            # обложка запрашивается только для строк, которые реально рисуются, и грузится в фоне
+            cover_hash = self.player.metadata.get(path).get("cover")
+            if not cover_hash:
+                return None
+            pixmap = self.player.cover_loader.request(cover_hash, TrackItemDelegate.COVER_SIZE, owner=self)
+            if pixmap is None:
+                self._requested.add((cover_hash, TrackItemDelegate.COVER_SIZE, False))
+            return pixmap
+        return None
 
-        info_layout.addWidget(self.title_label)
-        info_layout.addWidget(self.artist_label)
-        self.layout.addLayout(info_layout)
-        self.layout.addStretch()
+    def _on_cover_loaded(self, key):
+        if key in self._requested:
+            self._requested.discard(key)
+            if self._paths:
+                # перерисуются только видимые строки
+                self.dataChanged.emit(self.index(0), self.index(len(self._paths) - 1), [Qt.DecorationRole])
+
+    def _on_availability_changed(self):
+        if self._paths:
+            self.dataChanged.emit(self.index(0), self.index(len(self._paths) - 1), [self.MissingRole])
+
+    def paths(self):
+        return list(self._paths)
+
+    def set_paths(self, paths):
+        self.player.cover_loader.cancel(self)
+        self._requested.clear()
+        self.beginResetModel()
+        self._paths = list(paths)
+        self.endResetModel()
+
+    def path_at(self, row):
+        return self._paths[row] if 0 <= row < len(self._paths) else None
+
+    def insert_sorted(self, path):
+        """Вставляет одну строку в список, отсортированный по пути."""
+        row = bisect.bisect_left(self._paths, path)
+        if row < len(self._paths) and self._paths[row] == path:
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._paths.insert(row, path)
+        self.endInsertRows()
 
-        # переопределяем события мыши
-        self.setMouseTracking(True)
+    def remove_path(self, path):
+        try:
+            row = self._paths.index(path)
+        except ValueError:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._paths[row]
+        self.endRemoveRows()
+
+    def apply_paths(self, paths):
+        """Переводит модель к новому списку минимальными вставками/удалениями строк.
+
+        Если порядок оставшихся строк меняется (другое ранжирование) — обычный сброс модели.
+        """
+        new = list(paths)
+        new_set = set(new)
+        old_set = set(self._paths)
+        kept_old = [p for p in self._paths if p in new_set]
+        kept_new = [p for p in new if p in old_set]
+        if kept_old != kept_new:
+            self.set_paths(new)
+            return
+        # удаляем пропавшие строки блоками, с конца, чтобы индексы не сдвигались
+        row = len(self._paths) - 1
+        while row >= 0:
+            if self._paths[row] in new_set:
+                row -= 1
+                continue
+            end = row
+            while row >= 0 and self._paths[row] not in new_set:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row + 1, end)
+            del self._paths[row + 1:end + 1]
+            self.endRemoveRows()
+        # вставляем новые строки блоками на их позиции
+        row = 0
+        while row < len(new):
+            if row < len(self._paths) and self._paths[row] == new[row]:
+                row += 1
+                continue
+            end = row
+            while end < len(new) and new[end] not in old_set:
+                end += 1
+            self.beginInsertRows(QModelIndex(), row, end - 1)
+            self._paths[row:row] = new[row:end]
+            self.endInsertRows()
+            row = end
 
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            # Если кликнули по лейблу исполнителя — переход к артисту
-            pos = event.pos()
-            widget = self.childAt(pos)
-            # Простейшая логика: если позиция по Y > верхнего лейбла — считать как клик по треку
-            if self.artist_label.geometry().contains(pos):
-                self.parent.go_to_artist_from_item(self.track_path)
+
+class TrackItemDelegate(QStyledItemDelegate):
+    """Рисует строку трека (обложка, название, исполнитель) без создания виджетов."""
+    COVER_SIZE = 44
+
+    def __init__(self, player, row_height=66, parent=None):
+        super().__init__(parent)
+        self.player = player
+        self.row_height = row_height
+        self.title_font = QFont()
+        self.title_font.setBold(True)
+        self.artist_font = QFont()
+        self.artist_font.setPixelSize(12)
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.row_height)
+
+    def _layout(self, rect):
+        cover_rect = QRect(rect.left() + 8, rect.top() + (rect.height() - self.COVER_SIZE) // 2,
+                           self.COVER_SIZE, self.COVER_SIZE)
+        text_left = cover_rect.right() + 11
+        text_width = max(0, rect.right() - text_left - 8)
+        half = rect.height() // 2
+        title_rect = QRect(text_left, rect.top(), text_width, half)
+        artist_rect = QRect(text_left, rect.top() + half + 1, text_width, rect.height() - half - 1)
+        return cover_rect, title_rect, artist_rect
+
+    def artist_hit_rect(self, rect, index):
+        """Область текста исполнителя — клик по ней открывает страницу артиста."""
+        _, _, artist_rect = self._layout(rect)
+        width = QFontMetrics(self.artist_font).horizontalAdvance(index.data(TrackListModel.ArtistRole) or "")
+        artist_rect.setWidth(min(width, artist_rect.width()))
+        artist_rect.setHeight(QFontMetrics(self.artist_font).height())
+        return artist_rect
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(rect, QColor("#1F1F1F"))
+        elif option.state & QStyle.State_MouseOver:
+            painter.fillRect(rect, QColor("#222"))
+
+        cover_rect, title_rect, artist_rect = self._layout(rect)
+        pixmap = index.data(Qt.DecorationRole)
+        if pixmap is not None and not pixmap.isNull():
+            target = QRect(0, 0, pixmap.width(), pixmap.height())
+            target.moveCenter(cover_rect.center())
+            painter.drawPixmap(target, pixmap)
+        else:
+            painter.fillRect(cover_rect, QColor("#262626"))
+            painter.setPen(QColor("#d0d0d0"))
+            painter.drawText(cover_rect, Qt.AlignCenter, "🎵")
+
+        # пропавшие файлы остаются в списке, но приглушены
+        missing = index.data(TrackListModel.MissingRole)
+        painter.setFont(self.title_font)
+        painter.setPen(QColor("#6a6a6a" if missing else "#fff"))
+        title = QFontMetrics(self.title_font).elidedText(index.data(Qt.DisplayRole) or "", Qt.ElideRight, title_rect.width())
+        painter.drawText(title_rect, Qt.AlignLeft | Qt.AlignBottom, title)
+
+        painter.setFont(self.artist_font)
+        painter.setPen(QColor("#555" if missing else "#bfbfbf"))
+        artist = QFontMetrics(self.artist_font).elidedText(index.data(TrackListModel.ArtistRole) or "", Qt.ElideRight, artist_rect.width())
+        painter.drawText(artist_rect, Qt.AlignLeft | Qt.AlignTop, artist)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            track_path = index.data(TrackListModel.PathRole)
+            # клик по исполнителю — переход к артисту, по остальной строке — воспроизведение
+            if self.artist_hit_rect(option.rect, index).contains(event.pos()):
+                self.player.go_to_artist_from_item(track_path)
             else:
-                self.parent.play_track_from_path(self.track_path)
-        super().mousePressEvent(event)
+                self.player.play_track_from_path(track_path)
+        return super().editorEvent(event, model, option, index)
 
 # ------------------------------------------------------------------
 # Fullscreen player (модульный)
@@ -394,88 +2716,1092 @@ class FullscreenPlayer(QMainWindow):
         self.btn_play_pause.clicked.connect(self.parent.play_pause)
         self.btn_next.clicked.connect(self.parent.next_track)
 
-        controls_layout.addWidget(self.btn_prev)
-        controls_layout.addWidget(self.btn_play_pause)
-        controls_layout.addWidget(self.btn_next)
+        controls_layout.addWidget(self.btn_prev)
+        controls_layout.addWidget(self.btn_play_pause)
+        controls_layout.addWidget(self.btn_next)
+
+        self.layout.addWidget(self.btn_exit, alignment=Qt.AlignTop | Qt.AlignRight)
+        self.layout.addStretch()
+        self.layout.addWidget(self.cover_label)
+        self.layout.addWidget(self.title_label)
+        self.layout.addWidget(self.artist_label)
+        self.layout.addWidget(self.position_slider)
+        self.layout.addLayout(controls_layout)
+        self.layout.addStretch()
+
+        self.sync_timer = QTimer(self)
+        self.sync_timer.timeout.connect(self.sync_with_parent)
+        self.sync_timer.start(150)
+
+    def sync_with_parent(self):
+        if not self.parent:
+            return
+        self.position_slider.setValue(self.parent.position_slider.value())
+        if self.parent.is_playing:
+            self.btn_play_pause.setText("⏸")
+        else:
+            self.btn_play_pause.setText("▶")
+
+    def stop_sync_timer(self):
+        self.sync_timer.stop()
+
+    def seek_and_sync(self):
+        if self.parent:
+            self.parent.position_slider.setValue(self.position_slider.value())
+            self.parent.seek_track()
+        self.sync_timer.start(150)
+
+    def update_info(self, title, artist):
+        # обложку подставляет MusicPlayer.set_label_cover (фоновая загрузка)
+        self.title_label.setText(title)
+        self.artist_label.setText(artist)
+
+# ------------------------------------------------------------------
+# Быстрый запуск: отложенное аудио и замеры фаз
+# ------------------------------------------------------------------
+def load_audio():
+    """Импортирует pygame и поднимает только микшер (без pygame.init и прочих подсистем)."""
+    global pygame
+    if pygame is None:
+        import pygame as _pygame
+        pygame = _pygame
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    return pygame
+
+
+def load_numpy():
+    """numpy для обработки звука или None: без него звук идёт без выравнивания громкости и кроссфейда."""
+    global np
+    if np is None:
+        try:
+            import numpy as _np
+        except ImportError:
+            return None
+        np = _np
+    return np
+
+
+class PygameMusicBackend:
+    """Воспроизведение через pygame.mixer.music (поток SDL_mixer).
+
+    get_pos() считает время с последнего play() и не знает о перемотке, поэтому позиция
+    ведётся от точки последнего play/seek. Обработки звука здесь нет: усиление трека
+    применяется через громкость и только в сторону ослабления, кроссфейда нет.
+    """
+    name = "pygame"
+
+    def __init__(self):
+        self._offset = 0.0        # позиция трека, с которой отсчитывается get_pos
+        self._pos_base = 0        # get_pos в момент последней перемотки
+        self._last_pos = 0        # прошлое значение get_pos: его сброс = начался трек из очереди
+        self._path = None
+        self._queued = None
+        self._volume = 1.0
+        self._gains = {}          # путь -> множитель громкости (текущий трек и трек в очереди)
+
+    def load(self, path, gain=1.0):
+        pygame.mixer.music.load(path)
+        self._path = path
+        self._queued = None
+        self._gains = {path: gain}
+        self._apply_volume()
+
+    def play(self, start=0.0):
+        pygame.mixer.music.play(start=start)  # очередь при этом сохраняется
+        self._offset = start
+        self._pos_base = 0
+        self._last_pos = 0
+
+    def queue(self, path, gain=1.0):
+        pygame.mixer.music.queue(path)
+        self._queued = path
+        self._gains[path] = gain
+
+    def set_gain(self, path, gain):
+        """Усиление для трека в очереди (например, оценка громкости пришла позже)."""
+        if path == self._queued:
+            self._gains[path] = gain
+
+    def rename(self, old, new):
+        """Файл переименован на диске: открытый микшером файл продолжает играть."""
+        if self._path == old:
+            self._path = new
+        if self._queued == old:
+            self._queued = new
+        if old in self._gains:
+            self._gains[new] = self._gains.pop(old)
+
+    def pause(self):
+        pygame.mixer.music.pause()
+
+    def unpause(self):
+        pygame.mixer.music.unpause()
+
+    def stop(self):
+        pygame.mixer.music.stop()  # вместе с очередью
+        self._queued = None
+
+    def set_volume(self, volume):
+        self._volume = volume
+        self._apply_volume()
+
+    def _apply_volume(self):
+        pygame.mixer.music.set_volume(self._volume * min(1.0, self._gains.get(self._path, 1.0)))
+
+    def get_busy(self):
+        return pygame.mixer.music.get_busy()
+
+    def get_position(self):
+        pos = pygame.mixer.music.get_pos()
+        if pos < 0:
+            return self._offset
+        return self._offset + max(0, pos - self._pos_base) / 1000.0
+
+    def seek(self, seconds):
+        try:
+            pygame.mixer.music.set_pos(seconds)
+        except Exception:
+            # set_pos поддерживается не для всех форматов
+            return False
+        self._offset = seconds
+        self._pos_base = max(0, pygame.mixer.music.get_pos())
+        return True
+
+    def wait_ready(self, timeout=2.0):
+        return True
+
+    def poll_switched(self):
+        """True, если микшер сам перешёл к треку из очереди (get_pos при этом сбрасывается)."""
+        pos = pygame.mixer.music.get_pos()
+        switched = self._queued is not None and 0 <= pos < self._last_pos
+        if switched:
+            self._path, self._queued = self._queued, None
+            self._gains = {self._path: self._gains.get(self._path, 1.0)}
+            self._apply_volume()
+            self._offset = 0.0
+            self._pos_base = 0
+        self._last_pos = pos
+        return switched
+
+    def close(self):
+        pass
+
+
+class PcmRingBuffer:
+    """Ограниченная очередь блоков PCM между потоком-декодером и выводом.
+
+    Декодер ждёт, пока есть место, поэтому память не растёт дальше max_bytes.
+    clear() меняет поколение: блоки от старого декодера (до перемотки) отбрасываются.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._blocks = deque()    # (путь, позиция блока в секундах, байты) текущего поколения
+        self._size = 0
+        self.generation = 0
+        self._cond = threading.Condition()
+
+    def put(self, generation, path, offset, data):
+        with self._cond:
+            while self._size + len(data) > self.max_bytes and generation == self.generation:
+                self._cond.wait(0.1)
+            if generation != self.generation:
+                return False
+            self._blocks.append((path, offset, data))
+            self._size += len(data)
+            return True
+
+    def get(self):
+        with self._cond:
+            if not self._blocks:
+                return None
+            block = self._blocks.popleft()
+            self._size -= len(block[2])
+            self._cond.notify_all()
+            return block
+
+    def clear(self):
+        with self._cond:
+            self._blocks.clear()
+            self._size = 0
+            self.generation += 1
+            self._cond.notify_all()
+            return self.generation
+
+    def __len__(self):
+        return len(self._blocks)
+
+
+class StreamBackend:
+    """Потоковое воспроизведение: ffmpeg декодирует в PCM, блоки идут в pygame.mixer.Channel.
+
+    Позиция считается по числу отыгранных кадров, поэтому точна до блока и не плывёт;
+    перемотка — это новый ffmpeg с -ss, одинаково для mp3/m4a/flac/wav. Трек из queue()
+    декодируется в тот же буфер сразу за текущим — переход без паузы.
+
+    Между декодером и буфером стоит обработка на numpy (если он есть): усиление трека
+    и кроссфейд. Она работает целыми блоками STREAM_CHUNK_FRAMES, без циклов по сэмплам.
+    Для кроссфейда декодер придерживает последние crossfade секунд трека и смешивает
+    их с началом следующего; на перемотке и ручном переключении кроссфейда нет.
+    """
+    name = "stream"
+
+    def __init__(self, ffmpeg=None, crossfade=None):
+        self.ffmpeg = ffmpeg or shutil.which(FFMPEG_BIN)
+        if not self.ffmpeg:
+            raise RuntimeError("ffmpeg не найден")
+        self.rate, size, self.channels = pygame.mixer.get_init()
+        if size != -16:
+            raise RuntimeError(f"формат микшера {size} не поддерживается (нужен 16 бит)")
+        self.frame_bytes = 2 * self.channels
+        self.dsp = load_numpy() is not None
+        if crossfade is None:
+            crossfade = CROSSFADE_SECONDS
+        self.crossfade_frames = int(crossfade * self.rate) if self.dsp else 0
+        self._gains = {}              # путь -> множитель громкости (текущий трек и трек в очереди)
+        self.ring = PcmRingBuffer(int(STREAM_BUFFER_SECONDS * self.rate) * self.frame_bytes)
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+        self.lock = threading.RLock()
+        self._path = None
+        self._next_path = None        # трек из queue(), который декодер ещё не начал
+        self._queued_path = None      # трек из queue(), пока он не зазвучал (переживает перемотку)
+        self._decoder = None
+        self._proc = None
+        self._paused = False
+        self._paused_at = 0.0
+        self._playing = False
+        self._decoding = False
+        self._switched = False
+        self._current = None          # (путь, позиция блока, длительность, Sound, время начала)
+        self._queued_block = None     # то же для блока в очереди канала
+        self._position = 0.0
+        self._volume = 1.0
+        self._ready = threading.Event()
+        self._closed = False
+        self._feeder = threading.Thread(target=self._feed_loop, daemon=True)
+        self._feeder.start()
+
+    # ---------- декодер ----------
+    def _start_decoder(self, path, start):
+        self._stop_decoder()
+        generation = self.ring.clear()
+        self._decoding = True
+        self._decoder = threading.Thread(target=self._decode_loop, args=(generation, path, start), daemon=True)
+        self._decoder.start()
+
+    def _stop_decoder(self):
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+        self.ring.clear()
+
+    def _decode_loop(self, generation, path, start):
+        tail = None  # придержанный конец прошлого трека для кроссфейда
+        while True:
+            held = self._decode_track(generation, path, start, tail)
+            if held is None:
+                return  # была перемотка или стоп — этот декодер больше не нужен
+            # трек кончился — без паузы продолжаем следующим из очереди
+            with self.lock:
+                if generation != self.ring.generation:
+                    return
+                path, self._next_path = self._next_path, None
+            tail = None
+            if path is not None and held:
+                held, tail = self._split_tail(held)
+            for block_path, offset, block in held:
+                if not self._put(generation, block_path, offset, block):
+                    return
+            if path is None:
+                # пока доигрывали хвост, могли поставить трек в очередь
+                with self.lock:
+                    if generation != self.ring.generation:
+                        return
+                    path, self._next_path = self._next_path, None
+                    if path is None:
+                        self._decoding = False
+                        return
+            start = 0.0
+
+    def _decode_track(self, generation, path, start, tail=None):
+        """Декодирует трек в буфер; возвращает придержанные для кроссфейда блоки или None после стопа.
+
+        tail — конец предыдущего трека (float32, кадры × каналы): его затухание
+        смешивается с нарастанием начала этого трека.
+        """
+        chunk_bytes = STREAM_CHUNK_FRAMES * self.frame_bytes
+        gain = self._gains.get(path, 1.0)
+        process = self.dsp and (gain != 1.0 or self.crossfade_frames or tail is not None)
+        held = deque()  # (путь, позиция, блок) — последние crossfade_frames кадров трека
+        held_frames = 0
+        fade_in = fade_out = None
+        mixed = 0
+        if tail is not None:
+            # равномощный кроссфейд: сумма квадратов множителей постоянна, провала громкости нет
+            ramp = np.linspace(0.0, np.pi / 2, len(tail), dtype=np.float32)[:, None]
+            fade_in, fade_out = np.sin(ramp), np.cos(ramp)
+        cmd = [self.ffmpeg, "-nostdin", "-v", "error", "-ss", f"{start:.3f}", "-i", path, "-vn",
+               "-f", "s16le", "-ac", str(self.channels), "-ar", str(self.rate), "-"]
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            print("Не удалось запустить ffmpeg:", e)
+            proc = None
+        offset = start
+        while proc is not None:
+            self._proc = proc
+            data = proc.stdout.read(chunk_bytes)
+            if not data:
+                proc.wait()
+                break
+            data = data[:len(data) - len(data) % self.frame_bytes]
+            frames = len(data) // self.frame_bytes
+            if not process:
+                block = data
+            else:
+                block = np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels).astype(np.float32)
+                if gain != 1.0:
+                    block *= gain
+                if tail is not None and mixed < len(tail):
+                    n = min(frames, len(tail) - mixed)
+                    block[:n] *= fade_in[mixed:mixed + n]
+                    block[:n] += tail[mixed:mixed + n] * fade_out[mixed:mixed + n]
+                    mixed += n
+            if self.crossfade_frames:
+                held.append((path, offset, block))
+                held_frames += frames
+                # отдаём всё, что старше последних crossfade_frames кадров
+                while held_frames - len(held[0][2]) >= self.crossfade_frames:
+                    old_path, old_offset, old = held.popleft()
+                    held_frames -= len(old)
+                    if not self._put(generation, old_path, old_offset, old):
+                        proc.kill()
+                        proc.wait()
+                        return None
+            elif not self._put(generation, path, offset, block):
+                proc.kill()
+                proc.wait()
+                return None
+            offset += frames / self.rate
+        if tail is not None and mixed < len(tail):
+            # трек короче кроссфейда — остаток затухания доигрываем после него
+            held.append((path, offset, tail[mixed:] * fade_out[mixed:]))
+        return held
+
+    def _split_tail(self, held):
+        """Отделяет последние crossfade_frames кадров трека (хвост для кроссфейда) от остальных блоков."""
+        excess = sum(len(block) for _, _, block in held) - self.crossfade_frames
+        head = []
+        while held and excess >= len(held[0][2]):
+            excess -= len(held[0][2])
+            head.append(held.popleft())
+        if held and excess > 0:
+            path, offset, block = held[0]
+            head.append((path, offset, block[:excess]))
+            held[0] = (path, offset + excess / self.rate, block[excess:])
+        tail = np.concatenate([block for _, _, block in held]) if held else None
+        return head, tail
+
+    def _put(self, generation, path, offset, block):
+        if not isinstance(block, bytes):
+            np.clip(block, -32768, 32767, out=block)
+            block = block.astype(np.int16).tobytes()
+        return self.ring.put(generation, path, offset, block)
+
+    # ---------- вывод ----------
+    def _feed_loop(self):
+        while not self._closed:
+            time.sleep(0.005)
+            with self.lock:
+                if not self._playing or self._paused:
+                    continue
+                self._advance_blocks()
+                if self.channel.get_queue() is not None:
+                    continue
+                block = self.ring.get()
+                if block is None:
+                    continue
+                path, offset, data = block
+                sound = pygame.mixer.Sound(buffer=data)
+                sound.set_volume(self._volume)
+                entry = [path, offset, len(data) / self.frame_bytes / self.rate, sound, None]
+                if self._current is None or not self.channel.get_busy():
+                    entry[4] = time.monotonic()
+                    self.channel.play(sound)
+                    self._set_current(entry)
+                    self._ready.set()
+                else:
+                    self.channel.queue(sound)
+                    self._queued_block = entry
+
+    def _advance_blocks(self):
+        # канал перешёл к блоку из очереди: время его начала — ровно конец предыдущего
+        if self._queued_block is not None and self.channel.get_sound() is self._queued_block[3]:
+            previous = self._current
+            self._queued_block[4] = previous[4] + previous[2]
+            self._set_current(self._queued_block)
+            self._queued_block = None
+        elif self._current is not None and not self.channel.get_busy() and self._queued_block is None:
+            self._position = self._current[1] + self._current[2]
+            self._current = None
+
+    def _set_current(self, entry):
+        if self._current is not None and entry[0] != self._current[0]:
+            self._path = entry[0]
+            if entry[0] == self._queued_path:
+                self._queued_path = None
+            self._switched = True
+        self._current = entry
+
+    # ---------- интерфейс бэкенда ----------
+    def load(self, path, gain=1.0):
+        with self.lock:
+            self.stop()
+            self._path = path
+            self._gains = {path: gain}
+
+    def play(self, start=0.0):
+        with self.lock:
+            self._begin(start)
+
+    def _begin(self, start):
+        self.channel.stop()
+        self._current = None
+        self._queued_block = None
+        self._ready.clear()
+        self._position = start
+        self._paused = False
+        self._playing = True
+        self._start_decoder(self._path, start)
+
+    def queue(self, path, gain=1.0):
+        with self.lock:
+            self._gains = {self._path: self._gains.get(self._path, 1.0), path: gain}
+            self._queued_path = path
+            if self._decoding or not self._playing:
+                # декодер возьмёт его, дочитав текущий трек
+                self._next_path = path
+                return
+            # текущий трек уже целиком в буфере — следующий декодируем сразу за ним
+            self._next_path = None
+            self._decoding = True
+            self._decoder = threading.Thread(target=self._decode_loop, args=(self.ring.generation, path, 0.0), daemon=True)
+            self._decoder.start()
+
+    def set_gain(self, path, gain):
+        """Усиление для трека в очереди; действует, если его декодирование ещё не началось."""
+        with self.lock:
+            if path in self._gains and path != self._path:
+                self._gains[path] = gain
+
+    def rename(self, old, new):
+        """Файл переименован на диске: ffmpeg держит его открытым, а перемотка откроет уже новый путь."""
+        with self.lock:
+            if self._path == old:
+                self._path = new
+            if self._next_path == old:
+                self._next_path = new
+            if self._queued_path == old:
+                self._queued_path = new
+            if old in self._gains:
+                self._gains[new] = self._gains.pop(old)
+
+    def pause(self):
+        with self.lock:
+            if self._playing and not self._paused:
+                self._paused = True
+                self._paused_at = time.monotonic()
+                self.channel.pause()
+
+    def unpause(self):
+        with self.lock:
+            if self._paused:
+                shift = time.monotonic() - self._paused_at
+                for entry in (self._current, self._queued_block):
+                    if entry is not None and entry[4] is not None:
+                        entry[4] += shift
+                self._paused = False
+                self.channel.unpause()
+
+    def stop(self):
+        with self.lock:
+            self._playing = False
+            self._paused = False
+            self._next_path = None
+            self._queued_path = None
+            self._stop_decoder()
+            self._decoding = False
+            self.channel.stop()
+            self._current = None
+            self._queued_block = None
+
+    def set_volume(self, volume):
+        with self.lock:
+            self._volume = volume
+            for entry in (self._current, self._queued_block):
+                if entry is not None:
+                    entry[3].set_volume(volume)
+
+    def get_busy(self):
+        with self.lock:
+            if not self._playing:
+                return False
+            if self._paused:
+                return True
+            return self._decoding or len(self.ring) > 0 or self.channel.get_busy() or self._current is not None
+
+    def get_position(self):
+        with self.lock:
+            current = self._current
+            if current is None or current[4] is None:
+                return self._position
+            now = self._paused_at if self._paused else time.monotonic()
+            return current[1] + min(max(0.0, now - current[4]), current[2])
+
+    def seek(self, seconds):
+        with self.lock:
+            if self._path is None:
+                return False
+            paused = self._paused
+            # трек из очереди мог уже декодироваться в буфер, который сейчас сбросится, —
+            # новый декодер возьмёт его снова, дочитав текущий с новой позиции
+            self._next_path = self._queued_path
+            self._begin(max(0.0, seconds))
+            if paused:
+                self._paused = True
+                self._paused_at = time.monotonic()
+        return True
+
+    def wait_ready(self, timeout=2.0):
+        """Ждёт, пока после play/seek зазвучит первый блок (для замеров задержки перемотки)."""
+        return self._ready.wait(timeout)
+
+    def poll_switched(self):
+        with self.lock:
+            switched, self._switched = self._switched, False
+            return switched
+
+    def close(self):
+        self.stop()
+        self._closed = True
+
+
+def create_audio_backend(name=None):
+    """Бэкенд по имени; если потоковый недоступен (нет ffmpeg) — обычный pygame."""
+    name = name or AUDIO_BACKEND
+    if name == "stream":
+        try:
+            return StreamBackend()
+        except Exception as e:
+            print("Потоковый бэкенд недоступен, используется pygame:", e)
+    return PygameMusicBackend()
+
+
+def benchmark_seek(path, count=10):
+    """Замер задержки и точности перемотки для обоих бэкендов (--bench-seek ФАЙЛ).
+
+    Для потокового бэкенда задержка — до начала звучания первого блока с новой позиции;
+    pygame этого не сообщает, для него это только время вызова set_pos.
+    """
+    load_audio()
+    from mutagen import File
+    audio = File(path)
+    duration = getattr(getattr(audio, "info", None), "length", 0) or 0
+    if duration <= 1:
+        print("Не удалось определить длительность:", path)
+        return
+    targets = [duration * (i + 0.5) / count for i in range(count)]
+    random.shuffle(targets)
+    for name in ("pygame", "stream"):
+        backend = create_audio_backend(name)
+        if backend.name != name:
+            continue
+        backend.set_volume(0.0)
+        backend.load(path)
+        backend.play()
+        backend.wait_ready()
+        latencies = []
+        errors = []
+        failed = 0
+        for target in targets:
+            started = time.perf_counter()
+            if not backend.seek(target) or not backend.wait_ready():
+                failed += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            time.sleep(0.3)
+            errors.append(abs(backend.get_position() - (target + 0.3)) * 1000.0)
+        backend.close()
+        if latencies:
+            print(f"{name:<7} перемотка: средн. {sum(latencies) / len(latencies):6.1f} мс, макс. {max(latencies):6.1f} мс; "
+                  f"ошибка позиции: средн. {sum(errors) / len(errors):6.1f} мс; неудачных: {failed}/{count}")
+        else:
+            print(f"{name:<7} перемотка не поддерживается для этого файла ({failed}/{count} неудачных)")
+
+def benchmark_tags(path, repeat=5):
+    """Задержка чтения тегов по форматам (--bench-tags ФАЙЛ|КАТАЛОГ).
+
+    Для каждого файла: медиана из repeat чтений read_track_metadata и прежнего способа
+    (File() с перебором форматов, затем ID3), сколько байт прочитано и нашлось ли название.
+    """
+    from mutagen import File
+    from mutagen.id3 import ID3
+    if os.path.isdir(path):
+        files = [os.path.join(d, n) for d, _, names in os.walk(path) for n in sorted(names)
+                 if n.lower().endswith(AUDIO_EXTS)]
+    else:
+        files = [path]
+
+    def legacy(filepath):
+        audio = File(filepath)
+        if not isinstance(getattr(audio, "tags", None), ID3):
+            try:
+                ID3(filepath)
+            except Exception:
+                pass
+
+    by_ext = {}
+    for filepath in files:
+        timings = {"new": [], "old": []}
+        stats = {}
+        record = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            record, _ = read_track_metadata(filepath, stats)
+            timings["new"].append((time.perf_counter() - started) * 1000.0)
+            started = time.perf_counter()
+            try:
+                legacy(filepath)
+            except Exception:
+                pass
+            timings["old"].append((time.perf_counter() - started) * 1000.0)
+        row = by_ext.setdefault(os.path.splitext(filepath)[1].lower(), {"new": [], "old": [], "bytes": 0, "titled": 0, "n": 0})
+        row["new"].append(sorted(timings["new"])[repeat // 2])
+        row["old"].append(sorted(timings["old"])[repeat // 2])
+        row["bytes"] += stats.get("bytes", 0)
+        row["titled"] += bool(record and record.get("title"))
+        row["n"] += 1
+    if not by_ext:
+        print("Аудиофайлы не найдены:", path)
+        return
+    print(f"{'формат':<8}{'файлов':>7}{'медиана, мс':>13}{'p95, мс':>9}{'прежде, мс':>12}{'КБ/файл':>9}{'с названием':>13}")
+    for ext, row in sorted(by_ext.items()):
+        new = sorted(row["new"])
+        print(f"{ext:<8}{row['n']:>7}{new[len(new) // 2]:>13.2f}{new[min(len(new) - 1, int(len(new) * 0.95))]:>9.2f}"
+              f"{sorted(row['old'])[len(new) // 2]:>12.2f}{row['bytes'] / row['n'] / 1024:>9.1f}"
+              f"{row['titled']:>8}/{row['n']}")
+
+def benchmark_search(count=100000, repeat=7, queries=None, seed=1):
+    """Задержка поиска на синтетической библиотеке из count треков (--bench-search [N]).
+
+    Названия, исполнители и альбомы — слова из слогов (латиница и кириллица), так что
+    короткие префиксы совпадают с десятками тысяч треков. Печатает медиану по каждому
+    запросу и возвращает {запрос: мс}; цель — не больше SEARCH_TARGET_MS.
+    """
+    rng = random.Random(seed)
+    syllables = (["ka", "ro", "mi", "la", "te", "no", "su", "ri", "va", "do", "be", "li", "an", "mo", "ke"],
+                 ["ка", "ро", "ми", "ла", "те", "но", "су", "ри", "ва", "до", "ан", "ло", "ме", "ки"])
+
+    def phrase(words):
+        alphabet = syllables[0] if rng.random() < 0.6 else syllables[1]
+        return " ".join("".join(rng.choice(alphabet) for _ in range(rng.randint(2, 4))) for _ in range(words))
+
+    index = SearchIndex()
+    started = time.perf_counter()
+    index.add_many((i, phrase(rng.randint(1, 4)), [phrase(rng.randint(1, 2))], phrase(rng.randint(1, 3)))
+                   for i in range(count))
+    print(f"индекс: {count} треков, {len(index._vocabulary)} слов за {time.perf_counter() - started:.1f} с")
+    results = {}
+    for query in queries or ["k", "ka", "ми", "ro mi", "ан ло", "karo", "миро", "kalame", "rolimo su"]:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found = index.search(query)
+            timings.append((time.perf_counter() - started) * 1000.0)
+        results[query] = sorted(timings)[repeat // 2]
+        mark = "" if results[query] <= SEARCH_TARGET_MS else "  > цели"
+        print(f"{query!r:<14}{results[query]:8.2f} мс{len(found):8} треков{mark}")
+    return results
+
+# ------------------------------------------------------------------
+# Фоновый анализ треков: длительность, громкость, пик, темп
+# ------------------------------------------------------------------
+def analyze_track(path, ffmpeg=None):
+    """Один проход по декодированному звуку; возвращает запись анализа или None.
+
+    Трек читается из ffmpeg кусками по секунде и сразу сворачивается в энергию
+    по шагам ANALYSIS_HOP, поэтому память не зависит от длины трека:
+    - duration — по числу декодированных кадров (точнее, чем заголовок VBR mp3);
+    - loudness — интегральная громкость с гейтингом по блокам 400 мс, как в BS.1770,
+      но без K-фильтра (дБ относительно полной шкалы, близко к LUFS);
+    - peak — пиковое значение сэмпла (0..1);
+    - bpm — по автокорреляции огибающей атак, None для слишком коротких треков.
+    """
+    ffmpeg = ffmpeg or shutil.which(FFMPEG_BIN)
+    if load_numpy() is None or not ffmpeg:
+        return None
+    cmd = [ffmpeg, "-nostdin", "-v", "error", "-i", path, "-vn",
+           "-f", "s16le", "-ac", "2", "-ar", str(ANALYSIS_SAMPLE_RATE), "-"]
+    nice = shutil.which("nice")
+    if nice:
+        cmd = [nice, "-n", str(ANALYSIS_NICE)] + cmd
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        print("Не удалось запустить ffmpeg для анализа:", e)
+        return None
+    hop_bytes = ANALYSIS_HOP * 4
+    chunk_bytes = hop_bytes * (ANALYSIS_SAMPLE_RATE // ANALYSIS_HOP)
+    powers = []
+    peak = 0.0
+    frames = 0
+    rest = b""
+    with proc:
+        while True:
+            data = proc.stdout.read(chunk_bytes)
+            if not data:
+                break
+            data = rest + data
+            usable = len(data) - len(data) % hop_bytes
+            rest = data[usable:]
+            if not usable:
+                continue
+            block = np.frombuffer(data[:usable], dtype=np.int16).reshape(-1, ANALYSIS_HOP, 2).astype(np.float32) / 32768.0
+            frames += block.shape[0] * ANALYSIS_HOP
+            peak = max(peak, float(np.abs(block).max()))
+            # средняя мощность шага, просуммированная по каналам
+            powers.append(np.square(block).mean(axis=1).sum(axis=1))
+    frames += len(rest) // 4
+    if proc.returncode or not powers:
+        return None
+    power = np.concatenate(powers).astype(np.float64)
+    fps = ANALYSIS_SAMPLE_RATE / ANALYSIS_HOP
+    return {
+        "version": ANALYSIS_VERSION,
+        "duration": round(frames / ANALYSIS_SAMPLE_RATE, 3),
+        "loudness": _integrated_loudness(power, fps),
+        "peak": round(peak, 4),
+        "bpm": _estimate_bpm(power, fps),
+    }
+
+
+def _integrated_loudness(power, fps):
+    """Гейтинг BS.1770: блоки 400 мс с шагом 100 мс, порог -70 и затем -10 от средней."""
+    size, step = max(1, int(round(0.4 * fps))), max(1, int(round(0.1 * fps)))
+    cumulative = np.concatenate(([0.0], np.cumsum(power)))
+    if len(power) >= size:
+        starts = np.arange(0, len(power) - size + 1, step)
+        blocks = (cumulative[starts + size] - cumulative[starts]) / size
+    else:
+        blocks = np.array([power.mean()])
+    levels = -0.691 + 10.0 * np.log10(np.maximum(blocks, 1e-12))
+    gated = blocks[levels > -70.0]
+    if not len(gated):
+        return None
+    threshold = -0.691 + 10.0 * np.log10(gated.mean()) - 10.0
+    gated = blocks[levels > max(-70.0, threshold)]
+    return round(float(-0.691 + 10.0 * np.log10(gated.mean())), 2)
 
-        self.layout.addWidget(self.btn_exit, alignment=Qt.AlignTop | Qt.AlignRight)
-        self.layout.addStretch()
-        self.layout.addWidget(self.cover_label)
-        self.layout.addWidget(self.title_label)
-        self.layout.addWidget(self.artist_label)
-        self.layout.addWidget(self.position_slider)
-        self.layout.addLayout(controls_layout)
-        self.layout.addStretch()
 
-        self.sync_timer = QTimer(self)
-        self.sync_timer.timeout.connect(self.sync_with_parent)
-        self.sync_timer.start(150)
+def _estimate_bpm(power, fps, low=60.0, high=200.0):
+    """Темп по автокорреляции огибающей атак; предпочтение темпам около 120 BPM."""
+    if len(power) < fps * 10:
+        return None
+    envelope = 10.0 * np.log10(power + 1e-10)
+    corr = _onset_autocorrelation(envelope)
+    n = len(corr)
+    if corr[0] <= 0:
+        return None
+    lags = np.arange(max(2, int(fps * 60.0 / high)), min(n - 2, int(fps * 60.0 / low)) + 1)
+    if not len(lags):
+        return None
+    # период доли редко кратен шагу огибающей: пик делится между соседними лагами, а на
+    # двойном периоде остаётся острым — поэтому пики ищутся по сумме трёх соседних лагов
+    smooth = corr[lags - 1] + corr[lags] + corr[lags + 1]
+    weight = np.exp(-0.5 * np.log2(60.0 * fps / lags / 120.0) ** 2)
+    top = int(np.argmax(smooth * weight))
+    best = int(lags[top])
+    # не кратный ли это период (60 BPM у трека в 180)? Доли на трети или половине периода
+    # должны быть почти так же сильны. В децибелах любая атака выглядит сильной, поэтому
+    # сила сравнивается по самой мощности: тихий хай-хет между долями темп не удваивает
+    strength = _onset_autocorrelation(power)
+    strength = strength[lags - 1] + strength[lags] + strength[lags + 1]
+    for divisor in (3, 2):
+        i = int(round(best / divisor)) - int(lags[0])   # номер в lags
+        window = strength[max(0, i - 1):max(0, i + 2)]
+        if len(window) and window.max() >= BPM_SUBDIVISION_RATIO * strength[top]:
+            best = int(lags[max(0, i - 1) + int(np.argmax(window))])
+            break
+    best += int(np.argmax(corr[best - 1:best + 2])) - 1   # вершина пика по самой автокорреляции
+    if corr[best] < BPM_MIN_CONFIDENCE * corr[0]:
+        return None  # ровный звук без выраженных долей
+    period = _parabolic_peak(corr, best)
+    # период уточняем по пику через несколько долей: ошибка дискретизации делится на их число
+    for beats in (8, 4, 2):
+        around = int(round(beats * period))
+        if around + 3 < n:
+            peak = around - 2 + int(np.argmax(corr[around - 2:around + 3]))
+            period = _parabolic_peak(corr, peak) / beats
+            break
+    return round(float(60.0 * fps / period), 1)
+
+
+def _onset_autocorrelation(envelope):
+    """Автокорреляция роста огибающей (атак) через БПФ; отсчёт i — сдвиг на i шагов."""
+    onset = np.maximum(0.0, np.diff(envelope))
+    onset -= onset.mean()
+    n = len(onset)
+    spectrum = np.fft.rfft(onset, 2 * n)
+    return np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+
+
+def _parabolic_peak(values, index):
+    """Положение максимума между отсчётами по параболе через три соседних значения."""
+    left, mid, right = values[index - 1], values[index], values[index + 1]
+    denom = left - 2 * mid + right
+    return index + (0.5 * (left - right) / denom if denom < 0 else 0.0)
+
+
+class TrackAnalyzer(QObject):
+    """Очередь фонового анализа с ограниченным числом задач в работе.
+
+    Треки, нужные прямо сейчас (текущий и следующий), ставятся в начало очереди.
+    Результаты приходят сигналом done в GUI-поток; состояние очереди не хранится —
+    после перезапуска её заново собирают из записей без анализа.
+    """
+    done = pyqtSignal(str, object)       # путь, запись анализа или None
+
+    def __init__(self, workers=ANALYSIS_WORKERS, parent=None):
+        super().__init__(parent)
+        self.workers = workers
+        self._executor = None
+        self._pending = deque()
+        self._queued = set()
+        self._running = 0
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.available = None             # есть ли numpy и ffmpeg (проверяется при первой задаче)
+
+    def __len__(self):
+        return len(self._pending) + self._running
+
+    def submit(self, paths):
+        with self._lock:
+            for path in paths:
+                if path not in self._queued:
+                    self._queued.add(path)
+                    self._pending.append(path)
+        self._fill()
+
+    def prioritize(self, path):
+        with self._lock:
+            if path in self._queued:
+                try:
+                    self._pending.remove(path)
+                except ValueError:
+                    return  # уже анализируется
+            self._queued.add(path)
+            self._pending.appendleft(path)
+        self._fill()
+
+    def discard(self, paths):
+        with self._lock:
+            paths = set(paths)
+            self._pending = deque(p for p in self._pending if p not in paths)
+            self._queued -= paths
+
+    def _fill(self):
+        if self.available is None:
+            self.available = load_numpy() is not None and shutil.which(FFMPEG_BIN) is not None
+            if not self.available:
+                print("Анализ треков недоступен: нужны numpy и ffmpeg")
+        with self._lock:
+            if self._stopped or not self.available:
+                self._pending.clear()
+                self._queued.clear()
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            started = []
+            while self._pending and self._running < self.workers:
+                started.append(self._pending.popleft())
+                self._running += 1
+        # вне блокировки: уже завершённая задача вызывает _finished прямо из add_done_callback
+        for path in started:
+            future = self._executor.submit(analyze_track, path)
+            future.add_done_callback(partial(self._finished, path))
+
+    def _finished(self, path, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            print("Ошибка анализа трека:", path, e)
+            result = None
+        with self._lock:
+            self._running -= 1
+            self._queued.discard(path)
+            stopped = self._stopped
+        if not stopped:
+            self.done.emit(path, result)
+            self._fill()
 
-    def sync_with_parent(self):
-        if not self.parent:
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            self._pending.clear()
+            executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class StartupProfiler:
+    """Время фаз запуска для --profile-startup: каждая отметка закрывает фазу, начатую предыдущей."""
+
+    def __init__(self, started, enabled=False, path=STARTUP_PROFILE_FILE, budget_ms=STARTUP_BUDGET_MS):
+        self.enabled = enabled
+        self.path = path
+        self.budget_ms = budget_ms
+        self.started = started
+        self.phases = []                  # (название, мс)
+        self._last = started
+        self.frame_ms = None              # от начала импорта до первого кадра
+        self.done = False
+
+    def mark(self, phase):
+        if self.done:
             return
-        self.position_slider.setValue(self.parent.position_slider.value())
-        if self.parent.is_playing:
-            self.btn_play_pause.setText("⏸")
-        else:
-            self.btn_play_pause.setText("▶")
-
-    def stop_sync_timer(self):
-        self.sync_timer.stop()
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000.0))
+        self._last = now
+
+    def first_frame(self):
+        self.mark("первый кадр")
+        self.frame_ms = (self._last - self.started) * 1000.0
+
+    def report(self):
+        """Закрывает замер; при --profile-startup печатает отчёт и дописывает его в STARTUP_PROFILE_FILE."""
+        self.done = True
+        if not self.enabled:
+            return
+        frame = self.frame_ms if self.frame_ms is not None else (self._last - self.started) * 1000.0
+        lines = [f"Запуск Sonora {time.strftime('%Y-%m-%d %H:%M:%S')}"]
+        for phase, ms in self.phases:
+            lines.append(f"  {phase:<28} {ms:8.1f} мс")
+        verdict = "в бюджете" if frame <= self.budget_ms else "ПРЕВЫШЕН бюджет"
+        lines.append(f"  {'итого до первого кадра':<28} {frame:8.1f} мс ({verdict} {self.budget_ms} мс)")
+        lines.append(f"  {'итого с фоновыми фазами':<28} {(self._last - self.started) * 1000.0:8.1f} мс")
+        text = "\n".join(lines)
+        print(text)
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(text + "\n\n")
+        except OSError as e:
+            print("Не удалось записать отчёт о запуске:", e)
 
-    def seek_and_sync(self):
-        if self.parent:
-            self.parent.position_slider.setValue(self.position_slider.value())
-            self.parent.seek_track()
-        self.sync_timer.start(150)
 
-    def update_info(self, title, artist, cover_data):
-        self.title_label.setText(title)
-        self.artist_label.setText(artist)
-        if cover_data:
-            pixmap = QPixmap()
-            pixmap.loadFromData(cover_data)
-            self.cover_label.setPixmap(pixmap.scaled(520, 520, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        else:
-            self.cover_label.setText("🎵")
+STARTUP = StartupProfiler(_MODULE_STARTED)
 
 # ------------------------------------------------------------------
 # Основное приложение: MusicPlayer
 # ------------------------------------------------------------------
 class MusicPlayer(QMainWindow):
+    availability_changed = pyqtSignal()   # изменился набор недоступных файлов (self.missing)
+    _first_paint = False                  # event() зовётся ещё из конструктора QMainWindow
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Sonora — переработанная версия")
         self.resize(1200, 720)
         self.setStyleSheet(SPOTIFY_QSS)
+        STARTUP.mark("окно и стили")
 
-        # pygame audio
-        pygame.init()
-        try:
-            pygame.mixer.init()
-        except Exception as e:
-            print("Pygame mixer init error:", e)
-        pygame.mixer.music.set_volume(0.5)
-        pygame.mixer.music.set_endevent(pygame.USEREVENT)
+        # pygame audio: поднимается сразу после первого кадра (init_audio) или при первом воспроизведении
+        self.audio_ready = False
 
         # состояние
-        self.tracks = []               # список полных путей
-        self.albums = defaultdict(list)
-        self.artists = defaultdict(list)
+        self.library = LibraryModel()  # пути + индексы альбомов/исполнителей
+        self.covers = CoverCache()     # миниатюры обложек всех размеров
+        self.search_index = SearchIndex()
+        self.home_albums = None          # разделы главной, создаются в build_home
+        self.home_artists = None
+        self._stale_names = set()        # альбомы/исполнители, чьи карточки и страницы надо обновить
+        self.view_cache = OrderedDict()  # ("album"|"artist", имя) -> живая страница в stacked_widget
+        self.all_tracks_list = None      # постоянные страницы строятся при первом показе
+        self.favorites_list = None
+        self.search_list = None
+        self._nav_current = None         # ключ показанной страницы, например ("album", имя)
+        self._nav_back = []
+        self._nav_forward = []
+        self._nav_replay = False
+        self.search_pool = QThreadPool(self)
+        self.search_pool.setMaxThreadCount(1)
+        self.search_signals = SearchSignals()
+        self.search_signals.done.connect(self._on_search_done)
+        self._search_generation = 0
+        self._search_text = ""
+        self._search_requested_at = 0.0
+        self._search_started_at = 0.0
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self._run_search)
+        # при запуске поисковый индекс достраивается кусками уже после первого кадра
+        self._search_backlog = []
+        self._search_build_started = 0.0
+        self.search_build_timer = QTimer(self)
+        self.search_build_timer.setInterval(0)
+        self.search_build_timer.timeout.connect(self._build_search_step)
+        self.cover_loader = CoverLoader(self.covers, parent=self)
+        self.last_index_ms = 0.0
         self.current_index = -1
         self.is_playing = False
         self.is_shuffled = False
+        self._queued_path = None          # следующий трек, уже стоящий в очереди бэкенда
+        self.audio = None                 # бэкенд воспроизведения, создаётся в init_audio
+        self.play_order = None            # порядок микса (список путей); None — порядок библиотеки
+        self.analyzer = TrackAnalyzer(parent=self)  # длительность/громкость/темп в фоне, см. start_analysis
+        self.analyzer.done.connect(self._on_analysis_ready)
+        self._analysis_failed = set()     # не анализируются (нет ffmpeg/numpy, битый файл) — в этом сеансе не повторяем
+        self.sort_mode = "library"        # сортировка страницы «Все треки», ключ TRACK_SORTS
+        self.fingerprint_thread = None    # FingerprintThread, см. start_fingerprinting
+        self._fingerprint_failed = set()  # нечитаемые файлы — в этом сеансе не повторяем
+        self.duplicate_index = DuplicateIndex()
+        self.duplicate_groups = []        # списки путей одной записи, см. update_duplicates
+        self.collapse_duplicates = False  # показывать из каждой группы дубликатов один трек
+        self.hidden_duplicates = set()    # скрытые дубликаты (пусто, если collapse_duplicates выключен)
+        self.duplicates_timer = QTimer(self)
+        self.duplicates_timer.setSingleShot(True)
+        self.duplicates_timer.setInterval(500)
+        self.duplicates_timer.timeout.connect(self.update_duplicates)
+        self.duplicates_check = None
         # favorites хранится как set путей
         self.favorites = set()
+        self.missing = set()              # треки, чьих файлов сейчас нет (помечает фоновая проверка)
         self.track_length = 0
         self.artist_avatars = {}
         self.artist_backgrounds = {}
 
-        # автосохранение debounce
-        self._last_save_time = 0.0
+        # автосохранение: запись через AUTOSAVE_DEBOUNCE после последнего изменения
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(int(AUTOSAVE_DEBOUNCE * 1000))
+        self.save_timer.timeout.connect(self.save_state)
+        self._save_pending_since = None
+
+        # база библиотеки (при первом запуске сюда переносится старый JSON)
+        self.store = LibraryStore()
+        self.store.open()
+
+        # кэш метаданных: все хелперы тегов читают из него, а не из файлов
+        self.metadata = MetadataCache(self.store)
+        self.metadata.load()
+        STARTUP.mark("база и кэш метаданных")
 
         # UI
         self.init_ui()
+        STARTUP.mark("интерфейс")
 
         # загрузка состояния + автоматическая загрузка музыки
         self.load_state()
@@ -483,10 +3809,10 @@ class MusicPlayer(QMainWindow):
         if not self.tracks:
             self.scanner_thread = None
         else:
-            # восстановить структуру (альбомы/артисты) из сохранённых треков
-            self._rebuild_indexes()
+            # индексы уже собраны в load_state
             self.show_home()
             self.update_track_info()
+        STARTUP.mark("главная")
 
         # таймеры и события
         self.position_timer = QTimer()
@@ -501,6 +3827,22 @@ class MusicPlayer(QMainWindow):
 
         # scanner thread placeholder
         self.scanner_thread = None
+        self.metadata_thread = None
+        self.sweeper_thread = None
+        self.watcher = None               # LibraryWatcher, запускается после первого кадра
+        self._scan_found = 0              # файлов, найденных текущим полным сканом
+        self._scan_stats = None           # статистика идущего скана: обход + чтение тегов, см. _finish_scan_stats
+        self.scan_history = []            # прошлые сканы (новые первыми) — для оценки оставшегося времени
+        self._load_backlog = []           # файлы, пришедшие во время загрузки тегов (скан пачками, слежение)
+
+        # сохранённой библиотеке верим сразу; наличие файлов проверяется уже после первого кадра
+        if self.tracks:
+            QTimer.singleShot(0, self.start_existence_sweep)
+
+    @property
+    def tracks(self):
+        """Список полных путей в порядке библиотеки (принадлежит self.library)."""
+        return self.library.paths
 
     # ---------- UI ----------
     def init_ui(self):
@@ -539,6 +3881,12 @@ class MusicPlayer(QMainWindow):
         self.progress_bar.setMaximum(100)
         self.status.addPermanentWidget(self.progress_bar, 1)
 
+        # навигация по истории страниц
+        QShortcut(QKeySequence("Alt+Left"), self, activated=self.go_back)
+        QShortcut(QKeySequence("Alt+Right"), self, activated=self.go_forward)
+        QShortcut(QKeySequence(Qt.Key_Back), self, activated=self.go_back)
+        QShortcut(QKeySequence(Qt.Key_Forward), self, activated=self.go_forward)
+
         # show default
         self.show_home()
 
@@ -560,12 +3908,12 @@ class MusicPlayer(QMainWindow):
         self.btn_scan = QPushButton("🔎 Сканировать (быстро)")
         self.btn_scan_full = QPushButton("🔍 Глубокий скан")
 
-        self.btn_home.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
+        self.btn_home.clicked.connect(self.show_home)
         self.btn_tracks.clicked.connect(self.show_all_tracks)
         self.btn_search.clicked.connect(self.show_search)
         self.btn_collection.clicked.connect(self.show_collection)
         self.btn_scan.clicked.connect(self.load_music_automatically)
-        self.btn_scan_full.clicked.connect(partial(self.start_scan, deep=True))
+        self.btn_scan_full.clicked.connect(lambda: self.start_scan(deep=True))
 
         for btn in [self.btn_home, self.btn_tracks, self.btn_search, self.btn_collection, self.btn_scan, self.btn_scan_full]:
             btn.setFixedHeight(36)
@@ -592,15 +3940,7 @@ class MusicPlayer(QMainWindow):
         self.collection_layout = QVBoxLayout(self.collection_page)
         self.stacked_widget.addWidget(self.collection_page)
 
-        # album
-        self.album_page = QWidget()
-        self.album_layout = QVBoxLayout(self.album_page)
-        self.stacked_widget.addWidget(self.album_page)
-
-        # artist
-        self.artist_page = QWidget()
-        self.artist_layout = QVBoxLayout(self.artist_page)
-        self.stacked_widget.addWidget(self.artist_page)
+        # страницы альбомов и исполнителей добавляются по мере посещения (см. view_cache)
 
         # all tracks
         self.all_tracks_page = QWidget()
@@ -690,78 +4030,659 @@ class MusicPlayer(QMainWindow):
 
     # ---------- сканирование и загрузка ----------
     def load_music_automatically(self):
-        """Быстрый скан по DEFAULT_SCAN_PATHS в фоне."""
-        self.start_scan(paths=DEFAULT_SCAN_PATHS, deep=False)
+        """Быстрый инкрементальный скан по DEFAULT_SCAN_PATHS в фоне."""
+        self.start_scan(paths=DEFAULT_SCAN_PATHS, deep=False, incremental=True)
 
-    def start_scan(self, paths=None, deep=False):
+    def start_scan(self, paths=None, deep=False, incremental=False):
         if self.scanner_thread is not None and self.scanner_thread.isRunning():
             self.scanner_thread.stop()
             self.scanner_thread.wait(500)
         if paths is None:
-            paths = DEFAULT_SCAN_PATHS
+            paths = DEEP_SCAN_PATHS if deep else DEFAULT_SCAN_PATHS
 
         self.progress_bar.setValue(0)
         self.progress_bar.setVisible(True)
         self.status.showMessage("Запуск сканирования...")
-        self.scanner_thread = ScannerThread(paths=paths, deep=deep)
+        kind = "deep" if deep else ("quick" if incremental else "full")
+        # оставшееся время оцениваем по числу каталогов прошлого такого же скана
+        previous = next((st for st in self.scan_history
+                         if st.get("kind") == kind and st.get("roots") == list(paths)), None)
+        self.scanner_thread = ScannerThread(paths=paths, deep=deep, incremental=incremental, known=set(self.library.paths),
+                                            expected_dirs=previous["dirs"] if previous else None)
+        self._scan_stats = {"kind": kind, "tag_files": 0, "tag_bytes": 0, "tag_seconds": 0.0}
         self.scanner_thread.progress.connect(self._on_scan_progress)
-        self.scanner_thread.result.connect(self._on_scan_result)
+        self.scanner_thread.stats.connect(self._on_scan_stats)
+        self.scanner_thread.finished.connect(self._on_scan_finished)
+        if incremental:
+            self.scanner_thread.changes.connect(self._on_scan_changes)
+        else:
+            self._scan_found = 0
+            self.scanner_thread.found.connect(self._on_scan_found)
         self.scanner_thread.message.connect(self.status.showMessage)
         self.scanner_thread.start()
 
     def _on_scan_progress(self, percent):
         self.progress_bar.setValue(percent)
 
-    def _on_scan_result(self, files):
+    def _on_scan_found(self, files):
+        # полный скан отдаёт файлы пачками: теги первых читаются, пока сканер идёт дальше
+        self._scan_found += len(files)
+        self.load_tracks(files)
+
+    def _on_scan_stats(self, stats):
+        text = (f"Сканирование: {stats['dirs']} папок ({stats['dirs_per_sec']:.0f}/с) · "
+                f"{stats['files']} файлов ({stats['files_per_sec']:.0f}/с)")
+        if stats["eta"] is not None:
+            text += f" · осталось ≈{stats['eta']:.0f} с"
+        self.status.showMessage(text)
+
+    def _on_scan_finished(self):
+        if self.sender() is not self.scanner_thread:
+            return
+        if self._scan_stats is not None:
+            if self.scanner_thread.result_stats:
+                self._scan_stats.update(self.scanner_thread.result_stats)
+            else:
+                self._scan_stats = None   # скан остановлен — неполную статистику не сохраняем
+        if not self.scanner_thread.incremental:
+            if self.metadata_thread is None or not self.metadata_thread.isRunning():
+                self.progress_bar.setVisible(False)
+            self.status.showMessage(f"Найдено файлов: {self._scan_found}")
+        self._finish_scan_stats()
+
+    def _finish_scan_stats(self):
+        """Когда и обход, и чтение тегов найденного закончены — сохраняет статистику скана в базу."""
+        stats = self._scan_stats
+        if stats is None or "seconds" not in stats or self._load_backlog:
+            return
+        if self.metadata_thread is not None and self.metadata_thread.isRunning():
+            return
+        self._scan_stats = None
+        stats["tag_mb_per_sec"] = round(stats["tag_bytes"] / 1048576 / max(stats["tag_seconds"], 1e-6), 2)
+        stats["tag_seconds"] = round(stats["tag_seconds"], 3)
+        stats["total_seconds"] = round(time.time() - stats["started"], 3)
+        stats["library_size"] = len(self.tracks)
+        self.scan_history.insert(0, stats)
+        self.store.add_scan_stats(stats)
+        self.save_state_debounced()
+        self.status.showMessage(
+            f"Скан: {stats['dirs']} папок, {stats['files']} файлов за {stats['seconds']:.1f} с "
+            f"({stats['dirs_per_sec']:.0f} папок/с) · теги: {stats['tag_files']} файлов, "
+            f"{stats['tag_bytes'] / 1048576:.1f} МБ за {stats['tag_seconds']:.1f} с"
+        )
+
+    def _on_scan_changes(self, added, removed, modified):
         self.progress_bar.setVisible(False)
-        self.status.showMessage(f"Найдено файлов: {len(files)}")
-        if files:
-            self.load_tracks(files)
+        self.status.showMessage(f"Изменения: +{len(added)} / -{len(removed)} / ~{len(modified)}")
+        if removed:
+            self.remove_tracks(removed)
+        if added or modified:
+            self.load_tracks(added + modified)
+
+    def remove_tracks(self, paths):
+        """Убирает треки из библиотеки (сами файлы не трогает)."""
+        current = self.tracks[self.current_index] if 0 <= self.current_index < len(self.tracks) else None
+        started = time.perf_counter()
+        for p in paths:
+            track_id = self.library.id_of(p)
+            if track_id is not None:
+                self.search_index.remove(track_id)
+                self._mark_stale(p)
+        gone = self.library.remove_many(paths)
+        if not gone:
+            return
+        self._report_index_time(len(gone), started)
+        self.store.remove_tracks(gone)
+        self.favorites -= gone
+        self.missing -= gone
+        self.analyzer.discard(gone)
+        self.hidden_duplicates -= gone
+        self.duplicates_timer.start()
+        for p in gone:
+            self.duplicate_index.remove(p)
+            self.metadata.invalidate(p)
+        # если удаляли текущий трек — остановить воспроизведение
+        if current in gone:
+            if self.audio_ready:
+                self.audio.stop()  # вместе с очередью
+            self._queued_path = None
+            self.current_index = -1
+            self.is_playing = False
+            self.btn_play_pause.setText("▶")
+        elif current is not None:
+            self.current_index = self.library.index_of(current)
+            if self._queued_path in gone and self.is_playing:
+                self._queue_next()
+        # обновляем UI
+        self.refresh_library_views()
+        self.update_track_info()
+        self.save_state_debounced()
 
     def load_tracks(self, files):
-        # добавляем новые треки, не дублируя, и пересобираем индексы
-        new_added = 0
-        for f in files:
-            if not os.path.exists(f):
-                continue
-            if f not in self.tracks:
-                self.tracks.append(f)
-                new_added += 1
-        if new_added > 0:
-            self._rebuild_indexes()
-            self.show_home()
+        """Отправляет файлы в пул извлечения тегов; треки добавляются по мере готовности пачек.
+
+        Идущую загрузку не прерывает: новые файлы ждут в очереди и уходят в пул, когда она закончится.
+        """
+        if self.metadata_thread is not None and self.metadata_thread.isRunning():
+            self._load_backlog.extend(files)
+            return
+        self._start_loading(files)
+
+    def _start_loading(self, files):
+        paths = list(dict.fromkeys(files))
+        known = {p: self.metadata.known_stat(p) for p in paths}
+        self._load_added = 0
+        self._load_changed = 0
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.metadata_thread = MetadataExtractorThread(paths, known, self.metadata.covers_dir)
+        self.metadata_thread.batch.connect(self._on_metadata_batch)
+        self.metadata_thread.progress.connect(self._on_scan_progress)
+        self.metadata_thread.message.connect(self.status.showMessage)
+        self.metadata_thread.finished.connect(self._on_metadata_finished)
+        self.metadata_thread.start()
+
+    def _on_metadata_batch(self, batch):
+        # добавляем новые треки, не дублируя; индексы обновляются только для новых и изменённых
+        added = []
+        changed = []
+        revived = self.missing.intersection(p for p, _ in batch)
+        if revived:
+            # файлы нашлись при сканировании — они снова доступны
+            self.missing -= revived
+            self.availability_changed.emit()
+        for path, record in batch:
+            if record is not None:
+                old = self.metadata.records.get(path)
+                if old is not None and (old.get("mtime"), old.get("size")) == (record["mtime"], record["size"]):
+                    # файл тот же (перечитан после смены разбора) — анализ и отпечаток остаются в силе
+                    for key in MetadataCache.AUDIO_KEYS:
+                        if key in old:
+                            record.setdefault(key, old[key])
+                self.metadata.update(path, record)
+            if self.library.add(path) is not None:
+                added.append(path)
+            elif record is not None:
+                changed.append(path)
+        if added:
+            self.store.add_tracks(added)
+        if added or changed:
+            self._update_indexes(added=added, changed=changed)
+            self.duplicates_timer.start()
+            self._load_added += len(added)
+            self._load_changed += len(changed)
+
+    def _on_metadata_finished(self):
+        if self.sender() is not self.metadata_thread:
+            return
+        if self._scan_stats is not None:
+            self._scan_stats["tag_files"] += self.metadata_thread.files_read
+            self._scan_stats["tag_bytes"] += self.metadata_thread.bytes_read
+            self._scan_stats["tag_seconds"] += self.metadata_thread.elapsed
+        self.progress_bar.setVisible(False)
+        if self._load_added or self._load_changed:
+            self.refresh_library_views()
             self.save_state_debounced()
-        self.status.showMessage(f"Добавлено новых треков: {new_added}")
+            self.start_analysis()
+            self.start_fingerprinting()
+        self.status.showMessage(f"Добавлено новых треков: {self._load_added}")
+        if self._load_backlog:
+            paths, self._load_backlog = self._load_backlog, []
+            self._start_loading(paths)
+        self._finish_scan_stats()
+
+    def upgrade_metadata(self):
+        """Перечитывает в фоне записи, сохранённые прежней версией разбора тегов (см. METADATA_VERSION)."""
+        outdated = [p for p in self.metadata.outdated(self.tracks) if p not in self.missing]
+        if outdated:
+            self.load_tracks(outdated)
+
+    def start_existence_sweep(self):
+        """Проверяет наличие файлов библиотеки в фоне; пропавшие помечаются, а не удаляются."""
+        if self.sweeper_thread is not None and self.sweeper_thread.isRunning():
+            self.sweeper_thread.stop()
+            self.sweeper_thread.wait(500)
+        self.sweeper_thread = ExistenceSweeperThread(list(self.tracks))
+        self.sweeper_thread.missing.connect(self._mark_missing)
+        self.sweeper_thread.finished.connect(self._on_sweep_finished)
+        self.sweeper_thread.start()
+
+    def start_watching(self):
+        """Живое обновление: изменения в корнях сканирования применяются без пересканирования."""
+        if not WATCH_LIBRARY or self.watcher is not None:
+            return
+        self.watcher = LibraryWatcher(DEFAULT_SCAN_PATHS, known=self.tracks, parent=self)
+        self.watcher.changes.connect(self._on_watch_changes)
+        self.watcher.unavailable.connect(self._mark_missing)
+        self.watcher.start()
+
+    def _on_watch_changes(self, added, removed, modified, moved):
+        if moved:
+            self.rename_tracks(moved)
+        if removed:
+            self.remove_tracks(removed)
+        if added or modified:
+            self.load_tracks(added + modified)
+        self.status.showMessage(
+            f"Изменения на диске: +{len(added)} / -{len(removed)} / ~{len(modified)} / переименовано {len(moved)}")
+
+    def rename_tracks(self, moved):
+        """Переименованные и перенесённые файлы: трек остаётся на своём месте в библиотеке
+        и сохраняет избранное, теги и анализ; играющий трек продолжает играть."""
+        fresh = []
+        for old, new in moved:
+            if old not in self.library:
+                fresh.append(new)
+                continue
+            if new in self.library:
+                # файл переехал поверх другого трека: тот заменён и убирается, а переехавший
+                # переименовывается как обычно — избранное и воспроизведение идут за файлом
+                self.remove_tracks([new])
+            self._mark_stale(old)
+            self.library.rename(old, new)
+            self.metadata.rename(old, new)
+            self.store.rename_track(old, new)
+            self._index_track(new)  # название без тегов берётся из имени файла
+            if old in self.favorites:
+                self.favorites.discard(old)
+                self.favorites.add(new)
+            if old in self.missing:
+                self.missing.discard(old)
+                self.availability_changed.emit()
+            self.duplicate_index.rename(old, new)
+            if old in self.hidden_duplicates:
+                self.hidden_duplicates.discard(old)
+                self.hidden_duplicates.add(new)
+            if self._queued_path == old:
+                self._queued_path = new
+            if self.play_order:
+                self.play_order = [new if p == old else p for p in self.play_order]
+            if self.audio_ready:
+                self.audio.rename(old, new)
+        if fresh:
+            self.load_tracks(fresh)
+        self.duplicates_timer.start()
+        self.refresh_library_views()
+        self.save_state_debounced()
+
+    def _mark_missing(self, paths):
+        new = [p for p in paths if p in self.library and p not in self.missing]
+        if new:
+            self.missing.update(new)
+            self.availability_changed.emit()
+
+    def _on_sweep_finished(self):
+        if self.sender() is not self.sweeper_thread:
+            return
+        if self.missing:
+            self.status.showMessage(f"Недоступно файлов: {len(self.missing)}")
+
+    # ---------- фоновый анализ ----------
+    def track_analysis(self, path):
+        """Результат фонового анализа трека или None, если его ещё нет (или он от старой версии)."""
+        record = self.metadata.records.get(path)
+        analysis = record.get("analysis") if record else None
+        if analysis and analysis.get("version") == ANALYSIS_VERSION:
+            return analysis
+        return None
+
+    def track_duration(self, path):
+        """Длительность по декодированному звуку, если трек проанализирован, иначе из заголовка файла."""
+        analysis = self.track_analysis(path)
+        if analysis and analysis.get("duration"):
+            return analysis["duration"]
+        return self.metadata.get(path).get("duration") or 0
+
+    def start_analysis(self):
+        """Ставит в очередь анализа все треки без актуального результата.
+
+        Результаты сразу пишутся в кэш метаданных, поэтому после перезапуска
+        очередь продолжается с того места, где остановилась.
+        """
+        pending = [p for p in self.tracks
+                   if p not in self.missing and p not in self._analysis_failed and self.track_analysis(p) is None]
+        if pending:
+            self.analyzer.submit(pending)
+
+    def _on_analysis_ready(self, path, analysis):
+        if analysis is None:
+            self._analysis_failed.add(path)
+            return
+        record = self.metadata.records.get(path)
+        if record is None or path not in self.library:
+            return
+        record["analysis"] = analysis
+        self.metadata.update(path, record)
+        self.save_state_debounced()
+        # играющий трек не трогаем (был бы скачок громкости), а трек в очереди ещё успевает
+        if path == self._queued_path and self.audio_ready:
+            self.audio.set_gain(path, self._track_gain(path))
+        if 0 <= self.current_index < len(self.tracks) and self.tracks[self.current_index] == path:
+            self.track_length = self.track_duration(path)
+
+    # ---------- дубликаты ----------
+    def track_fingerprint(self, path):
+        """Отпечаток звуковых данных трека или None, если он ещё не посчитан."""
+        record = self.metadata.records.get(path)
+        fingerprint = record.get("fingerprint") if record else None
+        if fingerprint and fingerprint.startswith(f"{FINGERPRINT_VERSION}:"):
+            return fingerprint
+        return None
+
+    def track_payload_hash(self, path):
+        """Хэш всех звуковых данных трека или None, если его ещё нет (нужен только при совпадении отпечатков)."""
+        fingerprint = self.track_fingerprint(path)
+        if fingerprint is None:
+            return None
+        if fingerprint_is_full(fingerprint):
+            return fingerprint
+        payload_hash = self.metadata.records[path].get("payload_hash")
+        if payload_hash and payload_hash.startswith(f"{FINGERPRINT_VERSION}:"):
+            return payload_hash
+        return None
+
+    def start_fingerprinting(self):
+        """Считает в фоне отпечатки треков, у которых их нет, а затем — хэш всех данных
+        для треков с совпавшими отпечатками.
+
+        Отпечаток хранится в записи кэша метаданных: после перезапуска не пересчитывается,
+        а при изменении файла запись перечитывается — и отпечаток считается заново.
+        """
+        if self.fingerprint_thread is not None and self.fingerprint_thread.isRunning():
+            return  # новые треки подхватит _on_fingerprints_finished
+        pending = [p for p in self.tracks
+                   if p not in self.missing and p not in self._fingerprint_failed
+                   and p in self.metadata.records and self.track_fingerprint(p) is None]
+        full = not pending
+        if full:
+            pending = sorted(p for p in self.duplicate_index.unconfirmed()
+                             if p not in self.missing and p not in self._fingerprint_failed)
+        if not pending:
+            self.update_duplicates()
+            return
+        self.fingerprint_thread = FingerprintThread(pending, full=full)
+        self.fingerprint_thread.batch.connect(self._on_fingerprints)
+        self.fingerprint_thread.finished.connect(self._on_fingerprints_finished)
+        self.fingerprint_thread.start(QThread.LowPriority)
+
+    def _on_fingerprints(self, full, batch):
+        for path, fingerprint in batch:
+            record = self.metadata.records.get(path)
+            if fingerprint is None:
+                self._fingerprint_failed.add(path)
+            elif record is not None and path in self.library:
+                record["payload_hash" if full else "fingerprint"] = fingerprint
+                self.metadata.update(path, record)
+                self._index_duplicate(path)
+        self.duplicates_timer.start()
+        self.save_state_debounced()
+
+    def _on_fingerprints_finished(self):
+        if self.sender() is self.fingerprint_thread:
+            self.start_fingerprinting()
+
+    def _index_duplicate(self, path):
+        # название и исполнители из тегов; без тегов (название из имени файла) по ним не сравниваем
+        record = self.metadata.records.get(path)
+        key = None
+        if record and record.get("title") and record.get("artists"):
+            key = (fold_text(record["title"]), fold_text(", ".join(sorted(record["artists"]))))
+        duration = (record.get("duration") or 0) if record else 0
+        self.duplicate_index.update(path, self.track_fingerprint(path), key, duration, self.track_payload_hash(path))
+
+    def _duplicate_rank(self, path):
+        # какой трек группы показывать: избранный, затем без потерь, затем с большим объёмом звука
+        fingerprint = self.track_fingerprint(path)
+        return (path in self.favorites, os.path.splitext(path)[1].lower() in LOSSLESS_EXTS,
+                int(fingerprint.split(":")[1]) if fingerprint else 0)
+
+    def update_duplicates(self):
+        """Пересобирает группы дубликатов и, если они свёрнуты, обновляет видимые списки."""
+        self.duplicates_timer.stop()
+        self.duplicate_groups = self.duplicate_index.groups(key=self.library.index_of)
+        hidden = set()
+        if self.collapse_duplicates:
+            for group in self.duplicate_groups:
+                keep = max(group, key=self._duplicate_rank)
+                hidden.update(p for p in group if p != keep)
+        extra = sum(len(g) - 1 for g in self.duplicate_groups)
+        if self.duplicates_check is not None:
+            self.duplicates_check.setText(f"Скрыть дубликаты ({extra})")
+        if hidden != self.hidden_duplicates:
+            for path in hidden.symmetric_difference(self.hidden_duplicates):
+                self._mark_stale(path)
+            self.hidden_duplicates = hidden
+            self.refresh_library_views()
+            if self._queued_path in hidden and self.is_playing:
+                self._queue_next()
+
+    def duplicates_of(self, path):
+        """Другие файлы той же записи."""
+        for group in self.duplicate_groups:
+            if path in group:
+                return [p for p in group if p != path]
+        return []
+
+    def _on_collapse_toggled(self, checked):
+        self.collapse_duplicates = bool(checked)
+        self.update_duplicates()
+        self.save_state_debounced()
+
+    def _visible(self, paths):
+        # списки на страницах: скрытые дубликаты не показываются
+        if not self.hidden_duplicates:
+            return paths
+        return [p for p in paths if p not in self.hidden_duplicates]
 
     def _rebuild_indexes(self):
-        self.albums.clear()
-        self.artists.clear()
+        """Полная сборка индексов (только при загрузке состояния).
+
+        Альбомы/исполнители нужны главной сразу; поисковый индекс строится после первого кадра.
+        """
+        started = time.perf_counter()
+        self.search_index.clear()
+        self.duplicate_index = DuplicateIndex()
         for t in self.tracks:
-            try:
-                title, artists_str = self.get_track_info_from_file(t)
-                album = self.get_tag(t, "TALB", "Неизвестный альбом")
-                self.albums[album].append(t)
-                artists = [a.strip() for a in artists_str.replace(';', ',').split(',') if a.strip()]
-                for a in artists:
-                    self.artists[a].append(t)
-            except Exception:
+            self._index_library(t)
+        self._report_index_time(len(self.tracks), started)
+        self._search_backlog = list(self.tracks)
+        self._search_build_started = time.perf_counter()
+        if self._first_paint:
+            self.search_build_timer.start()
+
+    def _build_search_step(self):
+        chunk = self._search_backlog[-SEARCH_BUILD_CHUNK:]
+        del self._search_backlog[-SEARCH_BUILD_CHUNK:]
+        items = []
+        for t in chunk:
+            track_id = self.library.id_of(t)
+            if track_id is None:
                 continue
+            keys = self.library.keys_of(t)
+            title = self.get_track_info_from_file(t)[0]
+            items.append((track_id, title, keys[1] if keys else [], keys[0] if keys else ""))
+            self._index_duplicate(t)
+        self.search_index.add_many(items)
+        if not self._search_backlog:
+            self.search_build_timer.stop()
+            self.duplicates_timer.start()
+            elapsed = (time.perf_counter() - self._search_build_started) * 1000.0
+            self.status.showMessage(f"Поисковый индекс готов: {len(self.search_index)} треков за {elapsed:.0f} мс")
+            if self.search_list is not None:
+                self.schedule_search(self._search_text)
+
+    def _update_indexes(self, added=(), changed=()):
+        """Инкрементальное обновление: трогаются только корзины затронутых треков."""
+        started = time.perf_counter()
+        for t in changed:
+            self._index_track(t)
+        for t in added:
+            self._index_track(t)
+        self._report_index_time(len(added) + len(changed), started)
+
+    def _index_track(self, track_path):
+        keys = self._index_library(track_path)
+        if keys is None:
+            return
+        title = self.get_track_info_from_file(track_path)[0]
+        self.search_index.add(self.library.id_of(track_path), title, keys[1], keys[0])
+        self._index_duplicate(track_path)
+
+    def _index_library(self, track_path):
+        """Корзины альбома/исполнителей трека; возвращает (album, artists) или None."""
+        try:
+            album = self.get_tag(track_path, "TALB", "Неизвестный альбом")
+            artists = self.get_track_artists(track_path) or ["Неизвестный исполнитель"]
+        except Exception:
+            return None
+        self._mark_stale(track_path)
+        self.library.index(track_path, album, artists)
+        self._mark_stale(track_path)
+        return album, artists
+
+    def _mark_stale(self, track_path):
+        # альбом/исполнители трека изменились: их карточки на главной и открытые страницы обновить
+        keys = self.library.keys_of(track_path)
+        if keys is not None:
+            self._stale_names.add(keys[0])
+            self._stale_names.update(keys[1])
+
+    def _report_index_time(self, count, started):
+        self.last_index_ms = (time.perf_counter() - started) * 1000.0
+        self.status.showMessage(f"Индексация: {count} треков за {self.last_index_ms:.1f} мс")
 
     # ---------- дисплеи (home/all tracks/search/collection/album/artist) ----------
-    def clear_layout(self, layout):
-        if layout is None:
+    def _navigated(self, key):
+        """Запоминает переход в истории «Назад/Вперёд» (кроме переходов по самой истории)."""
+        if self._nav_current is not None and self._nav_current != key and not self._nav_replay:
+            self._nav_back.append(self._nav_current)
+            del self._nav_back[:-NAV_HISTORY_SIZE]
+            self._nav_forward.clear()
+        self._nav_current = key
+
+    def _open_view(self, key):
+        self._nav_replay = True
+        try:
+            kind, name = key
+            if kind == "album":
+                self.show_album_view(name)
+            elif kind == "artist":
+                self.show_artist_view(name)
+            elif kind == "tracks":
+                self.show_all_tracks()
+            elif kind == "search":
+                self.show_search()
+            elif kind == "collection":
+                self.show_collection()
+            elif kind == "mix":
+                self.show_mix_view(name)
+            else:
+                self.show_home()
+        finally:
+            self._nav_replay = False
+
+    def _view_alive(self, key):
+        # страницы удалённых из библиотеки альбомов/исполнителей в истории пропускаем
+        kind, name = key
+        if kind == "album":
+            return name in self.library.albums
+        if kind == "artist":
+            return name in self.library.artists
+        if kind == "mix":
+            return name in self.library
+        return True
+
+    def go_back(self):
+        while self._nav_back and not self._view_alive(self._nav_back[-1]):
+            self._nav_back.pop()
+        if not self._nav_back:
+            if self._nav_current != ("home", None):
+                self.show_home()
+            return
+        self._nav_forward.append(self._nav_current)
+        self._open_view(self._nav_back.pop())
+
+    def go_forward(self):
+        while self._nav_forward and not self._view_alive(self._nav_forward[-1]):
+            self._nav_forward.pop()
+        if not self._nav_forward:
+            return
+        self._nav_back.append(self._nav_current)
+        self._open_view(self._nav_forward.pop())
+
+    def mousePressEvent(self, event):
+        # боковые кнопки мыши листают историю
+        if event.button() == Qt.BackButton:
+            self.go_back()
+        elif event.button() == Qt.ForwardButton:
+            self.go_forward()
+        else:
+            super().mousePressEvent(event)
+
+    def refresh_library_views(self):
+        """После изменения библиотеки точечно обновляет главную и живые страницы, ничего не пересобирая."""
+        stale = self._stale_names
+        self._stale_names = set()
+        self.refresh_home(stale)
+        for key, page in list(self.view_cache.items()):
+            if key[1] in stale:
+                self._refresh_view(key, page)
+        current = self.stacked_widget.currentWidget()
+        if current is self.all_tracks_page:
+            self._sync_all_tracks()
+        elif current is self.collection_page:
+            self._sync_collection()
+        elif current is self.search_page and self.search_list is not None:
+            self.schedule_search(self._search_text)
+
+    def _open_cached_view(self, key, build):
+        """Показывает страницу из view_cache; новая строится один раз, самая давняя вытесняется."""
+        page = self.view_cache.get(key)
+        if page is None:
+            page = build(key[1])
+            self.stacked_widget.addWidget(page)
+            self.view_cache[key] = page
+            while len(self.view_cache) > VIEW_CACHE_SIZE:
+                _, old = self.view_cache.popitem(last=False)
+                self._drop_view(old)
+        else:
+            self.view_cache.move_to_end(key)
+        self.stacked_widget.setCurrentWidget(page)
+        self._navigated(key)
+
+    def _drop_view(self, page):
+        # незавершённые загрузки обложек для этой страницы больше не нужны
+        self.cover_loader.cancel(page)
+        self.cover_loader.cancel(page.track_list.model())
+        self.stacked_widget.removeWidget(page)
+        page.deleteLater()
+
+    def _refresh_view(self, key, page):
+        kind, name = key
+        tracks = self.library.album_tracks(name) if kind == "album" else self.library.artist_tracks(name)
+        if not tracks:
+            # альбома/исполнителя больше нет — страница не нужна
+            del self.view_cache[key]
+            if self.stacked_widget.currentWidget() is page:
+                self.stacked_widget.setCurrentWidget(self.home_page)
+                self._navigated(("home", None))
+            self._drop_view(page)
             return
-        while layout.count():
-            item = layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-            elif item.layout():
-                self.clear_layout(item.layout())
+        page.track_list.model().apply_paths(self._visible(tracks))
+        self.cover_loader.cancel(page)
+        if kind == "album":
+            page.artist_label.setText(f"Исполнитель: {self.get_album_artist(name)}")
+            self.load_cover_into(page.cover_label.setPixmap, self.library.first_album_track(name), 200, owner=page)
+        else:
+            self.update_artist_view(name)
 
     def show_home(self):
-        self.clear_layout(self.home_layout)
-        self.stacked_widget.setCurrentIndex(0)
+        self.refresh_library_views()
+        self.stacked_widget.setCurrentWidget(self.home_page)
+        self._navigated(("home", None))
 
+    def build_home(self):
+        """Главная строится один раз; дальше разделы обновляются через refresh_home."""
         scroll_area = QScrollArea()
         scroll_area.setWidgetResizable(True)
         content_widget = QWidget()
@@ -780,161 +4701,239 @@ class MusicPlayer(QMainWindow):
         btn_add.setFixedHeight(36)
         content_layout.addWidget(btn_add, alignment=Qt.AlignLeft)
 
-        # Albums
-        albums_label = QLabel("💽 Альбомы")
-        albums_label.setStyleSheet("font-size: 18px; font-weight: bold; color: #fff;")
-        content_layout.addWidget(albums_label)
-        album_grid = QGridLayout()
-        album_grid.setSpacing(10)
-        col = 0
-        row = 0
-        for album_name in sorted(self.albums.keys()):
-            if album_name and self.albums[album_name]:
-                first_track_path = self.albums[album_name][0]
-                cover_data = self.get_cover_from_file(first_track_path)
-                card = CardWidget(album_name, "Альбом", cover_data, is_artist=False)
-                card.mousePressEvent = lambda event, an=album_name: self.show_album_view(an)
-                album_grid.addWidget(card, row, col)
-                col += 1
-                if col > 4:
-                    col = 0
-                    row += 1
-        content_layout.addLayout(album_grid)
-
-        # Artists
-        artists_label = QLabel("🎤 Исполнители")
-        artists_label.setStyleSheet("font-size: 18px; font-weight: bold; color: #fff; margin-top: 10px;")
-        content_layout.addWidget(artists_label)
-        artist_grid = QGridLayout()
-        artist_grid.setSpacing(10)
-        col = 0
-        row = 0
-        for artist_name in sorted(self.artists.keys()):
-            if artist_name and self.artists[artist_name]:
-                avatar_path = self.artist_avatars.get(artist_name)
-                cover_data = None
-                if avatar_path and os.path.exists(avatar_path):
-                    with open(avatar_path, "rb") as f:
-                        cover_data = f.read()
-                else:
-                    cover_data = self.get_cover_from_file(self.artists[artist_name][0]) if self.artists[artist_name] else None
-                card = CardWidget(artist_name, "Исполнитель", cover_data, is_artist=True)
-                card.mousePressEvent = lambda event, an=artist_name: self.show_artist_view(an)
-                artist_grid.addWidget(card, row, col)
-                col += 1
-                if col > 4:
-                    col = 0
-                    row += 1
-        content_layout.addLayout(artist_grid)
+        self.home_albums = HomeSection("💽 Альбомы", self._make_album_card, self._drop_home_card)
+        content_layout.addWidget(self.home_albums)
+        self.home_artists = HomeSection("🎤 Исполнители", self._make_artist_card, self._drop_home_card)
+        content_layout.addWidget(self.home_artists)
         content_layout.addStretch()
 
-    def show_all_tracks(self):
-        self.clear_layout(self.all_tracks_layout)
-        self.stacked_widget.setCurrentIndex(5)
+        self.home_scroll_bar = scroll_area.verticalScrollBar()
+        self.home_scroll_bar.valueChanged.connect(self._on_home_scrolled)
+
+    def _on_home_scrolled(self, value):
+        # докрутили до низа — подгружаем следующую страницу исполнителей
+        if value >= self.home_scroll_bar.maximum() - 200:
+            self.home_artists.show_more()
+
+    def refresh_home(self, stale=()):
+        """Обновляет разделы главной под текущую библиотеку, не трогая уже показанные карточки."""
+        if self.home_albums is None:
+            self.build_home()
+        if stale:
+            self.home_albums.invalidate(stale)
+            self.home_artists.invalidate(stale)
+        # списки имён библиотека держит отсортированными сама (bisect при добавлении и удалении)
+        self.home_albums.set_names(self.library.album_names)
+        self.home_artists.set_names(self.library.artist_names)
+
+    def _make_album_card(self, album_name):
+        card = CardWidget(album_name, "Альбом", is_artist=False)
+        self.load_cover_into(card.set_cover, self.library.first_album_track(album_name), 150, owner=card)
+        card.mousePressEvent = lambda event, an=album_name: self.show_album_view(an)
+        return card
+
+    def _make_artist_card(self, artist_name):
+        card = CardWidget(artist_name, "Исполнитель", is_artist=True)
+        self.load_artist_cover_into(card.set_cover, artist_name, 150, owner=card)
+        card.mousePressEvent = lambda event, an=artist_name: self.show_artist_view(an)
+        return card
+
+    def _drop_home_card(self, card):
+        self.cover_loader.cancel(card)
 
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        content_widget = QWidget()
-        content_layout = QVBoxLayout(content_widget)
-        content_layout.setContentsMargins(10, 10, 10, 10)
-        content_layout.setSpacing(12)
-        scroll_area.setWidget(content_widget)
-        self.all_tracks_layout.addWidget(scroll_area)
+    def show_all_tracks(self):
+        if self.all_tracks_list is None:
+            header_layout = QHBoxLayout()
+            label = QLabel("Все треки")
+            label.setStyleSheet("font-size: 20px; font-weight: bold; color: #fff;")
+            header_layout.addWidget(label)
+            header_layout.addStretch()
+            self.sort_combo = QComboBox()
+            for key, title in TRACK_SORTS:
+                self.sort_combo.addItem(title, key)
+            self.sort_combo.setCurrentIndex(max(0, self.sort_combo.findData(self.sort_mode)))
+            self.sort_combo.currentIndexChanged.connect(self._on_sort_changed)
+            header_layout.addWidget(self.sort_combo)
+            self.duplicates_check = QCheckBox()
+            self.duplicates_check.setChecked(self.collapse_duplicates)
+            self.duplicates_check.toggled.connect(self._on_collapse_toggled)
+            header_layout.addWidget(self.duplicates_check)
+            self.all_tracks_layout.addLayout(header_layout)
+
+            # список виртуальный: рисуются только видимые строки
+            self.all_tracks_list = self.create_track_list(self._sorted_tracks(), row_height=66)
+            self.all_tracks_layout.addWidget(self.all_tracks_list, 1)
+            self.duplicates_check.setText(f"Скрыть дубликаты ({sum(len(g) - 1 for g in self.duplicate_groups)})")
+        else:
+            self._sync_all_tracks()
+        self.stacked_widget.setCurrentWidget(self.all_tracks_page)
+        self._navigated(("tracks", None))
 
-        label = QLabel("Все треки")
-        label.setStyleSheet("font-size: 20px; font-weight: bold; color: #fff;")
-        content_layout.addWidget(label)
+    def _sync_all_tracks(self):
+        if self.all_tracks_list is not None:
+            self.all_tracks_list.model().apply_paths(self._sorted_tracks())
 
-        all_tracks_list = QListWidget()
-        all_tracks_list.setContextMenuPolicy(Qt.CustomContextMenu)
-        all_tracks_list.customContextMenuRequested.connect(lambda pos: self.show_context_menu(all_tracks_list, pos))
-        all_tracks_list.setStyleSheet("QListWidget::item { height: 66px; }")
+    def _on_sort_changed(self, index):
+        self.sort_mode = self.sort_combo.itemData(index) or "library"
+        self._sync_all_tracks()
+        self.save_state_debounced()
 
-        for track_path in self.tracks:
-            title, artist = self.get_track_info_from_file(track_path)
-            cover_data = self.get_cover_from_file(track_path)
-            item_widget = TrackListItem(title, artist, cover_data, track_path, self)
-            list_item = QListWidgetItem(all_tracks_list)
-            list_item.setSizeHint(item_widget.sizeHint())
-            all_tracks_list.addItem(list_item)
-            all_tracks_list.setItemWidget(list_item, item_widget)
-
-        content_layout.addWidget(all_tracks_list)
-        content_layout.addStretch()
+    def _sorted_tracks(self):
+        """Треки в сортировке sort_mode; треки без результата анализа идут в конце."""
+        mode = self.sort_mode
+        tracks = self._visible(self.tracks)
+        if mode == "library":
+            return tracks
+        if mode == "title":
+            return sorted(tracks, key=lambda p: fold_text(self.get_track_info_from_file(p)[0]))
+        known, unknown = [], []
+        for path in tracks:
+            if mode == "duration":
+                value = self.track_duration(path) or None
+            else:
+                analysis = self.track_analysis(path)
+                value = analysis.get(mode) if analysis else None
+            if value is None:
+                unknown.append(path)
+            else:
+                known.append((value, path))
+        known.sort()
+        return [p for _, p in known] + unknown
 
     def show_search(self):
-        self.clear_layout(self.search_layout)
-        self.stacked_widget.setCurrentIndex(1)
-
-        search_input = QLineEdit()
-        search_input.setPlaceholderText("Поиск: исполнители, треки, альбомы...")
-        search_input.textChanged.connect(self.filter_tracks)
-        self.search_layout.addWidget(search_input)
-
-        self.search_list = QListWidget()
-        self.search_list.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.search_list.customContextMenuRequested.connect(lambda pos: self.show_context_menu(self.search_list, pos))
-        self.search_list.setStyleSheet("QListWidget::item { height: 60px; }")
-        self.search_layout.addWidget(self.search_list)
-
-        # initial fill
-        self.update_search_list(self.tracks)
-
-    def filter_tracks(self, text):
-        self.search_list.clear()
-        txt = text.strip().lower()
-        for track_path in self.tracks:
-            title, artist = self.get_track_info_from_file(track_path)
-            if txt in title.lower() or txt in artist.lower() or txt in self.get_tag(track_path, "TALB", "").lower():
-                cover_data = self.get_cover_from_file(track_path)
-                item_widget = TrackListItem(title, artist, cover_data, track_path, self)
-                list_item = QListWidgetItem(self.search_list)
-                list_item.setSizeHint(item_widget.sizeHint())
-                self.search_list.addItem(list_item)
-                self.search_list.setItemWidget(list_item, item_widget)
+        if self.search_list is None:
+            search_input = QLineEdit()
+            search_input.setPlaceholderText("Поиск: исполнители, треки, альбомы...")
+            search_input.textChanged.connect(self.schedule_search)
+            self.search_layout.addWidget(search_input)
+
+            self.search_list = self.create_track_list([], row_height=60)
+            self.search_layout.addWidget(self.search_list)
+
+            # initial fill
+            self.update_search_list(self.tracks)
+        else:
+            # запрос сохраняется между переходами; пересчитываем его под текущую библиотеку
+            self.schedule_search(self._search_text)
+        self.stacked_widget.setCurrentWidget(self.search_page)
+        self._navigated(("search", None))
+
+    def schedule_search(self, text):
+        """Копит нажатия: запрос уходит через SEARCH_DEBOUNCE_MS после последнего символа."""
+        self._search_text = text
+        self._search_generation += 1      # всё, что уже в работе, становится устаревшим
+        self._search_requested_at = time.perf_counter()
+        self.search_timer.start()
+
+    def _run_search(self):
+        self._search_generation += 1
+        self._search_started_at = time.perf_counter()
+        self.search_pool.clear()          # не начатые устаревшие запросы просто выбрасываем
+        task = SearchTask(self.search_index, self._search_text, self._search_generation,
+                          lambda: self._search_generation, self.search_signals)
+        self.search_pool.start(task)
+
+    def _on_search_done(self, generation, query, ids, query_ms):
+        if generation != self._search_generation or self.search_list is None:
+            return
+        wait_ms = (self._search_started_at - self._search_requested_at) * 1000.0
+        started = time.perf_counter()
+        if ids is None:
+            results = self.tracks
+        else:
+            results = [p for p in (self.library.path_of(i) for i in ids) if p is not None]
+        results = self._visible(results)
+        self.search_list.model().apply_paths(results)
+        apply_ms = (time.perf_counter() - started) * 1000.0
+        self.status.showMessage(
+            f"Поиск «{query}»: {len(results)} треков · ожидание {wait_ms:.0f} мс · "
+            f"запрос {query_ms:.1f} мс · обновление списка {apply_ms:.1f} мс"
+        )
 
     def update_search_list(self, tracks):
-        self.search_list.clear()
-        for track in tracks:
-            title, artist = self.get_track_info_from_file(track)
-            cover_data = self.get_cover_from_file(track)
-            item_widget = TrackListItem(title, artist, cover_data, track, self)
-            list_item = QListWidgetItem(self.search_list)
-            list_item.setSizeHint(item_widget.sizeHint())
-            self.search_list.addItem(list_item)
-            self.search_list.setItemWidget(list_item, item_widget)
+        self.search_list.model().set_paths(self._visible(tracks))
+
+    def create_track_list(self, paths, row_height=66):
+        """Виртуальный список треков: QListView с моделью и делегатом, без виджета на строку."""
+        view = QListView()
+        view.setModel(TrackListModel(self, paths, view))
+        view.setItemDelegate(TrackItemDelegate(self, row_height, view))
+        view.setUniformItemSizes(True)
+        view.setMouseTracking(True)
+        view.setVerticalScrollMode(QListView.ScrollPerPixel)
+        view.setContextMenuPolicy(Qt.CustomContextMenu)
+        view.customContextMenuRequested.connect(lambda pos, v=view: self.show_context_menu(v, pos))
+        return view
+
+    def load_cover_into(self, apply, track_path, size, rounded=False, owner=None):
+        """Отдаёт миниатюру обложки трека в apply(pixmap): сразу из памяти или после фоновой загрузки.
+
+        Возвращает False, если у трека нет обложки (вызывающий оставляет заглушку).
+        """
+        cover_hash = self.metadata.get(track_path).get("cover") if track_path else None
+        if not cover_hash:
+            return False
+        pixmap = self.cover_loader.request(cover_hash, size, rounded, owner=owner, callback=apply)
+        if pixmap is not None:
+            apply(pixmap)
+        return True
+
+    def load_artist_cover_into(self, apply, artist_name, size, owner=None):
+        """Круглый аватар исполнителя: свой файл, если задан, иначе обложка первого трека."""
+        avatar_path = self.artist_avatars.get(artist_name)
+        if avatar_path and os.path.exists(avatar_path):
+            image = read_scaled_image(avatar_path, size, rounded=True)
+            if image.isNull():
+                return False
+            apply(QPixmap.fromImage(image))
+            return True
+        return self.load_cover_into(apply, self.library.first_artist_track(artist_name), size, rounded=True, owner=owner)
+
+    def set_label_cover(self, label, track_path, size, rounded=False, owner=None):
+        """Обложка в QLabel с защитой от устаревших ответов при быстрой смене трека."""
+        label.setProperty("cover_track", track_path)
+
+        def apply(pixmap, label=label, track_path=track_path):
+            if label.property("cover_track") == track_path:
+                label.setPixmap(pixmap)
+
+        if not self.load_cover_into(apply, track_path, size, rounded, owner):
+            label.setText("🎵")
 
     def show_collection(self):
-        self.clear_layout(self.collection_layout)
-        self.stacked_widget.setCurrentIndex(2)
-
-        collection_label = QLabel("🎧 Моя библиотека — Избранное")
-        collection_label.setStyleSheet("font-size: 20px; font-weight: bold; color: #fff;")
-        self.collection_layout.addWidget(collection_label)
-
-        self.favorites_list = QListWidget()
-        self.favorites_list.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.favorites_list.customContextMenuRequested.connect(lambda pos: self.show_context_menu(self.favorites_list, pos))
-        self.favorites_list.setStyleSheet("QListWidget::item { height: 66px; }")
-
-        # favorites хранятся как пути
-        for track_path in sorted(list(self.favorites)):
-            if os.path.exists(track_path):
-                title, artist = self.get_track_info_from_file(track_path)
-                cover_data = self.get_cover_from_file(track_path)
-                item_widget = TrackListItem(title, artist, cover_data, track_path, self)
-                list_item = QListWidgetItem(self.favorites_list)
-                list_item.setSizeHint(item_widget.sizeHint())
-                self.favorites_list.addItem(list_item)
-                self.favorites_list.setItemWidget(list_item, item_widget)
-
-        self.collection_layout.addWidget(self.favorites_list)
-        self.collection_layout.addStretch()
+        if self.favorites_list is None:
+            collection_label = QLabel("🎧 Моя библиотека — Избранное")
+            collection_label.setStyleSheet("font-size: 20px; font-weight: bold; color: #fff;")
+            self.collection_layout.addWidget(collection_label)
 
-    def show_album_view(self, album_name):
-        self.clear_layout(self.album_layout)
-        self.stacked_widget.setCurrentIndex(3)
+            self.favorites_list = self.create_track_list(self._favorite_paths(), row_height=66)
+            self.collection_layout.addWidget(self.favorites_list, 1)
+        else:
+            self._sync_collection()
+        self.stacked_widget.setCurrentWidget(self.collection_page)
+        self._navigated(("collection", None))
+
+    def _favorite_paths(self):
+        # favorites хранятся как пути; показываем только те, что есть в библиотеке
+        return [t for t in sorted(self.favorites) if t in self.library]
+
+    def _sync_collection(self):
+        if self.favorites_list is not None:
+            self.favorites_list.model().apply_paths(self._favorite_paths())
+
+    def _update_favorite_row(self, path):
+        """Одна вставка/удаление строки в избранном вместо пересборки страницы."""
+        if self.favorites_list is None:
+            return
+        model = self.favorites_list.model()
+        if path in self.favorites and path in self.library:
+            model.insert_sorted(path)
+        else:
+            model.remove_path(path)
 
+    def _view_header(self, page):
+        """Общая часть страниц альбома/исполнителя: прокрутка и кнопка «Назад»."""
+        page_layout = QVBoxLayout(page)
         scroll_area = QScrollArea()
         scroll_area.setWidgetResizable(True)
         content_widget = QWidget()
@@ -942,204 +4941,345 @@ class MusicPlayer(QMainWindow):
         content_layout.setContentsMargins(10, 10, 10, 10)
         content_layout.setSpacing(12)
         scroll_area.setWidget(content_widget)
-        self.album_layout.addWidget(scroll_area)
+        page_layout.addWidget(scroll_area)
 
         back_btn = QPushButton("⬅️ Назад")
-        back_btn.clicked.connect(self.show_home)
+        back_btn.clicked.connect(self.go_back)
         back_btn.setFixedSize(120, 38)
         content_layout.addWidget(back_btn, alignment=Qt.AlignLeft)
+        return content_layout
+
+    def show_album_view(self, album_name):
+        self._open_cached_view(("album", album_name), self._build_album_page)
+
+    def _build_album_page(self, album_name):
+        page = QWidget()
+        content_layout = self._view_header(page)
 
         header_layout = QHBoxLayout()
-        cover_label = QLabel()
-        cover_label.setFixedSize(200, 200)
-        cover_label.setStyleSheet("background-color: #262626; border-radius: 10px;")
-        if album_name in self.albums and self.albums[album_name]:
-            first_track = self.albums[album_name][0]
-            cover_data = self.get_cover_from_file(first_track)
-            if cover_data:
-                pixmap = QPixmap()
-                pixmap.loadFromData(cover_data)
-                cover_label.setPixmap(pixmap.scaled(200, 200, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        header_layout.addWidget(cover_label)
+        page.cover_label = QLabel()
+        page.cover_label.setFixedSize(200, 200)
+        page.cover_label.setStyleSheet("background-color: #262626; border-radius: 10px;")
+        self.load_cover_into(page.cover_label.setPixmap, self.library.first_album_track(album_name), 200, owner=page)
+        header_layout.addWidget(page.cover_label)
 
         info_vbox = QVBoxLayout()
         album_title = QLabel(album_name)
         album_title.setStyleSheet("font-size: 26px; font-weight: bold; color: #fff;")
         album_artist = self.get_album_artist(album_name)
-        artist_label = QLabel(f"Исполнитель: {album_artist}")
-        artist_label.setStyleSheet("font-size: 14px; color: #bdbdbd;")
+        page.artist_label = QLabel(f"Исполнитель: {album_artist}")
+        page.artist_label.setStyleSheet("font-size: 14px; color: #bdbdbd;")
         info_vbox.addWidget(album_title)
-        info_vbox.addWidget(artist_label)
+        info_vbox.addWidget(page.artist_label)
         header_layout.addLayout(info_vbox)
         header_layout.addSpacerItem(QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
         content_layout.addLayout(header_layout)
 
-        album_list = QListWidget()
-        album_list.setContextMenuPolicy(Qt.CustomContextMenu)
-        album_list.customContextMenuRequested.connect(lambda pos: self.show_context_menu(album_list, pos))
-        album_list.setStyleSheet("QListWidget::item { height: 60px; }")
-
-        for track_path in self.albums.get(album_name, []):
-            title, artist = self.get_track_info_from_file(track_path)
-            cover_data = self.get_cover_from_file(track_path)
-            item_widget = TrackListItem(title, artist, cover_data, track_path, self)
-            list_item = QListWidgetItem(album_list)
-            list_item.setSizeHint(item_widget.sizeHint())
-            album_list.addItem(list_item)
-            album_list.setItemWidget(list_item, item_widget)
-
-        content_layout.addWidget(album_list)
+        page.track_list = self.create_track_list(self._visible(self.library.album_tracks(album_name)), row_height=60)
+        content_layout.addWidget(page.track_list, 1)
+        return page
 
     def show_artist_view(self, artist_name):
-        self.clear_layout(self.artist_layout)
-        self.stacked_widget.setCurrentIndex(4)
-
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        content_widget = QWidget()
-        content_layout = QVBoxLayout(content_widget)
-        content_layout.setContentsMargins(10, 10, 10, 10)
-        content_layout.setSpacing(12)
-        scroll_area.setWidget(content_widget)
-        self.artist_layout.addWidget(scroll_area)
+        self._open_cached_view(("artist", artist_name), self._build_artist_page)
 
-        self.current_artist_view = artist_name
-        back_btn = QPushButton("⬅️ Назад")
-        back_btn.clicked.connect(self.show_home)
-        back_btn.setFixedSize(120, 38)
-        content_layout.addWidget(back_btn, alignment=Qt.AlignLeft)
+    def _build_artist_page(self, artist_name):
+        page = QWidget()
+        content_layout = self._view_header(page)
 
         header_frame = QFrame()
         header_frame.setFixedHeight(250)
         header_layout = QHBoxLayout(header_frame)
         header_layout.setAlignment(Qt.AlignLeft | Qt.AlignBottom)
 
-        self.artist_avatar_label = QLabel()
-        self.artist_avatar_label.setFixedSize(150, 150)
-        self.artist_avatar_label.setAlignment(Qt.AlignCenter)
-        self.artist_avatar_label.setStyleSheet("border-radius: 75px; border: 3px solid #1DB954;")
+        page.avatar_label = QLabel()
+        page.avatar_label.setFixedSize(150, 150)
+        page.avatar_label.setAlignment(Qt.AlignCenter)
+        page.avatar_label.setStyleSheet("border-radius: 75px; border: 3px solid #1DB954;")
 
-        self.artist_name_label = QLabel(artist_name)
-        self.artist_name_label.setStyleSheet("font-size: 26px; font-weight: bold; color: #fff; padding: 6px; border-radius: 6px;")
+        artist_name_label = QLabel(artist_name)
+        artist_name_label.setStyleSheet("font-size: 26px; font-weight: bold; color: #fff; padding: 6px; border-radius: 6px;")
 
         v_layout = QVBoxLayout()
-        v_layout.addWidget(self.artist_avatar_label)
-        v_layout.addWidget(self.artist_name_label)
+        v_layout.addWidget(page.avatar_label)
+        v_layout.addWidget(artist_name_label)
         header_layout.addLayout(v_layout)
         content_layout.addWidget(header_frame)
 
         tracks_label = QLabel("🎵 Треки")
         tracks_label.setStyleSheet("font-size: 18px; font-weight: bold; color: #fff;")
         content_layout.addWidget(tracks_label)
-        artist_tracks_list = QListWidget()
-        artist_tracks_list.setContextMenuPolicy(Qt.CustomContextMenu)
-        artist_tracks_list.customContextMenuRequested.connect(lambda pos: self.show_context_menu(artist_tracks_list, pos))
-        artist_tracks_list.setStyleSheet("QListWidget::item { height: 60px; }")
-
-        for track_path in self.artists.get(artist_name, []):
-            title, artist = self.get_track_info_from_file(track_path)
-            cover_data = self.get_cover_from_file(track_path)
-            item_widget = TrackListItem(title, artist, cover_data, track_path, self)
-            list_item = QListWidgetItem(artist_tracks_list)
-            list_item.setSizeHint(item_widget.sizeHint())
-            artist_tracks_list.addItem(list_item)
-            artist_tracks_list.setItemWidget(list_item, item_widget)
-
-        content_layout.addWidget(artist_tracks_list)
-        content_layout.addStretch()
-        self.update_artist_view(artist_name)
+        page.track_list = self.create_track_list(self._visible(self.library.artist_tracks(artist_name)), row_height=60)
+        content_layout.addWidget(page.track_list, 1)
+        self._set_artist_avatar(page, artist_name)
+        return page
 
     def update_artist_view(self, artist_name):
-        avatar_path = self.artist_avatars.get(artist_name)
-        if avatar_path and os.path.exists(avatar_path):
-            avatar_pixmap = QPixmap(avatar_path)
-            round_pixmap = self.create_round_pixmap(avatar_pixmap)
-            self.artist_avatar_label.setPixmap(round_pixmap.scaled(150, 150, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        elif artist_name in self.artists and self.artists[artist_name]:
-            cover_data = self.get_cover_from_file(self.artists[artist_name][0])
-            if cover_data:
-                avatar_pixmap = QPixmap()
-                avatar_pixmap.loadFromData(cover_data)
-                round_pixmap = self.create_round_pixmap(avatar_pixmap)
-                self.artist_avatar_label.setPixmap(round_pixmap.scaled(150, 150, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        """Перерисовывает аватар на открытой странице исполнителя (если она в кэше)."""
+        page = self.view_cache.get(("artist", artist_name))
+        if page is not None:
+            self._set_artist_avatar(page, artist_name)
+
+    def _set_artist_avatar(self, page, artist_name):
+        if not self.load_artist_cover_into(page.avatar_label.setPixmap, artist_name, 150, owner=page):
+            page.avatar_label.setText("🎵")
+
+    def generate_mix(self, seed, size=MIX_SIZE):
+        """Микс от трека: проанализированные треки, ближайшие по темпу и громкости.
+
+        Темп сравнивается в октавах, так что половинный/двойной темп считается близким;
+        1% разницы темпа весит примерно как 1 дБ разницы громкости.
+        """
+        base = self.track_analysis(seed)
+        if base is None or not base.get("bpm"):
+            return None
+        bpm, loudness = base["bpm"], base.get("loudness")
+        candidates = []
+        duplicates = set(self.duplicates_of(seed))
+        for path in self.tracks:
+            if path == seed or path in duplicates or self._skipped(path):
+                continue
+            analysis = self.track_analysis(path)
+            if analysis is None or not analysis.get("bpm"):
+                continue
+            octaves = math.log2(analysis["bpm"] / bpm)
+            distance = abs(octaves - round(octaves)) * 70.0
+            if loudness is not None and analysis.get("loudness") is not None:
+                distance += abs(analysis["loudness"] - loudness)
+            candidates.append((distance, path))
+        return [seed] + [p for _, p in heapq.nsmallest(size - 1, candidates)]
+
+    def show_mix_view(self, seed):
+        if self.track_analysis(seed) is None and seed not in self._analysis_failed:
+            self.analyzer.prioritize(seed)
+        page = self.view_cache.get(("mix", seed))
+        if page is not None and not page.ready and self.track_analysis(seed) is not None:
+            # микс открывали до анализа трека — теперь его можно собрать
+            del self.view_cache[("mix", seed)]
+            self._drop_view(page)
+        self._open_cached_view(("mix", seed), self._build_mix_page)
+
+    def _build_mix_page(self, seed):
+        page = QWidget()
+        content_layout = self._view_header(page)
+        mix = self.generate_mix(seed)
+        title = QLabel(f"🎚 Микс: {self.get_track_info_from_file(seed)[0]}")
+        title.setStyleSheet("font-size: 26px; font-weight: bold; color: #fff;")
+        content_layout.addWidget(title)
+        if mix is None:
+            text = "Трек ещё не проанализирован — откройте микс позже."
         else:
-            self.artist_avatar_label.setText("🎵")
-
-    def create_round_pixmap(self, pixmap):
-        size = min(pixmap.width(), pixmap.height())
-        if size == 0:
-            return QPixmap()
-        mask = QPixmap(size, size)
-        mask.fill(Qt.transparent)
-        painter = QPainter(mask)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setBrush(QBrush(Qt.black))
-        painter.drawEllipse(0, 0, size, size)
-        painter.end()
-        result = QPixmap(size, size)
-        result.fill(Qt.transparent)
-        painter = QPainter(result)
-        painter.setRenderHint(QPainter.Antialiasing)
-        x_offset = (pixmap.width() - size) // 2
-        y_offset = (pixmap.height() - size) // 2
-        painter.drawPixmap(-x_offset, -y_offset, pixmap)
-        painter.setCompositionMode(QPainter.CompositionMode_DestinationIn)
-        painter.drawPixmap(0, 0, mask)
-        painter.end()
-        return result
+            text = f"Похожий темп (≈{self.track_analysis(seed)['bpm']:.0f} BPM) и громкость · треков: {len(mix)}"
+        info = QLabel(text)
+        info.setStyleSheet("font-size: 14px; color: #bdbdbd;")
+        content_layout.addWidget(info)
+        play_btn = QPushButton("▶ Слушать микс")
+        play_btn.setFixedHeight(36)
+        play_btn.clicked.connect(lambda: self.play_mix(page.track_list.model().paths()))
+        content_layout.addWidget(play_btn, alignment=Qt.AlignLeft)
+        page.ready = mix is not None
+        page.track_list = self.create_track_list(mix or [seed], row_height=60)
+        content_layout.addWidget(page.track_list, 1)
+        return page
 
     # ---------- работа с треками и плеером ----------
     def play_track_from_path(self, track_path):
         try:
-            self.current_index = self.tracks.index(track_path)
+            self.current_index = self.library.index_of(track_path)
+            if self.play_order and track_path not in self.play_order:
+                self.play_order = None  # трек не из микса — дальше снова порядок библиотеки
             self.play_track()
         except ValueError:
             pass
 
+    def play_mix(self, paths):
+        """Играет список по порядку (микс), дальше — обычный порядок библиотеки."""
+        paths = [p for p in paths if p in self.library]
+        if not paths:
+            return
+        self.play_order = paths
+        self.current_index = self.library.index_of(paths[0])
+        self.play_track()
+
+    def init_audio(self):
+        """Отложенная инициализация звука; повторные вызовы ничего не делают."""
+        if self.audio_ready:
+            return True
+        try:
+            load_audio()
+        except Exception as e:
+            print("Pygame mixer init error:", e)
+            return False
+        self.audio = create_audio_backend()
+        self.audio.set_volume(self.volume_slider.value() / 100.0)
+        self.audio_ready = True
+        return True
+
+    def event(self, event):
+        result = super().event(event)
+        if not self._first_paint and event.type() == QEvent.UpdateRequest:
+            # окно перерисовано целиком и выведено: закрываем замер запуска и только теперь поднимаем звук
+            self._first_paint = True
+            STARTUP.first_frame()
+            QTimer.singleShot(0, self._after_first_paint)
+        return result
+
+    def _after_first_paint(self):
+        self.init_audio()
+        STARTUP.mark("аудио (после кадра)")
+        STARTUP.report()
+        if self._search_backlog:
+            self.search_build_timer.start()
+        QTimer.singleShot(0, self.start_analysis)
+        QTimer.singleShot(0, self.start_fingerprinting)
+        QTimer.singleShot(0, self.start_watching)
+        QTimer.singleShot(0, self.upgrade_metadata)
+
     def play_track(self):
+        if not self.init_audio():
+            return
         if 0 <= self.current_index < len(self.tracks):
             track_path = self.tracks[self.current_index]
             if not os.path.exists(track_path):
+                self._mark_missing([track_path])
                 QMessageBox.critical(self, "Ошибка", f"Файл не найден: {track_path}")
                 return
+            if track_path in self.missing:
+                # диск снова подключён
+                self.missing.discard(track_path)
+                self.availability_changed.emit()
             try:
-                pygame.mixer.music.load(track_path)
-                pygame.mixer.music.play()
+                self.audio.load(track_path, self._track_gain(track_path))
+                self.audio.play()
                 self.is_playing = True
                 self.btn_play_pause.setText("⏸")
-                if self.fullscreen_window and self.fullscreen_window.isVisible():
-                    title, artist = self.get_track_info_from_file(track_path)
-                    cover_data = self.get_cover_from_file(track_path)
-                    self.fullscreen_window.update_info(title, artist, cover_data)
+                self._show_playing(track_path)
                 self.update_track_info()
                 self.save_state_debounced()
+                self._queue_next()
             except pygame.error as e:
                 QMessageBox.critical(self, "Ошибка", f"Не удалось воспроизвести файл: {e}")
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Неизвестная ошибка при воспроизведении: {e}")
 
+    def _show_playing(self, track_path):
+        if self.fullscreen_window and self.fullscreen_window.isVisible():
+            title, artist = self.get_track_info_from_file(track_path)
+            self.fullscreen_window.update_info(title, artist)
+            self.set_label_cover(self.fullscreen_window.cover_label, track_path, 520)
+
+    def _pick_next_index(self):
+        """Какой трек пойдёт следующим: с учётом перемешивания, недоступные файлы и скрытые дубликаты пропускаются."""
+        count = len(self.tracks)
+        if not count:
+            return -1
+        if self.play_order and not self.is_shuffled and 0 <= self.current_index < count:
+            current = self.tracks[self.current_index]
+            if current in self.play_order:
+                for path in self.play_order[self.play_order.index(current) + 1:]:
+                    if path in self.library and path not in self.missing:
+                        return self.library.index_of(path)
+                self.play_order = None  # микс доигран
+        if self.is_shuffled:
+            if count == 1:
+                return 0
+            new_index = random.randrange(count)
+            for _ in range(count):
+                if new_index != self.current_index and not self._skipped(self.tracks[new_index]):
+                    break
+                new_index = random.randrange(count)
+            return new_index
+        new_index = (self.current_index + 1) % count
+        # недоступные файлы пропускаем, пока есть что играть
+        for _ in range(count - 1):
+            if not self._skipped(self.tracks[new_index]):
+                break
+            new_index = (new_index + 1) % count
+        return new_index
+
+    def _skipped(self, path):
+        return path in self.missing or path in self.hidden_duplicates
+
+    def _queue_next(self):
+        """Заранее ставит предсказанный следующий трек в очередь микшера — переход без паузы.
+
+        Всё, что понадобится на стыке, готовится сейчас: файл открывает микшер, теги сверяются
+        с диском, обложка грузится в фоне. На самом стыке GUI читает только кэши.
+        """
+        self._queued_path = None
+        if not self.audio_ready or not (0 <= self.current_index < len(self.tracks)):
+            return
+        index = self._pick_next_index()
+        if index < 0:
+            return
+        path = self.tracks[index]
+        self.metadata.refresh(path)
+        try:
+            self.audio.queue(path, self._track_gain(path))
+        except Exception as e:
+            print("Не удалось поставить трек в очередь:", e)
+            return
+        self._queued_path = path
+        cover_hash = self.metadata.get(path).get("cover")
+        if cover_hash:
+            self.cover_loader.request(cover_hash, 64, True)
+
+    def _track_gain(self, path):
+        """Множитель громкости трека: ReplayGain из тегов, иначе результат фонового анализа.
+
+        Если анализа ещё нет, трек играет как есть, а сам трек ставится в начало очереди анализа.
+        """
+        if not NORMALIZE_LOUDNESS:
+            return 1.0
+        record = self.metadata.get(path)
+        gain_db, peak = record.get("replaygain"), record.get("replaygain_peak")
+        if gain_db is None:
+            analysis = self.track_analysis(path)
+            if analysis is None or analysis.get("loudness") is None:
+                if analysis is None and path not in self._analysis_failed:
+                    self.analyzer.prioritize(path)
+                return 1.0
+            gain_db, peak = LOUDNESS_TARGET_DB - analysis["loudness"], analysis.get("peak")
+        gain = 10.0 ** ((gain_db + REPLAYGAIN_PREAMP_DB) / 20.0)
+        if peak:
+            gain = min(gain, 1.0 / peak)  # не поднимаем пики выше 0 дБFS
+        return gain
+
+    def _on_queued_started(self):
+        """Микшер сам перешёл к треку из очереди: обновляем только интерфейс и ставим следующий."""
+        path = self._queued_path
+        self._queued_path = None
+        self.current_index = self.library.index_of(path) if path in self.library else -1
+        self._show_playing(path)
+        self.update_track_info(check_file=False)
+        self.save_state_debounced()
+        # следующий трек готовим чуть позже, чтобы на самом стыке не было обращений к диску
+        QTimer.singleShot(QUEUE_AHEAD_DELAY_MS, self._queue_next)
+
     def play_pause(self):
+        if not self.init_audio():
+            return
         if self.current_index == -1 and self.tracks:
             self.current_index = 0
             self.play_track()
         elif self.is_playing:
-            pygame.mixer.music.pause()
+            self.audio.pause()
             self.is_playing = False
             self.btn_play_pause.setText("▶")
             if self.fullscreen_window: self.fullscreen_window.btn_play_pause.setText("▶")
             self.save_state_debounced()
         else:
-            pygame.mixer.music.unpause()
+            self.audio.unpause()
             self.is_playing = True
             self.btn_play_pause.setText("⏸")
             if self.fullscreen_window: self.fullscreen_window.btn_play_pause.setText("⏸")
             self.save_state_debounced()
 
     def prev_track(self):
+        if not self.init_audio():
+            return
         if self.tracks and self.is_playing:
-            pos_ms = pygame.mixer.music.get_pos()
-            if pos_ms > 10000:
-                pygame.mixer.music.play(start=0)
+            if self.audio.get_position() > 10:
+                self.audio.play()  # с начала; очередь при этом сохраняется
             else:
                 self.current_index = (self.current_index - 1) % len(self.tracks)
                 self.play_track()
@@ -1150,16 +5290,11 @@ class MusicPlayer(QMainWindow):
 
     def next_track(self):
         if self.tracks:
-            if self.is_shuffled:
-                if len(self.tracks) > 1:
-                    new_index = random.randint(0, len(self.tracks) - 1)
-                    while new_index == self.current_index:
-                        new_index = random.randint(0, len(self.tracks) - 1)
-                    self.current_index = new_index
-                else:
-                    self.current_index = 0
+            # «следующий» — тот же трек, что уже предсказан и стоит в очереди (важно для перемешивания)
+            if self._queued_path is not None and self._queued_path in self.library:
+                self.current_index = self.library.index_of(self._queued_path)
             else:
-                self.current_index = (self.current_index + 1) % len(self.tracks)
+                self.current_index = self._pick_next_index()
             self.play_track()
             self.save_state_debounced()
 
@@ -1172,8 +5307,9 @@ class MusicPlayer(QMainWindow):
             else:
                 self.favorites.add(path)
                 self.btn_favorite.setStyleSheet("color: #1DB954;")
+            self.store.set_favorite(path, path in self.favorites)
             self.save_state_debounced()
-            self.show_collection()
+            self._update_favorite_row(path)
 
     def toggle_shuffle(self):
         self.is_shuffled = not self.is_shuffled
@@ -1181,20 +5317,21 @@ class MusicPlayer(QMainWindow):
             self.btn_shuffle.setStyleSheet("background-color: #1DB954;")
         else:
             self.btn_shuffle.setStyleSheet("background-color: transparent;")
+        # предсказанный следующий трек зависит от режима — ставим в очередь заново
+        if self.is_playing:
+            self._queue_next()
         self.save_state_debounced()
 
     def set_volume(self, value):
-        pygame.mixer.music.set_volume(value / 100.0)
+        if self.audio_ready:
+            self.audio.set_volume(value / 100.0)
         self.save_state_debounced()
 
     def seek_track(self):
-        if self.track_length > 0:
+        if self.track_length > 0 and self.audio_ready:
             new_pos = self.track_length * (self.position_slider.value() / 100.0)
-            try:
-                pygame.mixer.music.set_pos(new_pos)
-            except Exception:
-                # pygame.set_pos может не поддерживаться для некоторых форматов; игнорируем
-                pass
+            # pygame.set_pos поддерживается не для всех форматов; потоковый бэкенд перематывает любой
+            self.audio.seek(new_pos)
             self.start_timer()
 
     def stop_timer(self):
@@ -1204,42 +5341,42 @@ class MusicPlayer(QMainWindow):
         self.position_timer.start(1000)
 
     def update_position_slider(self):
-        if pygame.mixer.music.get_busy() and self.is_playing:
-            pos = pygame.mixer.music.get_pos() / 1000.0
+        if self.is_playing and self.audio.get_busy():
+            pos = self.audio.get_position()
             if self.track_length > 0:
                 if not self.position_slider.isSliderDown():
                     self.position_slider.setValue(int(pos / self.track_length * 100))
 
     def check_pygame_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.USEREVENT:
-                self.next_track()
+        # pygame.init() не вызывается, очереди событий нет: конец трека ловим опросом микшера
+        if not self.is_playing:
+            return
+        if not self.audio.get_busy():
+            # очередь не сработала (или её не было) — обычный переход
+            self.next_track()
+            return
+        if self.audio.poll_switched() and self._queued_path is not None:
+            self._on_queued_started()
 
-    def update_track_info(self):
+    def update_track_info(self, check_file=True):
         if 0 <= self.current_index < len(self.tracks):
             file = self.tracks[self.current_index]
+            # текущий трек сверяем с диском (один stat), остальные берутся из кэша как есть;
+            # трек из очереди уже сверен в _queue_next
+            if check_file:
+                self.metadata.refresh(file)
             title, artist = self.get_track_info_from_file(file)
             self.track_title.setText(title)
             self.track_artist.setText(artist)
 
-            cover_data = self.get_cover_from_file(file)
-            if cover_data:
-                pixmap = QPixmap()
-                pixmap.loadFromData(cover_data)
-                self.cover_label.setPixmap(self.create_round_pixmap(pixmap).scaled(64, 64, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-            else:
-                self.cover_label.setText("🎵")
+            self.set_label_cover(self.cover_label, file, 64, rounded=True)
 
             if self.tracks[self.current_index] in self.favorites:
                 self.btn_favorite.setStyleSheet("color: #1DB954;")
             else:
                 self.btn_favorite.setStyleSheet("color: #b3b3b3;")
 
-            try:
-                audio = File(file)
-                self.track_length = audio.info.length
-            except Exception:
-                self.track_length = 0
+            self.track_length = self.track_duration(file)
 
             if self.is_shuffled:
                 self.btn_shuffle.setStyleSheet("background-color: #1DB954;")
@@ -1247,17 +5384,11 @@ class MusicPlayer(QMainWindow):
                 self.btn_shuffle.setStyleSheet("background-color: transparent;")
 
     # ---------- контекстное меню и работа с файлами ----------
-    def get_track_path_from_list_item(self, list_widget, item):
-        item_widget = list_widget.itemWidget(item)
-        if isinstance(item_widget, TrackListItem):
-            return item_widget.track_path
-        return None
-
     def show_context_menu(self, list_widget, pos):
-        item = list_widget.itemAt(pos)
-        if not item:
+        index = list_widget.indexAt(pos)
+        if not index.isValid():
             return
-        track_path = self.get_track_path_from_list_item(list_widget, item)
+        track_path = index.data(TrackListModel.PathRole)
         if not track_path:
             return
         menu = QMenu()
@@ -1266,9 +5397,12 @@ class MusicPlayer(QMainWindow):
         album_action = menu.addAction("🔗 Перейти к альбому")
         artist_action = menu.addAction("🔗 Перейти к исполнителю")
         play_action = menu.addAction("▶ Воспроизвести")
+        mix_action = menu.addAction("🎚 Микс: похожий темп")
         action = menu.exec_(list_widget.mapToGlobal(pos))
         if action == play_action:
             self.play_track_from_path(track_path)
+        elif action == mix_action:
+            self.show_mix_view(track_path)
         elif action == edit_action:
             self.edit_track_info(track_path)
         elif action == delete_action:
@@ -1282,11 +5416,13 @@ class MusicPlayer(QMainWindow):
         if track_path:
             dialog = EditTrackDialog(track_path)
             if dialog.exec_():
-                # после редактирования — обновляем индексы и UI
-                self._rebuild_indexes()
+                # после редактирования — обновляем индексы и UI; анализ звука остаётся в силе
+                self.metadata.reread(track_path)
+                self._update_indexes(changed=[track_path])
+                self.start_fingerprinting()
                 self.update_track_info()
                 self.save_state_debounced()
-                self.show_home()
+                self.refresh_library_views()
 
     def delete_track(self, track_path):
         if not track_path:
@@ -1295,35 +5431,10 @@ class MusicPlayer(QMainWindow):
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply != QMessageBox.Yes:
             return
+        import send2trash
         try:
             send2trash.send2trash(track_path)
-            if track_path in self.tracks:
-                idx = self.tracks.index(track_path)
-                self.tracks.remove(track_path)
-                # если удаляли текущий трек — остановить воспроизведение
-                if idx == self.current_index:
-                    pygame.mixer.music.stop()
-                    self.current_index = -1
-                    self.is_playing = False
-                    self.update_track_info()
-                # удаляем из favorites
-                if track_path in self.favorites:
-                    self.favorites.remove(track_path)
-                # удаляем из artists/albums
-                for artist in list(self.artists.keys()):
-                    if track_path in self.artists[artist]:
-                        self.artists[artist].remove(track_path)
-                        if not self.artists[artist]:
-                            del self.artists[artist]
-                for album in list(self.albums.keys()):
-                    if track_path in self.albums[album]:
-                        self.albums[album].remove(track_path)
-                        if not self.albums[album]:
-                            del self.albums[album]
-                # обновляем UI
-                self.show_home()
-                self.update_track_info()
-                self.save_state_debounced()
+            self.remove_tracks([track_path])
         except send2trash.TrashPermissionError as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось переместить файл в корзину. Ошибка: {e}")
         except Exception as e:
@@ -1336,55 +5447,39 @@ class MusicPlayer(QMainWindow):
 
     def go_to_artist_from_context_menu(self, track_path):
         if track_path:
-            try:
-                tags = ID3(track_path)
-                artists_raw = str(tags.get("TPE1", "Неизвестный исполнитель"))
-                artists = [a.strip() for a in artists_raw.split(';')]
-                if artists:
-                    self.show_artist_view(artists[0])
-            except Exception:
-                pass
+            artists = self.get_track_artists(track_path) or ["Неизвестный исполнитель"]
+            self.show_artist_view(artists[0])
 
     # ---------- helper: info & tags ----------
     def get_track_info_from_file(self, filepath):
-        try:
-            tags = ID3(filepath)
-            title = str(tags.get("TIT2", os.path.basename(filepath)))
-            artists_raw = str(tags.get("TPE1", "Неизвестный исполнитель"))
-            artists = ", ".join([a.strip() for a in artists_raw.replace(';', ',').split(',') if a.strip()])
-            return title, artists
-        except Exception:
-            return os.path.basename(filepath), "Неизвестный исполнитель"
+        record = self.metadata.get(filepath)
+        title = record.get("title")
+        if title is None:
+            title = os.path.basename(filepath)
+        artists = ", ".join(record.get("artists") or []) or "Неизвестный исполнитель"
+        return title, artists
 
     def get_tag(self, filepath, tag, default):
-        try:
-            return str(ID3(filepath).get(tag, default))
-        except Exception:
-            return default
+        record = self.metadata.get(filepath)
+        if tag == "TPE1":
+            value = "; ".join(record.get("artists") or [])
+        else:
+            value = record.get(TAG_FIELDS.get(tag, tag))
+        return str(value) if value else default
 
-    def get_cover_from_file(self, filepath):
-        try:
-            tags = ID3(filepath)
-            for tag in tags.values():
-                if isinstance(tag, APIC):
-                    return tag.data
-        except Exception:
-            pass
-        return None
+    def get_track_artists(self, filepath):
+        return self.metadata.get(filepath).get("artists") or []
 
     def get_album_artist(self, album_name):
-        if album_name in self.albums:
-            for track_path in self.albums[album_name]:
-                try:
-                    tags = ID3(track_path)
-                    artists = str(tags.get("TPE1", "Unknown Artist")).split(';')
-                    if artists:
-                        return artists[0]
-                except Exception:
-                    continue
+        if album_name in self.library.albums:
+            for track_path in self.library.album_tracks(album_name):
+                artists = self.get_track_artists(track_path)
+                if artists:
+                    return artists[0]
         return "Unknown Artist"
 
     def pixmap_to_data_url(self, pixmap):
+        import base64
         buffer = QBuffer()
         buffer.open(QIODevice.WriteOnly)
         pixmap.save(buffer, "PNG")
@@ -1398,29 +5493,30 @@ class MusicPlayer(QMainWindow):
         if self.current_index != -1 and 0 <= self.current_index < len(self.tracks):
             track_path = self.tracks[self.current_index]
             title, artist = self.get_track_info_from_file(track_path)
-            cover_data = self.get_cover_from_file(track_path)
-            self.fullscreen_window.update_info(title, artist, cover_data)
+            self.fullscreen_window.update_info(title, artist)
+            self.set_label_cover(self.fullscreen_window.cover_label, track_path, 520)
         self.fullscreen_window.show()
 
     # ---------- сохранение состояния ----------
     def load_state(self):
         try:
-            if os.path.exists(STATE_FILE):
-                with open(STATE_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                # Восстанавливаем
-                tracks = data.get("tracks", [])
-                # только существующие пути
-                self.tracks = [t for t in tracks if os.path.exists(t)]
-                self.favorites = set([t for t in data.get("favorites", []) if os.path.exists(t)])
+            tracks, favorites, settings = self.store.load()
+            self.scan_history = self.store.load_scan_stats()
+            if tracks or settings:
+                # Восстанавливаем без обращения к диску: пропавшие файлы отметит start_existence_sweep
+                self.library.reset(tracks)
+                self.favorites = set(favorites)
                 self.current_index = -1
-                if "current_path" in data and data["current_path"] in self.tracks:
-                    self.current_index = self.tracks.index(data["current_path"])
-                self.is_shuffled = data.get("is_shuffled", False)
-                vol = data.get("volume", 50)
-                self.volume_slider.setValue(vol)
-                pygame.mixer.music.set_volume(vol / 100.0)
+                if settings.get("current_path") in self.library:
+                    self.current_index = self.library.index_of(settings["current_path"])
+                self.is_shuffled = settings.get("is_shuffled", False)
+                self.sort_mode = settings.get("sort_mode", "library")
+                self.collapse_duplicates = settings.get("collapse_duplicates", False)
+                vol = settings.get("volume", 50)
+                self.volume_slider.setValue(vol)  # в микшер попадёт в init_audio
+                STARTUP.mark("состояние")
                 self._rebuild_indexes()
+                STARTUP.mark("индексы")
                 self.status.showMessage("Состояние загружено.")
             else:
                 self.status.showMessage("Состояние не найдено, будет выполнен начальный скан.")
@@ -1429,28 +5525,37 @@ class MusicPlayer(QMainWindow):
             self.status.showMessage("Ошибка при загрузке состояния.")
 
     def save_state(self):
+        """Отдаёт в базу только то, что изменилось: настройки плеера + накопленные строки.
+
+        Диск трогает поток-писатель LibraryStore, GUI здесь не ждёт.
+        """
+        self.save_timer.stop()
+        self._save_pending_since = None
         try:
-            state = {
-                "tracks": self.tracks,
-                "favorites": list(self.favorites),
-                "current_path": self.tracks[self.current_index] if 0 <= self.current_index < len(self.tracks) else None,
-                "is_shuffled": self.is_shuffled,
-                "volume": self.volume_slider.value(),
-                "timestamp": time.time()
-            }
-            with open(STATE_FILE, "w", encoding="utf-8") as f:
-                json.dump(state, f, ensure_ascii=False, indent=2)
-            self._last_save_time = time.time()
+            self.store.set_setting("current_path", self.tracks[self.current_index] if 0 <= self.current_index < len(self.tracks) else None)
+            self.store.set_setting("is_shuffled", self.is_shuffled)
+            self.store.set_setting("sort_mode", self.sort_mode)
+            self.store.set_setting("collapse_duplicates", self.collapse_duplicates)
+            self.store.set_setting("volume", self.volume_slider.value())
+            self.store.set_setting("timestamp", time.time())
+            self.metadata.save()
+            self.store.commit()
             self.status.showMessage("Состояние сохранено.")
         except Exception as e:
             print("Ошибка при сохранении состояния:", e)
             self.status.showMessage("Ошибка при сохранении состояния.")
 
     def save_state_debounced(self):
-        # Простая реализация debounce — сохранение, если прошло достаточно времени
+        """Копит изменения: запись через AUTOSAVE_DEBOUNCE после последнего, но не позже AUTOSAVE_MAX_DELAY."""
         now = time.time()
-        if now - self._last_save_time > AUTOSAVE_DEBOUNCE:
-            self.save_state()
+        if self._save_pending_since is None:
+            self._save_pending_since = now
+        elif now - self._save_pending_since >= AUTOSAVE_MAX_DELAY:
+            # изменения идут без пауз — не откладываем запись бесконечно
+            if not self.save_timer.isActive():
+                self.save_timer.start()
+            return
+        self.save_timer.start()
 
     # ---------- дополнительные утилиты ----------
     def add_music_dialog(self):
@@ -1478,14 +5583,8 @@ class MusicPlayer(QMainWindow):
     def go_to_artist_from_panel(self, event):
         if event.button() == Qt.LeftButton and self.current_index != -1:
             track_path = self.tracks[self.current_index]
-            try:
-                tags = ID3(track_path)
-                artists_raw = str(tags.get("TPE1", "Неизвестный исполнитель"))
-                artists = [a.strip() for a in artists_raw.split(';')]
-                if artists:
-                    self.show_artist_view(artists[0])
-            except Exception:
-                pass
+            artists = self.get_track_artists(track_path) or ["Неизвестный исполнитель"]
+            self.show_artist_view(artists[0])
 
     def go_to_album_from_item(self, track_path):
         if track_path:
@@ -1494,14 +5593,8 @@ class MusicPlayer(QMainWindow):
 
     def go_to_artist_from_item(self, track_path):
         if track_path:
-            try:
-                tags = ID3(track_path)
-                artists_raw = str(tags.get("TPE1", "Неизвестный исполнитель"))
-                artists = [a.strip() for a in artists_raw.split(';')]
-                if artists:
-                    self.show_artist_view(artists[0])
-            except Exception:
-                pass
+            artists = self.get_track_artists(track_path) or ["Неизвестный исполнитель"]
+            self.show_artist_view(artists[0])
 
     # ---------- события окна ----------
     def closeEvent(self, event):
@@ -1509,15 +5602,50 @@ class MusicPlayer(QMainWindow):
         if self.scanner_thread and self.scanner_thread.isRunning():
             self.scanner_thread.stop()
             self.scanner_thread.wait(500)
-        # сохраняем состояние
+        if self.metadata_thread and self.metadata_thread.isRunning():
+            self.metadata_thread.stop()
+            self.metadata_thread.wait(500)
+        if self.sweeper_thread and self.sweeper_thread.isRunning():
+            self.sweeper_thread.stop()
+            self.sweeper_thread.wait(500)
+        if self.fingerprint_thread and self.fingerprint_thread.isRunning():
+            self.fingerprint_thread.stop()
+            self.fingerprint_thread.wait(500)
+        if self.watcher is not None:
+            self.watcher.stop()
+        if self.audio is not None:
+            self.audio.close()
+        self.analyzer.stop()
+        # сохраняем состояние и дожидаемся записи на диск
         self.save_state()
+        self.store.close()
         event.accept()
 
 # ------------------------------------------------------------------
 # Запуск
 # ------------------------------------------------------------------
 if __name__ == "__main__":
+    if "--audio-backend" in sys.argv[:-1]:
+        AUDIO_BACKEND = sys.argv[sys.argv.index("--audio-backend") + 1]
+    if "--crossfade" in sys.argv[:-1]:
+        CROSSFADE_SECONDS = float(sys.argv[sys.argv.index("--crossfade") + 1])
+    if "--scan-stats" in sys.argv:
+        print_scan_stats()
+        sys.exit(0)
+    if "--bench-tags" in sys.argv[:-1]:
+        benchmark_tags(sys.argv[sys.argv.index("--bench-tags") + 1])
+        sys.exit(0)
+    if "--bench-search" in sys.argv:
+        position = sys.argv.index("--bench-search") + 1
+        benchmark_search(int(sys.argv[position]) if position < len(sys.argv) else 100000)
+        sys.exit(0)
+    if "--bench-seek" in sys.argv[:-1]:
+        benchmark_seek(sys.argv[sys.argv.index("--bench-seek") + 1])
+        sys.exit(0)
+    STARTUP.enabled = "--profile-startup" in sys.argv
+    STARTUP.mark("импорты")
     app = QApplication(sys.argv)
+    STARTUP.mark("QApplication")
     window = MusicPlayer()
     window.show()
     sys.exit(app.exec_())
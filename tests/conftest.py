@@ -0,0 +1,91 @@
+# Общие настройки тестов: отдельная домашняя папка, Qt без экрана, звук без устройства.
+# sonora читает пути (~/.sonora_library.db и т.п.) при импорте, поэтому HOME задаётся до него.
+import array
+import math
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import pytest
+
+HOME = tempfile.mkdtemp(prefix="sonora-home-")
+os.environ["HOME"] = HOME
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("XDG_RUNTIME_DIR", tempfile.mkdtemp(prefix="sonora-xdg-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sonora  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+
+def make_wav(path, seconds=0.1, title=None, artist=None, rate=8000, freq=0, album=None):
+    """Пишет короткий WAV (тишина или тон freq Гц) и, если заданы, теги ID3 внутри него."""
+    path = str(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frames = int(rate * seconds)
+    samples = array.array("h", (int(8000 * math.sin(2 * math.pi * freq * i / rate)) for i in range(frames)))
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+    if title or artist or album:
+        from mutagen.wave import WAVE
+        from mutagen.id3 import TALB, TIT2, TPE1
+        audio = WAVE(path)
+        audio.add_tags()
+        if title:
+            audio.tags.add(TIT2(encoding=3, text=title))
+        if artist:
+            audio.tags.add(TPE1(encoding=3, text=artist))
+        if album:
+            audio.tags.add(TALB(encoding=3, text=album))
+        audio.save()
+    return path
+
+
+def set_mtime(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def pump(qapp):
+    """pump(условие, timeout) — крутит цикл событий, пока условие не станет истинным."""
+    def run(condition=lambda: False, timeout=5.0):
+        end = time.time() + timeout
+        while time.time() < end:
+            qapp.processEvents()
+            if condition():
+                return True
+            time.sleep(0.005)
+        qapp.processEvents()
+        return condition()
+    return run
+
+
+@pytest.fixture
+def music_dir(tmp_path):
+    path = tmp_path / "Music"
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def player(qapp, pump, monkeypatch):
+    """Окно плеера на пустой библиотеке (не показывается, слежение за папками выключено)."""
+    for name in (sonora.LIBRARY_DB, sonora.LIBRARY_DB + "-wal", sonora.LIBRARY_DB + "-shm", sonora.SCAN_CACHE_FILE):
+        if os.path.exists(name):
+            os.remove(name)
+    monkeypatch.setattr(sonora, "WATCH_LIBRARY", False)
+    window = sonora.MusicPlayer()
+    yield window
+    window.close()
+    pump(timeout=0.05)
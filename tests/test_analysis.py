@@ -0,0 +1,40 @@
+import pytest
+
+import sonora
+
+np = pytest.importorskip("numpy")
+sonora.load_numpy()
+FPS = sonora.ANALYSIS_SAMPLE_RATE / sonora.ANALYSIS_HOP
+
+
+def _beats(bpm, seconds=60, offbeat=0.0):
+    """Огибающая мощности: щелчок на каждую долю (и, если задан, тише — между долями)."""
+    power = np.full(int(seconds * FPS), 1e-4)
+    period = 60.0 * FPS / bpm
+    k = 0
+    while k * period < len(power):
+        power[int(round(k * period))] += 1.0
+        between = int(round((k + 0.5) * period))
+        if offbeat and between < len(power):
+            power[between] += offbeat
+        k += 1
+    return power
+
+
+@pytest.mark.parametrize("bpm", [60, 72, 90, 100, 120, 128, 140, 150, 170, 180, 200])
+def test_impulse_train_tempo(bpm):
+    assert sonora._estimate_bpm(_beats(bpm), FPS) == pytest.approx(bpm, abs=0.5)
+
+
+def test_no_half_tempo_for_128():
+    # период 23.4 шага: пик доли делится между соседними лагами, двойной (47) острее
+    assert sonora._estimate_bpm(_beats(128), FPS) == pytest.approx(128, abs=0.5)
+
+
+def test_quiet_offbeat_does_not_double_tempo():
+    assert sonora._estimate_bpm(_beats(90, offbeat=0.2), FPS) == pytest.approx(90, abs=0.5)
+
+
+def test_steady_sound_has_no_tempo():
+    assert sonora._estimate_bpm(np.full(int(60 * FPS), 0.5), FPS) is None
+    assert sonora._estimate_bpm(_beats(120, seconds=5), FPS) is None   # слишком коротко
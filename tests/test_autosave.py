@@ -0,0 +1,34 @@
+import time
+
+import sonora
+
+
+def _count_commits(player, monkeypatch):
+    commits = []
+    real = player.store.commit
+    monkeypatch.setattr(player.store, "commit", lambda wait=False: (commits.append(time.time()), real(wait)))
+    return commits
+
+
+def test_burst_of_changes_is_saved_once(player, pump, monkeypatch):
+    player.save_timer.setInterval(100)
+    commits = _count_commits(player, monkeypatch)
+    for _ in range(20):
+        player.save_state_debounced()
+    assert commits == []
+    assert pump(lambda: commits, timeout=2)
+    pump(timeout=0.3)
+    assert len(commits) == 1
+    player.store.flush()
+    assert player.store.load()[2]["volume"] == player.volume_slider.value()
+
+
+def test_continuous_changes_are_saved_by_max_delay(player, pump, monkeypatch):
+    monkeypatch.setattr(sonora, "AUTOSAVE_MAX_DELAY", 0.3)
+    player.save_timer.setInterval(200)
+    commits = _count_commits(player, monkeypatch)
+    started = time.time()
+    while time.time() - started < 1.0:        # изменения без пауз длиннее debounce
+        player.save_state_debounced()
+        pump(timeout=0.02)
+    assert commits and commits[0] - started < 0.8
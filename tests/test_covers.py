@@ -0,0 +1,69 @@
+import os
+
+import pytest
+from PyQt5.QtGui import QColor, QImage
+
+import sonora
+
+
+@pytest.fixture
+def covers(qapp, tmp_path):
+    """Каталог оригиналов с обложкой 400x300 и пустой каталог миниатюр."""
+    covers_dir = tmp_path / "covers"
+    covers_dir.mkdir()
+    image = QImage(400, 300, QImage.Format_RGB32)
+    image.fill(QColor("red"))
+    assert image.save(str(covers_dir / "abc"), "PNG")
+    return str(covers_dir), str(tmp_path / "thumbs")
+
+
+def test_thumbnail_is_scaled_and_kept_on_disk(covers):
+    covers_dir, thumbs_dir = covers
+    cache = sonora.CoverCache(covers_dir, thumbs_dir)
+    pixmap = cache.pixmap("abc", 64)
+    assert (pixmap.width(), pixmap.height()) == (64, 48)
+    assert cache.pixmap("abc", 64) is pixmap                    # второй раз — из памяти
+    round_pixmap = cache.pixmap("abc", 32, rounded=True)
+    assert (round_pixmap.width(), round_pixmap.height()) == (32, 32)
+    assert os.path.exists(cache.thumb_path("abc", 64))
+    # новый запуск: оригинал не нужен, миниатюра читается с диска
+    os.remove(os.path.join(covers_dir, "abc"))
+    assert sonora.CoverCache(covers_dir, thumbs_dir).pixmap("abc", 64).width() == 64
+    assert sonora.CoverCache(covers_dir, thumbs_dir).pixmap("abc", 128) is None
+
+
+def test_memory_tier_is_lru(covers):
+    covers_dir, thumbs_dir = covers
+    cache = sonora.CoverCache(covers_dir, thumbs_dir, max_items=2)
+    cache.pixmap("abc", 16)
+    cache.pixmap("abc", 24)
+    cache.cached_pixmap("abc", 16)                              # 16 — недавно использованная
+    cache.pixmap("abc", 32)
+    assert cache.cached_pixmap("abc", 16) is not None
+    assert cache.cached_pixmap("abc", 24) is None
+    assert cache.cached_pixmap("abc", 32) is not None
+
+
+def test_loader_delivers_in_background_then_from_memory(covers, pump):
+    cache = sonora.CoverCache(*covers)
+    loader = sonora.CoverLoader(cache)
+    got = []
+    assert loader.request("abc", 64, callback=got.append) is None
+    assert pump(lambda: got, timeout=5)
+    assert got[0].width() == 64
+    assert loader.request("abc", 64) is got[0]                   # уже в памяти — сразу
+
+
+def test_cancelled_owner_gets_no_callback(covers, pump):
+    cache = sonora.CoverCache(*covers)
+    loader = sonora.CoverLoader(cache, threads=1)
+    owner, other = object(), object()
+    dropped, kept = [], []
+    loader.request("abc", 40, owner=owner, callback=dropped.append)
+    loader.request("abc", 40, owner=other, callback=kept.append)
+    loader.request("abc", 50, owner=owner, callback=dropped.append)
+    loader.cancel(owner)
+    assert pump(lambda: kept, timeout=5)
+    pump(timeout=0.2)
+    assert dropped == []
+    assert kept[0].width() == 40
@@ -0,0 +1,100 @@
+import sonora
+from conftest import make_wav
+
+
+def test_fingerprint_ignores_tags(tmp_path):
+    plain = make_wav(tmp_path / "plain.wav", seconds=0.5, freq=440)
+    tagged = make_wav(tmp_path / "tagged.wav", seconds=0.5, freq=440, title="Другое название", artist="X")
+    other = make_wav(tmp_path / "other.wav", seconds=0.5, freq=660)
+    assert sonora.fingerprint_file(plain) == sonora.fingerprint_file(tagged)
+    assert sonora.fingerprint_file(plain) != sonora.fingerprint_file(other)
+    assert sonora.fingerprint_file(plain).startswith(f"{sonora.FINGERPRINT_VERSION}:")
+
+
+def test_fingerprint_of_long_file_is_sampled(tmp_path, monkeypatch):
+    monkeypatch.setattr(sonora, "FINGERPRINT_SAMPLE_BYTES", 1024)
+    a = make_wav(tmp_path / "a.wav", seconds=2, freq=440)
+    b = make_wav(tmp_path / "b.wav", seconds=2, freq=440)
+    assert sonora.fingerprint_file(a) == sonora.fingerprint_file(b)
+    (tmp_path / "empty.wav").write_bytes(b"")
+    assert sonora.fingerprint_file(str(tmp_path / "empty.wav")) is None
+
+
+def test_payload_range_skips_headers_and_trailing_tags():
+    data = b"ID3\x04\x00\x00\x00\x00\x00\x05" + b"xxxxx" + b"AUDIO" + b"TAG" + b"\0" * 125
+    start, end = sonora.audio_payload_range(data)
+    assert data[start:end] == b"AUDIO"
+
+
+def test_groups_by_fingerprint_and_by_title():
+    index = sonora.DuplicateIndex(tolerance=2.0)
+    index.update("/a.mp3", "fp1", ("song", ("artist",)), 200.0, "full1")
+    index.update("/copy/a.mp3", "fp1", None, 0, "full1")                  # та же запись, без тегов
+    index.update("/a.flac", "fp2", ("song", ("artist",)), 201.0)          # тот же трек в другом формате
+    index.update("/live.flac", "fp3", ("song", ("artist",)), 260.0)       # концертная версия — длиннее
+    index.update("/other.mp3", "fp4", ("other", ("artist",)), 200.0)
+    assert index.groups(key=len) == [["/a.mp3", "/a.flac", "/copy/a.mp3"]]
+
+
+def test_remove_and_rename_update_groups():
+    index = sonora.DuplicateIndex()
+    index.update("/a.mp3", "fp", None, 0, "full")
+    index.update("/b.mp3", "fp", None, 0, "full")
+    index.rename("/b.mp3", "/c.mp3")
+    assert index.groups(key=str) == [["/a.mp3", "/c.mp3"]]
+    index.remove("/a.mp3")
+    assert index.groups() == []
+    assert len(index) == 1
+
+
+def test_sampled_match_needs_full_hash():
+    index = sonora.DuplicateIndex()
+    index.update("/a.mp3", "fp", None, 0)
+    index.update("/b.mp3", "fp", None, 0)
+    index.update("/c.mp3", "other", None, 0)
+    assert sorted(index.unconfirmed()) == ["/a.mp3", "/b.mp3"]
+    assert index.groups() == []                               # выборки совпали, но это ещё не дубликат
+    index.update("/a.mp3", "fp", None, 0, "full-a")
+    index.update("/b.mp3", "fp", None, 0, "full-b")
+    assert index.unconfirmed() == [] and index.groups() == []  # данные разные
+    index.update("/b.mp3", "fp", None, 0, "full-a")
+    assert index.groups(key=str) == [["/a.mp3", "/b.mp3"]]
+
+
+def _differ_between_samples(path, sample):
+    # меняем байты между выборками начала и середины: выборочный отпечаток этого не видит
+    data = bytearray(open(path, "rb").read())
+    start, end = sonora.audio_payload_range(bytes(data))
+    data[start + sample + 10] ^= 0xFF
+    open(path, "wb").write(bytes(data))
+
+
+def test_full_fingerprint_tells_sampled_collisions_apart(tmp_path, monkeypatch):
+    monkeypatch.setattr(sonora, "FINGERPRINT_SAMPLE_BYTES", 1024)
+    a = make_wav(tmp_path / "a.wav", seconds=2, freq=440)
+    b = make_wav(tmp_path / "b.wav", seconds=2, freq=440)
+    _differ_between_samples(b, 1024)
+    assert sonora.fingerprint_file(a) == sonora.fingerprint_file(b)
+    assert not sonora.fingerprint_is_full(sonora.fingerprint_file(a))
+    assert sonora.fingerprint_file(a, full=True) != sonora.fingerprint_file(b, full=True)
+    short = make_wav(tmp_path / "short.wav", seconds=0.1)
+    assert sonora.fingerprint_is_full(sonora.fingerprint_file(short))
+
+
+def test_player_reports_only_confirmed_duplicates(player, pump, music_dir, monkeypatch):
+    monkeypatch.setattr(sonora, "FINGERPRINT_SAMPLE_BYTES", 1024)
+    a = make_wav(music_dir / "a.wav", seconds=2, freq=440)
+    copy = make_wav(music_dir / "copy.wav", seconds=2, freq=440)
+    near = make_wav(music_dir / "near.wav", seconds=2, freq=440)
+    _differ_between_samples(near, 1024)
+    player.load_tracks([a, copy, near])
+
+    def settled():
+        # отпечатки уже разобраны в GUI-потоке (а не только посчитаны) и подтверждены
+        return (len(player.tracks) == 3 and all(player.track_fingerprint(p) for p in player.tracks)
+                and not player.duplicate_index.unconfirmed())
+
+    assert pump(settled, timeout=10)
+    player.update_duplicates()
+    assert player.duplicate_groups == [[a, copy]]
+    assert player.metadata.records[near].get("payload_hash")
@@ -0,0 +1,145 @@
+import os
+
+import sonora
+from conftest import make_wav
+
+
+class FakeAudio:
+    """Бэкенд без звука: запоминает load/queue, переход к треку из очереди делается вручную."""
+    name = "fake"
+
+    def __init__(self):
+        self.path = None
+        self.queued = None
+        self.loads = []
+        self.switched = False
+        self.busy = False
+
+    def load(self, path, gain=1.0):
+        self.path, self.queued = path, None
+        self.loads.append(path)
+
+    def play(self, start=0.0):
+        self.busy = True
+
+    def queue(self, path, gain=1.0):
+        self.queued = path
+
+    def set_gain(self, path, gain):
+        pass
+
+    def rename(self, old, new):
+        pass
+
+    def pause(self):
+        pass
+
+    def unpause(self):
+        pass
+
+    def stop(self):
+        self.busy, self.queued = False, None
+
+    def set_volume(self, volume):
+        pass
+
+    def get_busy(self):
+        return self.busy
+
+    def get_position(self):
+        return 0.0
+
+    def seek(self, seconds):
+        return True
+
+    def wait_ready(self, timeout=2.0):
+        return True
+
+    def poll_switched(self):
+        switched, self.switched = self.switched, False
+        return switched
+
+    def finish_track(self):
+        """Микшер дошёл до конца текущего трека и сам взял трек из очереди."""
+        self.path, self.queued, self.switched = self.queued, None, True
+
+    def close(self):
+        pass
+
+
+def _setup(player, pump, music_dir, monkeypatch, count=4):
+    monkeypatch.setattr(sonora, "NORMALIZE_LOUDNESS", False)
+    monkeypatch.setattr(sonora, "QUEUE_AHEAD_DELAY_MS", 0)
+    paths = [make_wav(music_dir / f"{i}.wav") for i in range(count)]
+    player.load_tracks(paths)
+    assert pump(lambda: not player.metadata_thread.isRunning() and len(player.tracks) == count)
+    player.audio = FakeAudio()
+    player.audio_ready = True
+    return player.audio, list(player.tracks)
+
+
+def _play(player, index):
+    player.current_index = index
+    player.play_track()
+
+
+def test_next_track_is_queued_when_playback_starts(player, pump, music_dir, monkeypatch):
+    audio, tracks = _setup(player, pump, music_dir, monkeypatch)
+    _play(player, 0)
+    assert audio.path == tracks[0]
+    assert audio.queued == tracks[1] and player._queued_path == tracks[1]
+
+
+def test_queue_skips_missing_files(player, pump, music_dir, monkeypatch):
+    audio, tracks = _setup(player, pump, music_dir, monkeypatch)
+    player.missing.add(tracks[1])
+    _play(player, 0)
+    assert audio.queued == tracks[2]
+
+
+def test_switch_to_queued_track_updates_state_and_queues_following(player, pump, music_dir, monkeypatch):
+    audio, tracks = _setup(player, pump, music_dir, monkeypatch)
+    _play(player, 0)
+    audio.finish_track()
+    player.check_pygame_events()
+    # стык обработан без повторной загрузки файла в микшер
+    assert player.tracks[player.current_index] == tracks[1]
+    assert audio.loads == [tracks[0]]
+    assert pump(lambda: audio.queued == tracks[2])
+    assert player._queued_path == tracks[2]
+
+
+def test_next_in_shuffle_plays_the_prefetched_track(player, pump, music_dir, monkeypatch):
+    audio, tracks = _setup(player, pump, music_dir, monkeypatch, count=6)
+    player.is_shuffled = True
+    _play(player, 0)
+    prefetched = audio.queued
+    assert prefetched is not None and prefetched != tracks[0]
+    player.next_track()
+    assert audio.path == prefetched
+    assert player.tracks[player.current_index] == prefetched
+
+
+def test_shuffle_toggle_requeues(player, pump, music_dir, monkeypatch):
+    audio, tracks = _setup(player, pump, music_dir, monkeypatch)
+    _play(player, 0)
+    requeued = []
+    monkeypatch.setattr(player, "_queue_next", lambda: requeued.append(True))
+    player.toggle_shuffle()
+    assert requeued == [True]
+
+
+def test_removing_queued_track_requeues(player, pump, music_dir, monkeypatch):
+    audio, tracks = _setup(player, pump, music_dir, monkeypatch)
+    _play(player, 0)
+    os.remove(tracks[1])
+    player.remove_tracks([tracks[1]])
+    assert audio.queued == tracks[2] and player._queued_path == tracks[2]
+
+
+def test_stop_drops_queue_when_current_track_removed(player, pump, music_dir, monkeypatch):
+    audio, tracks = _setup(player, pump, music_dir, monkeypatch)
+    _play(player, 0)
+    player.remove_tracks([tracks[0]])
+    assert audio.queued is None and player._queued_path is None
+    assert not player.is_playing
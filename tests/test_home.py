@@ -0,0 +1,49 @@
+from PyQt5.QtWidgets import QLabel
+
+import sonora
+
+
+def _section(made, dropped):
+    def make(name):
+        made.append(name)
+        return QLabel(name)
+    return sonora.HomeSection("Альбомы", make, dropped.append, page_size=20, columns=5)
+
+
+def test_cards_are_created_a_page_at_a_time(qapp):
+    made, dropped = [], []
+    section = _section(made, dropped)
+    names = [f"Альбом {i:02}" for i in range(45)]
+    section.set_names(names)
+    assert made == names[:20]
+    assert section.has_more() and section.more_btn.text() == "Показать ещё (25)"
+    section.show_more()
+    section.show_more()
+    assert len(made) == 45 and not section.has_more()
+    section.show_more()
+    assert len(made) == 45
+
+
+def test_set_names_reuses_shown_cards(qapp):
+    made, dropped = [], []
+    section = _section(made, dropped)
+    names = [f"Альбом {i:02}" for i in range(10)]
+    section.set_names(names)
+    first = dict(section.cards)
+    section.set_names(names[1:] + ["Новый"])
+    assert made[10:] == ["Новый"]                      # остальные карточки остались прежними
+    assert [c.text() for c in dropped] == ["Альбом 00"]
+    assert all(section.cards[n] is first[n] for n in names[1:])
+    section.invalidate(["Альбом 05"])
+    section.set_names(section.names)
+    assert made[-1] == "Альбом 05"
+
+
+def test_home_lists_library_names(player):
+    player.library.reset(["/m/a.mp3", "/m/b.mp3"])
+    player.library.index("/m/a.mp3", "Zeta", ["X"])
+    player.library.index("/m/b.mp3", "Alpha", ["X"])
+    player.refresh_home()
+    assert player.home_albums.names == ["Alpha", "Zeta"]
+    assert player.home_artists.names == ["X"]
+    assert set(player.home_albums.cards) == {"Alpha", "Zeta"}
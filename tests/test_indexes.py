@@ -0,0 +1,34 @@
+import sonora
+from conftest import make_wav
+
+
+def _load(player, pump, paths):
+    player.load_tracks(paths)
+    assert pump(lambda: not player.metadata_thread.isRunning() and len(player.tracks) == len(paths), timeout=10)
+
+
+def test_album_and_artist_buckets_from_cached_tags(player, pump, music_dir, monkeypatch):
+    a = make_wav(music_dir / "a.wav", title="A", artist="X; Y", album="First")
+    b = make_wav(music_dir / "b.wav", title="B", artist="X", album="First")
+    c = make_wav(music_dir / "c.wav", title="C")
+    _load(player, pump, [a, b, c])
+    # полная пересборка берёт теги из кэша метаданных, файлы заново не разбираются
+    monkeypatch.setattr(sonora, "read_track_metadata", lambda *args: (_ for _ in ()).throw(AssertionError(args)))
+    player._rebuild_indexes()
+    assert player.library.album_tracks("First") == [a, b]
+    assert player.library.artist_tracks("X") == [a, b]
+    assert player.library.artist_tracks("Y") == [a]
+    assert player.library.album_tracks("Неизвестный альбом") == [c]
+    assert player.library.artist_tracks("Неизвестный исполнитель") == [c]
+
+
+def test_changed_tags_move_track_between_buckets(player, pump, music_dir):
+    a = make_wav(music_dir / "a.wav", title="A", artist="X", album="First")
+    b = make_wav(music_dir / "b.wav", title="B", artist="X", album="First")
+    _load(player, pump, [a, b])
+    player.metadata.records[b].update(album="Second", artists=["Z"])
+    player._update_indexes(changed=[b])
+    assert player.library.album_tracks("First") == [a]
+    assert player.library.album_tracks("Second") == [b]
+    assert "Z" in player.library.artists and player.library.artist_tracks("X") == [a]
+    assert {"First", "Second", "X", "Z"} <= player._stale_names   # карточки обоих альбомов обновятся
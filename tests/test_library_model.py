@@ -0,0 +1,95 @@
+import random
+
+import sonora
+
+
+def _model(paths):
+    model = sonora.LibraryModel()
+    model.reset(paths)
+    return model
+
+
+def _check(model, expected):
+    assert model.paths == expected
+    assert len(model) == len(expected)
+    for i, p in enumerate(expected):
+        assert model.index_of(p) == i
+        assert model.path_of(model.id_of(p)) == p
+
+
+def test_remove_keeps_order_and_positions():
+    paths = [f"/m/{i}.mp3" for i in range(10)]
+    model = _model(paths)
+    assert model.remove_many(["/m/3.mp3", "/m/7.mp3", "/m/nope.mp3", "/m/3.mp3"]) == {"/m/3.mp3", "/m/7.mp3"}
+    expected = [p for p in paths if p not in ("/m/3.mp3", "/m/7.mp3")]
+    _check(model, expected)
+    assert model.remove_many([]) == set()
+
+
+def test_large_batch_and_single_removals_agree_with_list():
+    rng = random.Random(5)
+    paths = [f"/m/{i}.mp3" for i in range(500)]
+    model = _model(paths)
+    expected = list(paths)
+    for step in range(60):
+        if step % 10 == 0:
+            batch = rng.sample(expected, min(len(expected), sonora.LibraryModel.CUT_LIMIT + 5))
+        else:
+            batch = rng.sample(expected, rng.randint(1, 3))
+        model.remove_many(batch)
+        expected = [p for p in expected if p not in batch]
+        if step % 3 == 0:
+            new = f"/m/new{step}.mp3"
+            model.add(new)
+            expected.append(new)
+        probe = rng.choice(expected)
+        assert model.index_of(probe) == expected.index(probe)
+    _check(model, expected)
+
+
+def test_removed_track_leaves_indexes():
+    model = _model(["/m/a.mp3", "/m/b.mp3"])
+    model.index("/m/a.mp3", "Album", ["X", "Y"])
+    model.index("/m/b.mp3", "Album", ["X"])
+    model.remove_many(["/m/a.mp3"])
+    assert model.album_tracks("Album") == ["/m/b.mp3"]
+    assert "Y" not in model.artists
+    assert model.keys_of("/m/a.mp3") is None
+
+
+def test_rename_keeps_id_position_and_indexes():
+    model = _model(["/m/a.mp3", "/m/b.mp3", "/m/c.mp3"])
+    model.index("/m/b.mp3", "Album", ["X"])
+    track_id = model.id_of("/m/b.mp3")
+    model.rename("/m/b.mp3", "/m/renamed.mp3")
+    _check(model, ["/m/a.mp3", "/m/renamed.mp3", "/m/c.mp3"])
+    assert model.id_of("/m/renamed.mp3") == track_id
+    assert "/m/b.mp3" not in model
+    assert model.album_tracks("Album") == ["/m/renamed.mp3"]
+
+
+def test_rename_over_existing_track_drops_it():
+    model = _model(["/m/a.mp3", "/m/b.mp3", "/m/c.mp3"])
+    model.index("/m/a.mp3", "Old", ["X"])
+    model.index("/m/c.mp3", "Moved", ["Y"])
+    model.rename("/m/c.mp3", "/m/a.mp3")       # c перемещён поверх a
+    _check(model, ["/m/b.mp3", "/m/a.mp3"])
+    assert model.keys_of("/m/a.mp3") == ("Moved", ["Y"])
+    assert "Old" not in model.albums and "X" not in model.artists
+    assert model.album_tracks("Moved") == ["/m/a.mp3"]
+
+
+def test_album_and_artist_names_stay_sorted():
+    model = _model(["/m/a.mp3", "/m/b.mp3", "/m/c.mp3"])
+    model.index("/m/a.mp3", "Zeta", ["Beta", "Alpha"])
+    model.index("/m/b.mp3", "", ["Alpha"])          # без альбома — на главную не попадает
+    model.index("/m/c.mp3", "Eta", ["Gamma"])
+    assert model.album_names == ["Eta", "Zeta"]
+    assert model.artist_names == ["Alpha", "Beta", "Gamma"]
+    model.index("/m/c.mp3", "Theta", ["Alpha"])     # теги изменились
+    assert model.album_names == ["Theta", "Zeta"]
+    assert model.artist_names == ["Alpha", "Beta"]
+    model.remove_many(["/m/a.mp3"])
+    assert model.album_names == ["Theta"]
+    assert model.artist_names == ["Alpha"]
+    assert model.album_names == sorted(a for a in model.albums if a)
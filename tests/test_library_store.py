@@ -0,0 +1,113 @@
+import json
+import os
+
+import sonora
+
+
+def _store(tmp_path, read_only=False):
+    store = sonora.LibraryStore(str(tmp_path / "library.db"))
+    store.open(read_only=read_only)
+    return store
+
+
+def _reopen(tmp_path):
+    store = _store(tmp_path)
+    try:
+        return store.load(), store.load_metadata()
+    finally:
+        store.close()
+
+
+def test_changes_roundtrip_and_collapse(tmp_path):
+    store = _store(tmp_path)
+    store.add_tracks(["/m/a.mp3", "/m/b.mp3", "/m/c.mp3"])
+    store.set_favorite("/m/b.mp3", True)
+    store.put_metadata("/m/a.mp3", {"title": "Песня"})
+    store.set_setting("volume", 40)
+    store.commit(wait=True)
+    # повторные изменения одной строки до commit схлопываются в последнее
+    store.set_favorite("/m/a.mp3", True)
+    store.set_favorite("/m/a.mp3", False)
+    store.remove_tracks(["/m/c.mp3"])
+    store.put_metadata("/m/a.mp3", None)
+    store.set_setting("volume", 70)
+    assert store.has_changes()
+    store.commit(wait=True)
+    assert not store.has_changes()
+    store.close()
+    (tracks, favorites, settings), metadata = _reopen(tmp_path)
+    assert tracks == ["/m/a.mp3", "/m/b.mp3"]
+    assert favorites == {"/m/b.mp3"}
+    assert settings == {"volume": 70}
+    assert metadata == {}
+
+
+def test_rename_keeps_row_order(tmp_path):
+    store = _store(tmp_path)
+    store.add_tracks(["/m/a.mp3", "/m/b.mp3"])
+    store.set_favorite("/m/a.mp3", True)
+    store.commit(wait=True)
+    store.rename_track("/m/a.mp3", "/m/z.mp3")
+    store.commit(wait=True)
+    store.close()
+    (tracks, favorites, _), _ = _reopen(tmp_path)
+    assert tracks == ["/m/z.mp3", "/m/b.mp3"]
+    assert favorites == {"/m/z.mp3"}
+
+
+def test_json_state_is_migrated_once(tmp_path):
+    state = tmp_path / "state.json"
+    meta = tmp_path / "meta.json"
+    state.write_text(json.dumps({"tracks": ["/m/a.mp3"], "favorites": ["/m/a.mp3"], "volume": 30}), encoding="utf-8")
+    meta.write_text(json.dumps({"/m/a.mp3": {"title": "A"}}), encoding="utf-8")
+    store = _store(tmp_path)
+    store.migrate_json(str(state), str(meta))
+    store.close()
+    assert not state.exists() and (tmp_path / "state.json.migrated").exists()
+    (tracks, favorites, settings), metadata = _reopen(tmp_path)
+    assert (tracks, favorites, settings) == (["/m/a.mp3"], {"/m/a.mp3"}, {"volume": 30})
+    assert metadata == {"/m/a.mp3": {"title": "A"}}
+
+
+def test_scan_stats_roundtrip(tmp_path):
+    store = _store(tmp_path)
+    store.add_scan_stats({"started": 1.0, "kind": "full", "dirs": 3})
+    store.add_scan_stats({"started": 2.0, "kind": "incremental", "dirs": 1})
+    store.commit(wait=True)
+    store.close()
+    reader = _store(tmp_path, read_only=True)
+    try:
+        assert [s["kind"] for s in reader.load_scan_stats()] == ["incremental", "full"]
+        assert not reader.migration_pending()
+    finally:
+        reader.close()
+
+
+def test_read_only_open_neither_creates_nor_migrates(tmp_path):
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({"tracks": ["/m/a.mp3"]}), encoding="utf-8")
+    reader = _store(tmp_path, read_only=True)
+    try:
+        assert reader.conn is None
+        assert reader.load_scan_stats() == []
+        assert reader.migration_pending(str(state), str(tmp_path / "meta.json"))
+        assert not reader.migration_pending(str(tmp_path / "none.json"), str(tmp_path / "meta.json"))
+    finally:
+        reader.close()
+    assert not os.path.exists(tmp_path / "library.db")
+
+
+def test_print_scan_stats_reports_pending_migration(capsys):
+    for name in (sonora.LIBRARY_DB, sonora.LIBRARY_DB + "-wal", sonora.LIBRARY_DB + "-shm"):
+        if os.path.exists(name):
+            os.remove(name)
+    with open(sonora.STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"tracks": ["/m/a.mp3"]}, f)
+    try:
+        sonora.print_scan_stats()
+        out = capsys.readouterr().out
+        assert "не обновлена" in out and "Статистики сканов ещё нет" in out
+        assert not os.path.exists(sonora.LIBRARY_DB)
+        assert os.path.exists(sonora.STATE_FILE)      # перенос не запускался
+    finally:
+        os.remove(sonora.STATE_FILE)
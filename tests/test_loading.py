@@ -0,0 +1,25 @@
+from conftest import make_wav
+
+
+def _loading(player):
+    thread = player.metadata_thread
+    return (thread is not None and thread.isRunning()) or bool(player._load_backlog)
+
+
+def test_load_tracks_while_loading_keeps_earlier_files(player, pump, music_dir):
+    first = [make_wav(music_dir / f"a{i:03}.wav") for i in range(300)]
+    second = [make_wav(music_dir / f"b{i}.wav") for i in range(3)]
+    player.load_tracks(first)
+    assert player.metadata_thread.isRunning()
+    player.load_tracks(second)  # раньше прерывало первую загрузку
+    assert pump(lambda: not _loading(player) and len(player.tracks) == len(first) + len(second), timeout=20)
+    assert set(player.tracks) == set(first + second)
+
+
+def test_load_tracks_reads_tags(player, pump, music_dir):
+    path = make_wav(music_dir / "tagged.wav", title="Песня", artist="A; B")
+    player.load_tracks([path])
+    assert pump(lambda: not _loading(player) and player.tracks, timeout=10)
+    record = player.metadata.records[path]
+    assert record["title"] == "Песня"
+    assert record["artists"] == ["A", "B"]
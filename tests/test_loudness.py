@@ -0,0 +1,114 @@
+import stat
+import sys
+
+import pytest
+
+import sonora
+
+# Заменитель ffmpeg: файл трека — «секунды уровень», на выход — постоянный сигнал s16le с учётом -ss.
+FAKE_FFMPEG = """#!{python}
+import array, sys
+args = sys.argv[1:]
+start = float(args[args.index("-ss") + 1])
+rate = int(args[args.index("-ar") + 1])
+channels = int(args[args.index("-ac") + 1])
+with open(args[args.index("-i") + 1]) as f:
+    seconds, level = f.read().split()
+frames = max(0, int((float(seconds) - start) * rate))
+sys.stdout.buffer.write(array.array("h", [int(level)] * frames * channels).tobytes())
+"""
+
+
+def test_replaygain_read_from_id3_vorbis_and_mp4_keys():
+    assert sonora.read_replaygain({"TXXX:REPLAYGAIN_TRACK_GAIN": ["-6.50 dB"],
+                                   "TXXX:REPLAYGAIN_TRACK_PEAK": ["0.9"]}) == (-6.5, 0.9)
+    assert sonora.read_replaygain({"replaygain_track_gain": ["+2,5 dB"]}) == (2.5, None)
+    assert sonora.read_replaygain({"----:com.apple.iTunes:replaygain_track_gain": [b"-3.0 dB"]}) == (-3.0, None)
+    # первое найденное значение выигрывает, пустые и нечисловые теги пропускаются
+    assert sonora.read_replaygain(None, {"replaygain_track_gain": ["n/a"]},
+                                  {"replaygain_track_gain": "-1 dB"}, {"replaygain_track_gain": "-9 dB"}) == (-1.0, None)
+    assert sonora.read_replaygain({"TIT2": ["x"]}) == (None, None)
+
+
+def test_track_gain_from_tags_analysis_and_peak(player, monkeypatch):
+    monkeypatch.setattr(sonora, "REPLAYGAIN_PREAMP_DB", 0.0)
+    monkeypatch.setattr(player.analyzer, "prioritize", lambda path: None)
+    records = player.metadata.records
+    records["/m/tagged.mp3"] = {"replaygain": -6.0, "replaygain_peak": None}
+    records["/m/loud.mp3"] = {"replaygain": 12.0, "replaygain_peak": 0.5}
+    records["/m/analysed.mp3"] = {"analysis": {"version": sonora.ANALYSIS_VERSION,
+                                               "loudness": sonora.LOUDNESS_TARGET_DB + 6.0, "peak": None}}
+    records["/m/unknown.mp3"] = {}
+    assert player._track_gain("/m/tagged.mp3") == pytest.approx(10 ** (-6 / 20))
+    assert player._track_gain("/m/loud.mp3") == pytest.approx(2.0)     # пик не выше 0 дБFS
+    assert player._track_gain("/m/analysed.mp3") == pytest.approx(10 ** (-6 / 20))
+    assert player._track_gain("/m/unknown.mp3") == 1.0
+    monkeypatch.setattr(sonora, "NORMALIZE_LOUDNESS", False)
+    assert player._track_gain("/m/tagged.mp3") == 1.0
+
+
+@pytest.fixture
+def make_stream(tmp_path):
+    pytest.importorskip("pygame")
+    if sonora.load_numpy() is None:
+        pytest.skip("нет numpy")
+    try:
+        sonora.load_audio()
+    except Exception as e:
+        pytest.skip(f"нет микшера: {e}")
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG.format(python=sys.executable))
+    ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IEXEC)
+    backends = []
+
+    def make(crossfade):
+        backend = sonora.StreamBackend(ffmpeg=str(ffmpeg), crossfade=crossfade)
+        backends.append(backend)
+        return backend
+    yield make
+    for backend in backends:
+        backend.close()
+
+
+def _decode(backend, tmp_path, tracks, gains=None):
+    """Синхронно прогоняет декодер по трекам подряд; возвращает отданные в буфер сэмплы первого канала."""
+    np = sonora.load_numpy()
+    paths = []
+    for i, (seconds, level) in enumerate(tracks):
+        path = tmp_path / f"{i}.trk"
+        path.write_text(f"{seconds} {level}")
+        paths.append(str(path))
+    out = []
+    backend.ring.put = lambda generation, path, offset, data: out.append(data) or True
+    backend._gains = dict(zip(paths, gains or []))
+    backend._next_path = paths[1] if len(paths) > 1 else None
+    backend._decode_loop(backend.ring.generation, paths[0], 0.0)
+    return np.frombuffer(b"".join(out), dtype=np.int16).reshape(-1, backend.channels)[:, 0]
+
+
+def test_gain_scales_samples(make_stream, tmp_path):
+    backend = make_stream(0)
+    samples = _decode(backend, tmp_path, [(0.2, 1000)], gains=[0.5])
+    assert len(samples) == int(0.2 * backend.rate)
+    assert (samples == 500).all()
+
+
+def test_crossfade_overlaps_tracks_with_equal_power(make_stream, tmp_path):
+    backend = make_stream(0.1)
+    samples = _decode(backend, tmp_path, [(0.5, 1000), (0.4, 1000)])
+    fade = backend.crossfade_frames
+    # треки перекрываются на длину кроссфейда
+    assert abs(len(samples) - (int(0.5 * backend.rate) + int(0.4 * backend.rate) - fade)) <= 1
+    start = int(0.5 * backend.rate) - fade
+    assert (samples[:start] == 1000).all()
+    middle = samples[start + fade // 2]
+    assert 1000 * 1.35 < middle <= 1000 * 1.42   # sin + cos на середине ≈ √2
+    assert (samples[start + fade + 1:] == 1000).all()
+
+
+def test_crossfade_longer_than_next_track_plays_out_tail(make_stream, tmp_path):
+    backend = make_stream(0.2)
+    samples = _decode(backend, tmp_path, [(0.5, 1000), (0.05, 0)])
+    # короткий следующий трек не обрезает затухание предыдущего
+    assert abs(len(samples) - int(0.5 * backend.rate)) <= 1
+    assert samples[-1] < samples[int(0.3 * backend.rate)]
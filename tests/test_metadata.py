@@ -0,0 +1,111 @@
+import os
+
+import sonora
+from conftest import make_wav, set_mtime
+
+
+def _cache(tmp_path, store=None):
+    return sonora.MetadataCache(store, covers_dir=str(tmp_path / "covers"))
+
+
+def test_get_parses_once_and_caches(tmp_path, monkeypatch):
+    path = make_wav(tmp_path / "a.wav", title="Первая", artist="A; B")
+    cache = _cache(tmp_path)
+    record = cache.get(path)
+    assert record["title"] == "Первая"
+    assert record["artists"] == ["A", "B"]
+    assert record["version"] == sonora.METADATA_VERSION
+    monkeypatch.setattr(sonora, "read_track_metadata", lambda *a: (_ for _ in ()).throw(AssertionError("перечитан")))
+    assert cache.get(path) is record
+
+
+def test_changed_file_is_stale_and_refreshed(tmp_path):
+    path = make_wav(tmp_path / "a.wav", title="Старое")
+    cache = _cache(tmp_path)
+    cache.get(path)
+    assert cache.is_fresh(path)
+    make_wav(path, seconds=0.2, title="Новое")
+    set_mtime(path, os.stat(path).st_mtime + 5)
+    assert not cache.is_fresh(path)
+    assert cache.known_stat(path) != (os.stat(path).st_mtime, os.stat(path).st_size)
+    assert cache.refresh(path)["title"] == "Новое"
+    assert cache.is_fresh(path)
+
+
+def test_missing_file_is_not_cached(tmp_path):
+    cache = _cache(tmp_path)
+    missing = str(tmp_path / "nope.wav")
+    assert cache.get(missing)["title"] is None
+    assert missing not in cache.records
+    assert not cache.is_fresh(missing)
+
+
+def test_outdated_records_are_reread(tmp_path):
+    wav = make_wav(tmp_path / "a.wav", title="A")
+    cache = _cache(tmp_path)
+    cache.get(wav)
+    cache.records[wav]["version"] = 1
+    cache.records["/x/old.mp3"] = {"version": 1}
+    assert cache.outdated([wav, "/x/old.mp3", "/x/unknown.flac"]) == [wav]   # MP3 читались полностью и раньше
+    assert not cache.is_fresh(wav)
+    assert cache.known_stat(wav) is None
+
+
+def test_extract_skips_unchanged_file(tmp_path):
+    path = make_wav(tmp_path / "a.wav", title="A")
+    st = os.stat(path)
+    assert sonora.extract_track_metadata(path, (st.st_mtime, st.st_size), str(tmp_path)) == (path, None, 0)
+    _, record, read = sonora.extract_track_metadata(path, None, str(tmp_path))
+    assert record["title"] == "A" and read > 0
+    assert sonora.extract_track_metadata(str(tmp_path / "gone.wav"), None, str(tmp_path)) is None
+
+
+def test_invalidate_rename_and_save_roundtrip(tmp_path):
+    store = sonora.LibraryStore(str(tmp_path / "library.db"))
+    store.open()
+    cache = _cache(tmp_path, store)
+    a = make_wav(tmp_path / "a.wav", title="A")
+    b = make_wav(tmp_path / "b.wav", title="B")
+    cache.get(a)
+    cache.get(b)
+    cache.save()
+    store.commit(wait=True)
+    cache.rename(a, str(tmp_path / "renamed.wav"))
+    cache.invalidate(b)
+    cache.save()
+    store.commit(wait=True)
+    store.close()
+    reopened = sonora.LibraryStore(str(tmp_path / "library.db"))
+    reopened.open()
+    try:
+        records = reopened.load_metadata()
+    finally:
+        reopened.close()
+    assert set(records) == {str(tmp_path / "renamed.wav")}
+    assert records[str(tmp_path / "renamed.wav")]["title"] == "A"
+
+
+def test_tag_edit_keeps_analysis_and_fingerprint(player, pump, music_dir, monkeypatch):
+    path = make_wav(music_dir / "a.wav", title="До")
+    player.load_tracks([path])
+    assert pump(lambda: not player.metadata_thread.isRunning() and player.tracks == [path], timeout=10)
+    record = player.metadata.records[path]
+    record["analysis"] = {"version": sonora.ANALYSIS_VERSION, "duration": 0.1, "bpm": 120}
+    record["fingerprint"] = sonora.fingerprint_file(path)
+
+    class Dialog:
+        def __init__(self, filepath):
+            self.filepath = filepath
+
+        def exec_(self):
+            make_wav(self.filepath, title="После")   # те же звуковые данные, другие теги
+            set_mtime(self.filepath, os.stat(self.filepath).st_mtime + 5)
+            return True
+
+    monkeypatch.setattr(sonora, "EditTrackDialog", Dialog)
+    monkeypatch.setattr(player.analyzer, "submit", lambda paths: None)
+    player.edit_track_info(path)
+    record = player.metadata.records[path]
+    assert record["title"] == "После"
+    assert player.track_analysis(path)["bpm"] == 120
+    assert player.track_fingerprint(path) == sonora.fingerprint_file(path)
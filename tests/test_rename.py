@@ -0,0 +1,64 @@
+import os
+
+import sonora
+from conftest import make_wav
+
+
+def _load(player, pump, paths):
+    player.load_tracks(paths)
+    assert pump(lambda: not player.metadata_thread.isRunning() and len(player.tracks) == len(paths), timeout=10)
+    pump(timeout=0.05)
+
+
+def _saved(player):
+    player.save_state()
+    player.store.flush()
+    store = sonora.LibraryStore(player.store.path)
+    store.open()
+    try:
+        tracks, favorites, _ = store.load()
+        return tracks, favorites, store.load_metadata()
+    finally:
+        store.close()
+
+
+def test_rename_keeps_favorite_and_current(player, pump, music_dir):
+    a = make_wav(music_dir / "a.wav", title="A")
+    b = make_wav(music_dir / "b.wav", title="B")
+    _load(player, pump, [a, b])
+    player.current_index = player.tracks.index(a)
+    player.toggle_favorite()
+    new = str(music_dir / "renamed.wav")
+    os.rename(a, new)
+    player.rename_tracks([(a, new)])
+    assert player.tracks == [new, b]
+    assert player.tracks[player.current_index] == new
+    assert player.favorites == {new}
+    assert player.metadata.get(new)["title"] == "A"
+    tracks, favorites, _ = _saved(player)
+    assert tracks == [new, b]
+    assert favorites == {new}
+
+
+def test_move_over_existing_track_keeps_moved_state(player, pump, music_dir):
+    a = make_wav(music_dir / "a.wav", title="A")
+    b = make_wav(music_dir / "b.wav", title="B")
+    c = make_wav(music_dir / "c.wav", title="C")
+    _load(player, pump, [a, b, c])
+    player.current_index = player.tracks.index(b)
+    player.toggle_favorite()                     # у заменяемого трека своё избранное
+    player.current_index = player.tracks.index(a)
+    player.toggle_favorite()
+    player.save_state()
+    os.replace(a, b)                             # a переезжает поверх b
+    player.rename_tracks([(a, b)])
+    assert a not in player.library
+    assert sorted(player.tracks) == sorted([b, c])
+    assert player.tracks[player.current_index] == b      # играющий трек продолжается под новым путём
+    assert player.favorites == {b}                       # избранное a перешло к файлу
+    assert player.metadata.get(b)["title"] == "A"        # и его теги
+    assert player.search_index.search("a") == [player.library.id_of(b)]
+    tracks, favorites, metadata = _saved(player)
+    assert sorted(tracks) == sorted([b, c])
+    assert favorites == {b}
+    assert metadata[b]["title"] == "A" and a not in metadata
@@ -0,0 +1,48 @@
+import threading
+
+import sonora
+
+
+def test_blocks_keep_order_and_size():
+    ring = sonora.PcmRingBuffer(100)
+    generation = ring.generation
+    assert ring.put(generation, "a", 0.0, b"x" * 10)
+    assert ring.put(generation, "a", 0.5, b"y" * 20)
+    assert len(ring) == 2
+    assert ring.get() == ("a", 0.0, b"x" * 10)
+    assert ring.get() == ("a", 0.5, b"y" * 20)
+    assert ring.get() is None
+
+
+def test_clear_drops_blocks_of_old_generation():
+    ring = sonora.PcmRingBuffer(100)
+    old = ring.generation
+    ring.put(old, "a", 0.0, b"x" * 10)
+    new = ring.clear()
+    assert new != old
+    assert len(ring) == 0
+    assert not ring.put(old, "a", 1.0, b"x" * 10)  # блок старого декодера после перемотки
+    assert ring.put(new, "a", 2.0, b"z" * 10)
+    assert ring.get() == ("a", 2.0, b"z" * 10)
+
+
+def test_put_waits_for_room_and_wakes_on_clear():
+    ring = sonora.PcmRingBuffer(16)
+    generation = ring.generation
+    assert ring.put(generation, "a", 0.0, b"x" * 16)
+    results = []
+    writer = threading.Thread(target=lambda: results.append(ring.put(generation, "a", 1.0, b"y" * 8)))
+    writer.start()
+    writer.join(0.2)
+    assert writer.is_alive()  # буфер полон — декодер ждёт
+    assert ring.get() is not None
+    writer.join(1.0)
+    assert results == [True]
+    # ожидающий put старого поколения отпускается сбросом и возвращает False
+    assert ring.put(generation, "a", 2.0, b"z" * 8)
+    writer = threading.Thread(target=lambda: results.append(ring.put(generation, "a", 3.0, b"w" * 8)))
+    writer.start()
+    writer.join(0.2)
+    ring.clear()
+    writer.join(1.0)
+    assert results == [True, False]
@@ -0,0 +1,75 @@
+import os
+
+import sonora
+from conftest import make_wav
+
+
+def _tree(root):
+    return [make_wav(root / "A" / "a.wav"), make_wav(root / "B" / "b.wav"), make_wav(root / "c.wav")]
+
+
+def _run(root, tmp_path, **kwargs):
+    scanner = sonora.ScannerThread(paths=[str(root)], cache_file=str(tmp_path / "cache.json"), **kwargs)
+    reports = []
+    scanner.stats.connect(reports.append)
+    scanner.run()
+    return scanner, reports
+
+
+def test_scan_reports_live_stats_and_result(qapp, tmp_path, monkeypatch):
+    monkeypatch.setattr(sonora, "SCAN_STATS_INTERVAL", 0)
+    root = tmp_path / "Music"
+    _tree(root)
+    scanner, reports = _run(root, tmp_path)
+    assert len(reports) > 1
+    last = reports[-1]
+    assert (last["dirs"], last["files"], last["percent"]) == (3, 3, 100)
+    assert all(r["percent"] < 100 for r in reports[:-1])
+    result = scanner.result_stats
+    assert (result["dirs"], result["dirs_read"], result["files"], result["truncated"]) == (3, 3, 3, 0)
+    assert result["roots"] == [str(root)] and not result["incremental"]
+    assert result["per_root"][str(root)]["dirs"] == 3
+    assert "fs" in result["per_root"][str(root)]
+
+
+def test_progress_follows_previous_scan_size(qapp, tmp_path, monkeypatch):
+    monkeypatch.setattr(sonora, "SCAN_STATS_INTERVAL", 0)
+    root = tmp_path / "Music"
+    _tree(root)
+    _, reports = _run(root, tmp_path, expected_dirs=30)
+    # по прошлому скану ожидалось 30 каталогов, пройдено 3 — до финала не больше 10%
+    assert max(r["percent"] for r in reports[:-1]) <= 10
+
+
+def test_stopped_scan_has_no_result(qapp, tmp_path):
+    root = tmp_path / "Music"
+    _tree(root)
+    scanner = sonora.ScannerThread(paths=[str(root)], cache_file=str(tmp_path / "cache.json"))
+    scanner.stop_requested = True
+    scanner.run()
+    assert scanner.result_stats == {}
+
+
+def test_tag_reading_counts_only_header_bytes(tmp_path):
+    path = make_wav(tmp_path / "long.wav", seconds=4.0, title="T")
+    result = sonora.extract_track_metadata(path, None, str(tmp_path / "covers"))
+    assert result is not None
+    _, record, read_bytes = result
+    assert record["title"] == "T"
+    assert 0 < read_bytes < os.path.getsize(path) / 4
+
+
+def test_finished_scan_is_stored(player, pump, music_dir):
+    files = _tree(music_dir)
+    player.start_scan(paths=[str(music_dir)], incremental=False)
+    assert pump(lambda: player.scan_history, timeout=10)
+    stats = player.scan_history[0]
+    assert stats["kind"] == "full" and stats["roots"] == [str(music_dir)]
+    assert stats["files"] == len(files) and stats["library_size"] == len(files)
+    assert stats["tag_files"] == len(files) and stats["tag_bytes"] > 0
+    player.store.commit(wait=True)
+    assert player.store.load_scan_stats()[0]["dirs"] == stats["dirs"]
+    # следующий такой же скан оценивает прогресс по числу каталогов этого
+    player.start_scan(paths=[str(music_dir)], incremental=False)
+    assert player.scanner_thread.expected_dirs == stats["dirs"]
+    assert pump(lambda: not player.scanner_thread.isRunning())
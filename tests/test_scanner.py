@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+import sonora
+from conftest import make_wav, set_mtime
+
+
+def _scan(root, cache_file, incremental=True, known=(), **kwargs):
+    """Запускает ScannerThread.run() в текущем потоке; возвращает (сканер, added, removed, modified, found)."""
+    scanner = sonora.ScannerThread(paths=[str(root)], incremental=incremental, known=set(known),
+                                   cache_file=str(cache_file), **kwargs)
+    result = {}
+    found = []
+    scanner.changes.connect(lambda a, r, m: result.update(added=a, removed=r, modified=m))
+    scanner.found.connect(found.extend)
+    scanner.run()
+    return scanner, result["added"], result["removed"], result["modified"], found
+
+
+@pytest.fixture
+def library(qapp, tmp_path):
+    root = tmp_path / "Music"
+    files = [make_wav(root / "A" / "a.wav"), make_wav(root / "A" / "b.wav"), make_wav(root / "c.wav")]
+    cache = tmp_path / "scan_cache.json"
+    _, added, _, _, found = _scan(root, cache, incremental=False)
+    assert sorted(found) == sorted(files)
+    return root, cache, files
+
+
+def test_unchanged_tree_reports_nothing(library):
+    root, cache, files = library
+    scanner, added, removed, modified, _ = _scan(root, cache, known=files)
+    assert (added, removed, modified) == ([], [], [])
+    assert scanner.result_stats["dirs_read"] == 0
+    assert scanner.result_stats["files"] == 3
+
+
+def test_in_place_edit_is_modified_without_dir_mtime_change(library):
+    root, cache, files = library
+    folder = root / "A"
+    dir_mtime = os.stat(folder).st_mtime
+    make_wav(files[0], seconds=0.3)               # тот же файл, новое содержимое
+    set_mtime(files[0], dir_mtime + 10)
+    set_mtime(folder, dir_mtime)                  # как при правке тегов на месте: каталог не тронут
+    scanner, added, removed, modified, _ = _scan(root, cache, known=files)
+    assert modified == [files[0]]
+    assert (added, removed) == ([], [])
+    assert scanner.result_stats["dirs_read"] == 0
+    # изменение запомнено — повторный скан его больше не отдаёт
+    assert _scan(root, cache, known=files)[3] == []
+
+
+def test_added_and_removed_files(library):
+    root, cache, files = library
+    os.remove(files[1])
+    new = make_wav(root / "A" / "d.wav")
+    new_dir = make_wav(root / "B" / "e.wav")
+    _, added, removed, modified, _ = _scan(root, cache, known=files)
+    assert added == sorted([new, new_dir])
+    assert removed == [files[1]]
+    assert modified == []
+
+
+def test_removed_directory_reports_its_files(library):
+    root, cache, files = library
+    for name in ("a.wav", "b.wav"):
+        os.remove(root / "A" / name)
+    os.rmdir(root / "A")
+    _, added, removed, modified, _ = _scan(root, cache, known=files)
+    assert removed == sorted(files[:2])
+    assert (added, modified) == ([], [])
+
+
+def test_max_depth_and_exclusions(qapp, tmp_path):
+    root = tmp_path / "Music"
+    shallow = make_wav(root / "x.wav")
+    make_wav(root / "1" / "2" / "3" / "deep.wav")
+    make_wav(root / "node_modules" / "skip.wav")
+    _, _, _, _, found = _scan(root, tmp_path / "cache.json", incremental=False, max_depth=2)
+    assert found == [shallow]
+
+
+def test_symlink_loop_is_walked_once(qapp, tmp_path):
+    root = tmp_path / "Music"
+    song = make_wav(root / "A" / "a.wav")
+    os.symlink(root, root / "A" / "loop")       # петля обратно в корень
+    os.symlink(root / "A", root / "again")      # второй путь к уже пройденному каталогу
+    _, _, _, _, found = _scan(root, tmp_path / "cache.json", incremental=False)
+    assert found == [song]                      # настоящий путь и ровно один раз
+
+
+def test_symlinked_directory_outside_root_is_followed(qapp, tmp_path):
+    root = tmp_path / "Music"
+    make_wav(root / "x.wav")
+    outside = make_wav(tmp_path / "Elsewhere" / "y.wav")
+    os.symlink(tmp_path / "Elsewhere", root / "linked")
+    _, _, _, _, found = _scan(root, tmp_path / "cache.json", incremental=False)
+    assert sorted(found) == sorted([str(root / "x.wav"), str(root / "linked" / "y.wav")])
+    assert os.path.samefile(str(root / "linked" / "y.wav"), outside)
+
+
+def test_directory_limit_does_not_report_files_removed(qapp, tmp_path, monkeypatch):
+    root = tmp_path / "Music"
+    files = [make_wav(root / name / "t.wav") for name in ("A", "B", "C")]
+    cache = tmp_path / "cache.json"
+    _scan(root, cache, incremental=False)
+    monkeypatch.setattr(sonora, "SCAN_FS_DIR_LIMIT", 2)
+    scanner, added, removed, modified, _ = _scan(root, cache, known=files)
+    assert scanner.result_stats["truncated"] == 2
+    assert (added, removed, modified) == ([], [], [])
+
+
+def test_full_scan_emits_batches(qapp, tmp_path, monkeypatch):
+    monkeypatch.setattr(sonora, "SCAN_BATCH_SIZE", 2)
+    root = tmp_path / "Music"
+    files = [make_wav(root / f"{i}.wav") for i in range(5)]
+    scanner = sonora.ScannerThread(paths=[str(root)], cache_file=str(tmp_path / "cache.json"))
+    batches = []
+    scanner.found.connect(batches.append)
+    scanner.run()
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert sorted(p for b in batches for p in b) == sorted(files)
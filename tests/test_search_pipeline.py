@@ -0,0 +1,32 @@
+import sonora
+
+
+def test_stale_task_is_dropped(qapp):
+    signals = sonora.SearchSignals()
+    done = []
+    signals.done.connect(lambda *args: done.append(args))
+    index = sonora.SearchIndex()
+    index.add(1, "Karma", [], "")
+    current = [1]
+    sonora.SearchTask(index, "karma", 0, lambda: current[0], signals).run()   # уже устарел
+    sonora.SearchTask(index, "karma", 1, lambda: current[0], signals).run()
+    qapp.processEvents()
+    assert [(g, q, ids) for g, q, ids, _ in done] == [(1, "karma", [1])]
+
+
+def test_typing_runs_one_search_for_the_last_text(player, pump, monkeypatch):
+    player.show_search()
+    queries = []
+    real = player.search_index.search
+
+    def search(query, should_stop=None, **kwargs):
+        queries.append(query)
+        return real(query, should_stop, **kwargs)
+
+    monkeypatch.setattr(player.search_index, "search", search)
+    for text in ("k", "ka", "kar"):
+        player.schedule_search(text)          # нажатия быстрее SEARCH_DEBOUNCE_MS
+    assert queries == []
+    assert pump(lambda: queries and "Поиск «kar»" in player.status.currentMessage(), timeout=5)
+    pump(timeout=sonora.SEARCH_DEBOUNCE_MS / 1000.0 + 0.1)
+    assert queries == ["kar"]
@@ -0,0 +1,44 @@
+import time
+
+import sonora
+
+
+def test_phases_and_report(tmp_path, capsys):
+    path = tmp_path / "startup.log"
+    profiler = sonora.StartupProfiler(time.perf_counter(), enabled=True, path=str(path), budget_ms=10000)
+    profiler.mark("импорты")
+    profiler.mark("окно")
+    profiler.first_frame()
+    profiler.mark("аудио")
+    profiler.report()
+    profiler.mark("после отчёта")                 # замер закрыт
+    assert [name for name, _ in profiler.phases] == ["импорты", "окно", "первый кадр", "аудио"]
+    assert all(ms >= 0 for _, ms in profiler.phases)
+    assert profiler.frame_ms <= sum(ms for _, ms in profiler.phases)
+    text = path.read_text(encoding="utf-8")
+    assert "в бюджете" in text and "итого до первого кадра" in text
+    assert text.strip() == capsys.readouterr().out.strip()
+
+
+def test_over_budget_and_disabled(tmp_path, capsys):
+    path = tmp_path / "startup.log"
+    slow = sonora.StartupProfiler(time.perf_counter() - 2.0, enabled=True, path=str(path), budget_ms=1000)
+    slow.first_frame()
+    slow.report()
+    assert "ПРЕВЫШЕН" in path.read_text(encoding="utf-8")
+    capsys.readouterr()
+    quiet = sonora.StartupProfiler(time.perf_counter(), path=str(tmp_path / "none.log"))
+    quiet.mark("импорты")
+    quiet.report()
+    assert not (tmp_path / "none.log").exists()
+    assert capsys.readouterr().out == ""
+
+
+def test_background_work_waits_for_first_frame(player, pump, monkeypatch):
+    started = []
+    monkeypatch.setattr(player, "init_audio", lambda: started.append("audio") or False)
+    monkeypatch.setattr(player, "start_watching", lambda: started.append("watch"))
+    assert not player._first_paint and started == []
+    player.show()
+    assert pump(lambda: "watch" in started, timeout=5)
+    assert player._first_paint and started[0] == "audio"
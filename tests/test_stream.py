@@ -0,0 +1,76 @@
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+import sonora
+
+# Заменитель ffmpeg: файл трека содержит длительность в секундах, на выход — тишина s16le с учётом -ss.
+FAKE_FFMPEG = """#!{python}
+import sys
+args = sys.argv[1:]
+start = float(args[args.index("-ss") + 1])
+rate = int(args[args.index("-ar") + 1])
+channels = int(args[args.index("-ac") + 1])
+with open(args[args.index("-i") + 1]) as f:
+    seconds = float(f.read())
+frames = max(0, int((seconds - start) * rate))
+sys.stdout.buffer.write(b"\\0" * frames * 2 * channels)
+"""
+
+
+@pytest.fixture
+def stream(tmp_path):
+    pytest.importorskip("pygame")
+    try:
+        sonora.load_audio()
+    except Exception as e:
+        pytest.skip(f"нет микшера: {e}")
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG.format(python=sys.executable))
+    ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IEXEC)
+    backend = sonora.StreamBackend(ffmpeg=str(ffmpeg), crossfade=0)
+    yield backend
+    backend.close()
+
+
+def _track(tmp_path, name, seconds):
+    path = tmp_path / name
+    path.write_text(str(seconds))
+    return str(path)
+
+
+def _wait(condition, timeout):
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_seek_keeps_queued_track(stream, tmp_path):
+    first = _track(tmp_path, "a.wav", 1.0)
+    second = _track(tmp_path, "b.wav", 0.5)
+    stream.load(first)
+    stream.play()
+    stream.queue(second)
+    # декодер уже дочитал первый трек и взял второй из очереди
+    assert _wait(lambda: stream._next_path is None and stream.wait_ready(0), 2)
+    assert stream.seek(0.6)
+    assert stream.wait_ready(2)
+    assert _wait(stream.poll_switched, 3), "после перемотки не было перехода на трек из очереди"
+    assert stream._path == second
+
+
+def test_seek_restarts_from_position(stream, tmp_path):
+    path = _track(tmp_path, "a.wav", 2.0)
+    stream.load(path)
+    stream.play()
+    assert stream.wait_ready(2)
+    stream.seek(1.5)
+    assert stream.wait_ready(2)
+    assert 1.5 <= stream.get_position() < 2.0
+    assert _wait(lambda: not stream.get_busy(), 3)
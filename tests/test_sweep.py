@@ -0,0 +1,27 @@
+import os
+
+import sonora
+from conftest import make_wav
+
+
+def test_sweeper_reports_missing_files_and_folders(qapp, tmp_path):
+    here = make_wav(tmp_path / "a" / "here.wav")
+    gone = make_wav(tmp_path / "a" / "gone.wav")
+    os.remove(gone)
+    unplugged = str(tmp_path / "disk" / "x.wav")               # каталога нет вовсе
+    thread = sonora.ExistenceSweeperThread([here, gone, unplugged], batch_size=1)
+    batches = []
+    thread.missing.connect(batches.append, sonora.Qt.DirectConnection)
+    thread.run()
+    assert sorted(p for batch in batches for p in batch) == sorted([gone, unplugged])
+
+
+def test_missing_tracks_are_marked_not_removed(player, pump, music_dir):
+    a = make_wav(music_dir / "a.wav")
+    b = make_wav(music_dir / "b.wav")
+    player.load_tracks([a, b])
+    assert pump(lambda: not player.metadata_thread.isRunning() and len(player.tracks) == 2, timeout=10)
+    os.remove(b)
+    player.start_existence_sweep()
+    assert pump(lambda: player.missing == {b} and not player.sweeper_thread.isRunning(), timeout=5)
+    assert player.tracks == [a, b]
@@ -0,0 +1,117 @@
+import os
+import struct
+
+import sonora
+from conftest import make_wav
+
+PAYLOAD = 200000  # «звук» после тегов: его читать не должны
+
+
+def _atom(name, body):
+    return struct.pack(">I", 8 + len(body)) + name + body
+
+
+def make_m4a(path, title=None, artist=None, cover=None):
+    """Минимальный M4A (ftyp, moov/mvhd на 2 с, mdat) с атомами iTunes."""
+    from mutagen.mp4 import MP4, MP4Cover
+    mvhd = _atom(b"mvhd", bytes(12) + struct.pack(">II", 1000, 2000) + bytes(80))
+    with open(path, "wb") as f:
+        f.write(_atom(b"ftyp", b"M4A \0\0\0\0M4A isom") + _atom(b"moov", mvhd) + _atom(b"mdat", bytes(PAYLOAD)))
+    audio = MP4(path)
+    audio.add_tags()
+    if title:
+        audio["\xa9nam"] = [title]
+    if artist:
+        audio["\xa9ART"] = [artist]
+    if cover:
+        audio["covr"] = [MP4Cover(cover, MP4Cover.FORMAT_PNG)]
+    audio.save()
+    return str(path)
+
+
+def make_flac(path, tags=None, cover=None, id3_title=None):
+    """Минимальный FLAC (STREAMINFO на 1 с и «кадры»); теги — комментарии Vorbis, обложка — PICTURE."""
+    from mutagen.flac import FLAC, Picture
+    info = struct.pack(">HH", 4096, 4096) + bytes(6)
+    info += ((44100 << 44) | (1 << 41) | (15 << 36) | 44100).to_bytes(8, "big") + bytes(16)
+    with open(path, "wb") as f:
+        f.write(b"fLaC" + bytes([0x80]) + len(info).to_bytes(3, "big") + info + b"\xff\xf8" + bytes(PAYLOAD))
+    audio = FLAC(path)
+    for key, value in (tags or {}).items():
+        audio[key] = value
+    if cover:
+        picture = Picture()
+        picture.type, picture.mime, picture.data = 3, "image/png", cover
+        audio.add_picture(picture)
+    audio.save()
+    if id3_title:
+        # ID3 перед fLaC — так пишут некоторые программы
+        from mutagen.id3 import ID3, TIT2, TALB
+        id3 = ID3()
+        id3.add(TIT2(encoding=3, text=id3_title))
+        id3.add(TALB(encoding=3, text="Из ID3"))
+        with open(path, "rb") as f:
+            data = f.read()
+        id3.save(path)
+        with open(path, "ab") as f:
+            f.write(data)
+    return str(path)
+
+
+def _read(path):
+    stats = {}
+    record, cover = sonora.read_track_metadata(path, stats)
+    assert 0 < stats["bytes"] < PAYLOAD / 2, "прочитаны звуковые данные"
+    return record, cover
+
+
+def test_m4a_atoms(tmp_path):
+    record, cover = _read(make_m4a(tmp_path / "a.m4a", title="Песня", artist="A; B", cover=b"png-bytes"))
+    assert (record["title"], record["artists"]) == ("Песня", ["A", "B"])
+    assert record["duration"] == 2.0
+    assert cover == b"png-bytes" and record["cover"]
+    assert record["version"] == sonora.METADATA_VERSION
+
+
+def test_flac_vorbis_comments_picture_and_replaygain(tmp_path):
+    path = make_flac(tmp_path / "a.flac", cover=b"flac-cover",
+                     tags={"title": "Трек", "artist": ["X", "Y"], "album": "Альбом", "date": "1999",
+                           "replaygain_track_gain": "-4.5 dB", "replaygain_track_peak": "0.8"})
+    record, cover = _read(path)
+    assert (record["title"], record["artists"], record["album"], record["year"]) == ("Трек", ["X", "Y"], "Альбом", "1999")
+    assert (record["replaygain"], record["replaygain_peak"]) == (-4.5, 0.8)
+    assert record["duration"] == 1.0
+    assert cover == b"flac-cover"
+
+
+def test_leading_id3_only_fills_missing_fields(tmp_path):
+    record, _ = _read(make_flac(tmp_path / "a.flac", tags={"title": "Родное"}, id3_title="Из заголовка"))
+    assert record["title"] == "Родное"
+    assert record["album"] == "Из ID3"
+
+
+def test_wav_id3_and_wrong_extension(tmp_path):
+    record, _ = sonora.read_track_metadata(make_wav(tmp_path / "a.wav", title="Волна", artist="W"))
+    assert (record["title"], record["artists"]) == ("Волна", ["W"])
+    # расширение не совпадает с содержимым — формат определяет File()
+    disguised = tmp_path / "b.mp3"
+    os.rename(make_m4a(tmp_path / "b.m4a", title="M4A внутри"), disguised)
+    record, _ = sonora.read_track_metadata(str(disguised))
+    assert record["title"] == "M4A внутри"
+
+
+def test_old_non_mp3_records_are_outdated():
+    old = {"version": 1, "title": None}
+    assert sonora.MetadataCache.is_outdated("/m/a.flac", old)
+    assert sonora.MetadataCache.is_outdated("/m/a.m4a", {"title": None})
+    assert not sonora.MetadataCache.is_outdated("/m/a.mp3", old)
+    assert not sonora.MetadataCache.is_outdated("/m/a.flac", {"version": sonora.METADATA_VERSION})
+
+
+def test_bench_tags_prints_per_format_rows(tmp_path, capsys):
+    make_flac(tmp_path / "a.flac", tags={"title": "T"})
+    make_m4a(tmp_path / "b.m4a")
+    sonora.benchmark_tags(str(tmp_path), repeat=1)
+    out = capsys.readouterr().out.splitlines()
+    assert out[1].startswith(".flac") and out[1].rstrip().endswith("1/1")
+    assert out[2].startswith(".m4a") and out[2].rstrip().endswith("0/1")
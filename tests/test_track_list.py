@@ -0,0 +1,120 @@
+import pytest
+
+import sonora
+
+
+@pytest.fixture
+def model(player):
+    model = sonora.TrackListModel(player, ["a", "b", "c", "d"])
+    model.events = []
+    model.rowsInserted.connect(lambda parent, first, last: model.events.append(("insert", first, last)))
+    model.rowsRemoved.connect(lambda parent, first, last: model.events.append(("remove", first, last)))
+    model.modelReset.connect(lambda: model.events.append(("reset",)))
+    return model
+
+
+def test_apply_paths_inserts_and_removes_in_blocks(model):
+    model.apply_paths(["a", "x", "y", "d", "z"])
+    assert model.paths() == ["a", "x", "y", "d", "z"]
+    assert model.events == [("remove", 1, 2), ("insert", 1, 2), ("insert", 4, 4)]
+
+
+def test_apply_paths_same_list_does_nothing(model):
+    model.apply_paths(["a", "b", "c", "d"])
+    assert model.events == []
+
+
+def test_apply_paths_reorder_resets(model):
+    model.apply_paths(["d", "c", "b", "a"])
+    assert model.paths() == ["d", "c", "b", "a"]
+    assert model.events == [("reset",)]
+
+
+def test_apply_paths_to_empty_and_back(model):
+    model.apply_paths([])
+    assert model.rowCount() == 0
+    model.apply_paths(["b", "e"])
+    assert model.paths() == ["b", "e"]
+    assert model.events == [("remove", 0, 3), ("insert", 0, 1)]
+
+
+def test_insert_sorted_and_remove_path(model):
+    model.insert_sorted("bb")
+    model.insert_sorted("bb")
+    model.remove_path("a")
+    model.remove_path("nope")
+    assert model.paths() == ["b", "bb", "c", "d"]
+    assert model.events == [("insert", 2, 2), ("remove", 0, 0)]
+
+
+def _rows(player, records):
+    for path, record in records.items():
+        player.metadata.records[path] = dict(record)
+    return sonora.TrackListModel(player, list(records))
+
+
+def test_data_roles_come_from_metadata_cache(player):
+    model = _rows(player, {"/m/a.mp3": {"title": "Песня", "artists": ["X", "Y"]}, "/m/b.mp3": {}})
+    a, b = model.index(0), model.index(1)
+    assert (a.data(), a.data(model.ArtistRole), a.data(model.PathRole)) == ("Песня", "X, Y", "/m/a.mp3")
+    assert (b.data(), b.data(model.ArtistRole)) == ("b.mp3", "Неизвестный исполнитель")
+    assert b.data(sonora.Qt.DecorationRole) is None      # без обложки ничего не грузится
+    assert model.data(model.index(5)) is None
+
+
+def test_missing_role_follows_availability(player):
+    model = _rows(player, {"/m/a.mp3": {}, "/m/b.mp3": {}})
+    changed = []
+    model.dataChanged.connect(lambda first, last, roles: changed.append((first.row(), last.row(), list(roles))))
+    player.missing.add("/m/b.mp3")
+    player.availability_changed.emit()
+    assert changed == [(0, 1, [model.MissingRole])]
+    assert model.index(1).data(model.MissingRole) and not model.index(0).data(model.MissingRole)
+
+
+def test_track_list_paints_rows_without_widgets(player, pump):
+    from PyQt5.QtGui import QPainter, QPixmap
+    from PyQt5.QtWidgets import QStyleOptionViewItem
+    paths = [f"/m/{i}.mp3" for i in range(1000)]
+    for p in paths:
+        player.metadata.records[p] = {"title": p, "artists": ["A"]}
+    player.missing.add(paths[1])
+    view = player.create_track_list(paths)
+    view.resize(400, 300)
+    view.show()
+    assert pump(lambda: view.isVisible())
+    assert view.model().rowCount() == 1000
+    assert view.findChildren(sonora.QLabel) == []          # ни одного виджета на строку
+    delegate = view.itemDelegate()
+    canvas = QPixmap(400, 66)
+    painter = QPainter(canvas)
+    option = QStyleOptionViewItem()
+    option.rect = sonora.QRect(0, 0, 400, 66)
+    for row in (0, 1):
+        delegate.paint(painter, option, view.model().index(row))
+    painter.end()
+    view.close()
+
+
+def test_click_on_artist_opens_artist_page_otherwise_plays(player, monkeypatch):
+    from PyQt5.QtCore import QEvent, QPoint
+    from PyQt5.QtGui import QMouseEvent
+    from PyQt5.QtWidgets import QStyleOptionViewItem
+    model = _rows(player, {"/m/a.mp3": {"title": "Песня", "artists": ["Исполнитель"]}})
+    calls = []
+    monkeypatch.setattr(player, "go_to_artist_from_item", lambda path: calls.append(("artist", path)))
+    monkeypatch.setattr(player, "play_track_from_path", lambda path: calls.append(("play", path)))
+    delegate = sonora.TrackItemDelegate(player)
+    option = QStyleOptionViewItem()
+    option.rect = sonora.QRect(0, 0, 400, 66)
+    index = model.index(0)
+    artist_rect = delegate.artist_hit_rect(option.rect, index)
+
+    def click(point):
+        event = QMouseEvent(QEvent.MouseButtonPress, point, sonora.Qt.LeftButton, sonora.Qt.LeftButton, sonora.Qt.NoModifier)
+        delegate.editorEvent(event, model, option, index)
+
+    click(artist_rect.center())
+    click(QPoint(artist_rect.left(), 10))               # строка названия
+    click(QPoint(artist_rect.right() + 40, artist_rect.center().y()))  # правее текста исполнителя
+    assert calls == [("artist", "/m/a.mp3"), ("play", "/m/a.mp3"), ("play", "/m/a.mp3")]
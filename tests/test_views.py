@@ -0,0 +1,39 @@
+import sonora
+from conftest import make_wav
+
+
+def _load(player, pump, paths):
+    player.load_tracks(paths)
+    assert pump(lambda: not player.metadata_thread.isRunning() and len(player.tracks) == len(paths), timeout=10)
+
+
+def test_album_page_is_built_once_and_evicted_lru(player, pump, music_dir, monkeypatch):
+    monkeypatch.setattr(sonora, "VIEW_CACHE_SIZE", 2)
+    paths = [make_wav(music_dir / f"{n}.wav", title=n, artist="X", album=n) for n in ("A", "B", "C")]
+    _load(player, pump, paths)
+    player.show_album_view("A")
+    page = player.stacked_widget.currentWidget()
+    count = player.stacked_widget.count()
+    player.show_home()
+    player.show_album_view("A")
+    assert player.stacked_widget.currentWidget() is page     # страница не пересобрана
+    assert player.stacked_widget.count() == count
+    player.show_album_view("B")
+    player.show_album_view("A")                              # A снова самая свежая
+    player.show_album_view("C")
+    assert list(player.view_cache) == [("album", "A"), ("album", "C")]
+    assert player.stacked_widget.indexOf(page) != -1
+
+
+def test_page_follows_library_changes(player, pump, music_dir):
+    a = make_wav(music_dir / "a.wav", title="A", artist="X", album="Album")
+    b = make_wav(music_dir / "b.wav", title="B", artist="X", album="Album")
+    _load(player, pump, [a, b])
+    player.show_album_view("Album")
+    page = player.stacked_widget.currentWidget()
+    assert page.track_list.model().rowCount() == 2
+    player.remove_tracks([b])
+    assert page.track_list.model().rowCount() == 1
+    player.remove_tracks([a])                                # альбома больше нет — страница закрыта
+    assert ("album", "Album") not in player.view_cache
+    assert player.stacked_widget.currentWidget() is player.home_page
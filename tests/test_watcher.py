@@ -0,0 +1,99 @@
+import os
+import time
+
+import pytest
+
+import sonora
+from conftest import make_wav, set_mtime
+
+
+@pytest.fixture
+def watched(qapp, pump, music_dir, monkeypatch):
+    """Наблюдатель с готовым снимком; изменения разбираются вызовом flush(каталоги) без ожидания таймеров."""
+    monkeypatch.setattr(sonora, "WATCH_SETTLE_SECONDS", 0.0)
+    old = time.time() - 60
+    files = [make_wav(music_dir / "a.wav"), make_wav(music_dir / "b.wav"), make_wav(music_dir / "Sub" / "c.wav")]
+    for path in files:
+        set_mtime(path, old)
+    watcher = sonora.LibraryWatcher([str(music_dir)], known=files)
+    events = []
+    watcher.changes.connect(lambda *args: events.append(args))
+    watcher.unavailable.connect(lambda paths: events.append(("unavailable", paths)))
+    watcher.start()
+    assert pump(lambda: watcher.watcher is not None)
+
+    def flush(*dirs):
+        watcher.flush_timer.stop()
+        for d in dirs:
+            watcher._mark_dirty(str(d))
+        watcher._flush()
+        return events.pop() if events else None
+
+    yield watcher, files, flush
+    watcher.stop()
+
+
+def test_rename_is_reported_as_move(watched, music_dir):
+    watcher, files, flush = watched
+    new = str(music_dir / "renamed.wav")
+    os.rename(files[0], new)
+    assert flush(music_dir) == ([], [], [], [(files[0], new)])
+
+
+def test_move_between_folders(watched, music_dir):
+    watcher, files, flush = watched
+    new = str(music_dir / "Sub" / "a.wav")
+    os.rename(files[0], new)
+    assert flush(music_dir, music_dir / "Sub") == ([], [], [], [(files[0], new)])
+
+
+def test_added_removed_and_modified(watched, music_dir):
+    watcher, files, flush = watched
+    added = make_wav(music_dir / "new.wav")
+    set_mtime(added, time.time() - 30)
+    os.remove(files[1])
+    make_wav(files[2], seconds=0.3)
+    set_mtime(files[2], time.time() - 30)
+    assert flush(music_dir, music_dir / "Sub") == ([added], [files[1]], [files[2]], [])
+
+
+def test_file_still_being_written_is_deferred(watched, music_dir, monkeypatch):
+    watcher, files, flush = watched
+    monkeypatch.setattr(sonora, "WATCH_SETTLE_SECONDS", 60.0)
+    make_wav(music_dir / "copying.wav")
+    assert flush(music_dir) is None
+    assert str(music_dir) in watcher._dirty       # разберём позже
+
+
+def test_missing_root_is_unavailable_not_removed(watched, music_dir, tmp_path):
+    watcher, files, flush = watched
+    os.rename(music_dir, tmp_path / "unplugged")
+    assert flush(music_dir) == ("unavailable", sorted(files))
+
+
+def test_snapshot_walk_is_bounded(qapp, pump, music_dir, monkeypatch):
+    monkeypatch.setattr(sonora, "SCAN_MAX_DEPTH", 2)
+    shallow = make_wav(music_dir / "d1" / "d2" / "ok.wav")
+    make_wav(music_dir / "d1" / "d2" / "d3" / "deep.wav")
+    (music_dir / "loop").mkdir()
+    read = sonora.read_dir_entry
+
+    def read_with_loop(path):
+        # каталог loop — тот же каталог, что и корень (как bind mount корня внутрь себя)
+        entry = read(path)
+        if entry is not None and os.path.basename(path) == "loop":
+            entry = read(str(music_dir))
+        return entry
+
+    monkeypatch.setattr(sonora, "read_dir_entry", read_with_loop)
+    watcher = sonora.LibraryWatcher([str(music_dir)])
+    events = []
+    watcher.changes.connect(lambda *args: events.append(args))
+    watcher.start()
+    try:
+        assert pump(lambda: watcher.watcher is not None)
+        assert events == [([shallow], [], [], [])]
+        assert str(music_dir / "d1" / "d2" / "d3") not in watcher.snapshot
+        assert str(music_dir / "loop") not in watcher.snapshot
+    finally:
+        watcher.stop()